@@ -0,0 +1,430 @@
+#!/usr/bin/env python
+
+import argparse
+import atexit
+import contextlib
+import datetime
+import fnmatch
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pylink
+
+import income as myMeager
+import position as anAwkward
+import taxes as deathAnd
+from position import Grant
+from position import GrantBook
+
+
+# Where `make bench` keeps the numbers it compares against
+BASELINE = 'bench_baseline.json'
+
+# Anything this much slower than the baseline counts as a regression
+TOLERANCE = 0.25
+
+# Synthetic options were only ever exercised before this date, so the
+# query date shouldn't be moved any earlier
+EXERCISED_BY = anAwkward.parse_date('1/1/20')
+
+# Each timing sample runs a case for at least this long (seconds)
+MIN_SAMPLE_S = 0.05
+
+
+###############################################################################
+# Synthetic positions                                                         #
+###############################################################################
+
+def synthetic_grants(n, seed=0):
+    """n made-up (but plausible) grants, the same ones for a given seed.
+
+    A mix of RSUs, ISOs and NSOs starting between 2012 and 2019, with
+    monthly or quarterly vesting, some with a cliff, and some of the
+    options already exercised (and a few of those sold) before
+    EXERCISED_BY.
+    """
+    rng = np.random.RandomState(seed)
+    retval = []
+    for i in range(n):
+        vehicle = anAwkward.VEHICLES[rng.choice(3, p=[0.5, 0.25, 0.25])]
+        n_shares = int(rng.randint(1, 200)) * 100
+        n_periods = int(rng.choice([1, 16, 48]))
+        period_months = int(rng.choice([1, 3]))
+
+        n_cliff = 0
+        if 1 < n_periods and rng.rand() < 0.5:
+            n_cliff = n_shares // 4
+
+        strike = 0
+        if 'rsu' != vehicle:
+            strike = round(float(rng.uniform(0.5, 10.0)), 2)
+
+        start = '%d/1/%02d' % (rng.randint(1, 13), rng.randint(12, 20))
+        def __grant(exercised, sold):
+            return Grant(name='%s-%04d' % (vehicle, i),
+                         vehicle=vehicle,
+                         n_cliff=n_cliff,
+                         n_shares=n_shares,
+                         exercised=exercised,
+                         sold=sold,
+                         strike_usd=strike,
+                         start=start,
+                         n_periods=n_periods,
+                         period_months=period_months)
+        g = __grant(0, 0)
+
+        # Only what had vested by EXERCISED_BY can have been exercised
+        if 'rsu' != vehicle:
+            vested = g.vested(EXERCISED_BY)
+            exercised = int(rng.randint(0, vested // 2 + 1))
+            sold = int(rng.randint(0, exercised // 2 + 1))
+            g = __grant(exercised, sold)
+        retval.append(g)
+    return retval
+
+
+def synthetic_book(n, seed=0):
+    """synthetic_grants packed into a GrantBook."""
+    return GrantBook.from_grants(synthetic_grants(n, seed=seed))
+
+
+def _constants():
+    # Imported here so that just importing the module doesn't build
+    # the example model
+    import eg_private
+    import parallel
+    return parallel.snapshot(eg_private.MODEL)['static']
+
+
+def synthetic_model(n, book=False, seed=0, cls=pylink.DAGModel):
+    """A model with eg_private's constants and n synthetic grants.
+
+    book: hold the grants in a GrantBook rather than a list
+    cls:  model class (e.g. incremental.IncrementalDAGModel)
+    """
+    grants = synthetic_grants(n, seed=seed)
+    if book: grants = GrantBook.from_grants(grants)
+    return cls([deathAnd.Taxes(),
+                myMeager.Income(),
+                anAwkward.Position(grants)],
+               **_constants())
+
+
+###############################################################################
+# Cases                                                                       #
+###############################################################################
+#
+# Each case does its (untimed) setup and hands back the function to
+# time.  The timed function should do the same amount of work every
+# time it's called.
+
+def _eval_eg_private():
+    import eg_private
+    m = eg_private.MODEL
+    def __run():
+        m.clear_cache()
+        return (m.outstanding_taxes_usd,
+                m.cleared_from_sale_usd,
+                m.amt_free_iso_exercise_income_usd)
+    return __run
+
+
+def _sales_simulation(n, book=False):
+    def __case():
+        m = synthetic_model(n, book=book)
+        m.override(m.enum.sales_orders, myMeager.sales_orders_all(m))
+        def __run():
+            m.clear_cache()
+            return m.sales_simulation_data
+        return __run
+    return __case
+
+
+def _apply_tax_table_array(n):
+    def __case():
+        t = deathAnd.Taxes()
+        tab = deathAnd.TaxBrackets(_constants()['fed_tax_table'])
+        v = np.linspace(0, 2e6, n)
+        return lambda: t.apply_tax_table(v, tab)
+    return __case
+
+
+def _apply_tax_table_scalar(n):
+    def __case():
+        t = deathAnd.Taxes()
+        tab = deathAnd.TaxBrackets(_constants()['fed_tax_table'])
+        v = [ float(x) for x in np.linspace(0, 2e6, n) ]
+        return lambda: [ t.apply_tax_table(x, tab) for x in v ]
+    return __case
+
+
+def _investigator(method):
+    def __case():
+        import eg_private
+        import investigator
+        import parallel
+        import plots
+
+        m = parallel.rebuild(parallel.snapshot(eg_private.MODEL))
+        inv = investigator.Investigator(m, plots.Renderer(enabled=False))
+        fn = getattr(inv, method)
+        def __run():
+            m.clear_cache()
+            with contextlib.redirect_stdout(io.StringIO()):
+                return fn()
+        return __run
+    return __case
+
+
+def _scenario_grid():
+    import eg_private
+    import parallel
+    import scenarios
+
+    m = parallel.rebuild(parallel.snapshot(eg_private.MODEL))
+    prices = np.linspace(5, 25, 200)
+    start = anAwkward.parse_date(m.query_date)
+    dates = [ anAwkward.mon_add(start, i) for i in range(20) ]
+    strategies = [
+        scenarios.Strategy(myMeager.sales_orders_rsu),
+        scenarios.Strategy(myMeager.sales_orders_all),
+        scenarios.Strategy(myMeager.sales_orders_all,
+                           nso_first=True, restricted=False),
+        scenarios.Strategy(myMeager.sales_orders_options),
+        scenarios.Strategy(myMeager.sales_orders_options,
+                           cheap_first=False, restricted=False),
+        scenarios.Strategy(lambda m, price=None: [], name='hold'),
+        ]
+    nodes = ['outstanding_taxes_usd', 'cleared_from_sale_usd']
+    return lambda: scenarios.grid(m, prices, dates, strategies, nodes)
+
+
+def _grant_import(n, book):
+    def __case():
+        import importer
+
+        tmp = tempfile.mkdtemp()
+        atexit.register(shutil.rmtree, tmp, True)
+        path = os.path.join(tmp, 'vesting.csv')
+        importer.write_schedule(path, synthetic_grants(n))
+        return lambda: importer.load(path, book=book)
+    return __case
+
+
+CASES = [
+    ('eval_eg_private', _eval_eg_private),
+    ('sales_simulation_10', _sales_simulation(10)),
+    ('sales_simulation_100', _sales_simulation(100)),
+    ('sales_simulation_1000', _sales_simulation(1000)),
+    ('sales_simulation_book_1000', _sales_simulation(1000, book=True)),
+    ('apply_tax_table_array_100k', _apply_tax_table_array(100000)),
+    ('apply_tax_table_scalar_1k', _apply_tax_table_scalar(1000)),
+    ('amt_free_iso', _investigator('amt_free_iso')),
+    ('question_8_sweep', _investigator('financials_vs_price')),
+    ('question_9_sweep', _investigator('iso_outlook_vs_price')),
+    ('scenario_grid_200x20x6', _scenario_grid),
+    # ~100k vesting rows
+    ('import_grants_4500', _grant_import(4500, book=False)),
+    ('import_grants_4500_book', _grant_import(4500, book=True)),
+    ]
+
+
+###############################################################################
+# Timing                                                                      #
+###############################################################################
+
+def measure(fn, repeat=5, min_sample_s=MIN_SAMPLE_S):
+    """Times fn, timeit style.
+
+    The number of calls per sample is doubled until a sample takes at
+    least min_sample_s, then repeat samples are taken.
+
+    returns: {'best': <s/call>, 'median': <s/call>,
+              'number': <calls/sample>, 'repeat': repeat}
+    """
+    def __sample(number):
+        start = time.perf_counter()
+        for i in range(number):
+            fn()
+        return time.perf_counter() - start
+
+    number = 1
+    while True:
+        elapsed = __sample(number)
+        if min_sample_s <= elapsed:
+            break
+        number *= 2
+
+    samples = [ elapsed ]
+    samples += [ __sample(number) for i in range(repeat - 1) ]
+    samples = [ s / number for s in samples ]
+    return {
+        'best': min(samples),
+        'median': statistics.median(samples),
+        'number': number,
+        'repeat': repeat,
+        }
+
+
+def run(patterns=None, repeat=5, min_sample_s=MIN_SAMPLE_S, cases=CASES,
+        log=None):
+    """Runs the cases whose names match any of the (fnmatch) patterns.
+
+    log: file to note progress on (e.g. sys.stderr)
+
+    returns: {<case name>: <measure() result>, ...}
+    """
+    retval = {}
+    for (name, case) in cases:
+        if patterns and not any([ fnmatch.fnmatch(name, p)
+                                  for p in patterns ]):
+            continue
+        if log: log.write('%s...\n' % name)
+        retval[name] = measure(case(), repeat=repeat,
+                               min_sample_s=min_sample_s)
+    return retval
+
+
+###############################################################################
+# Baselines                                                                   #
+###############################################################################
+
+def environment():
+    """What the numbers were measured on."""
+    return {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pylink': getattr(pylink, '__version__', 'unknown'),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        }
+
+
+def save(results, path):
+    with open(path, 'w') as fd:
+        json.dump({'environment': environment(), 'results': results},
+                  fd, indent=2, sort_keys=True)
+        fd.write('\n')
+
+
+def load(path):
+    """returns: the results (not the environment) stored in path"""
+    with open(path) as fd:
+        return json.load(fd)['results']
+
+
+def compare(results, baseline, tolerance=TOLERANCE, key='best'):
+    """Lines up results against a baseline.
+
+    tolerance: fraction slower (or faster) that still counts as 'ok'
+    key:       'best' or 'median'
+
+    returns: [(<name>, <baseline s>, <current s>, <ratio>, <status>), ...]
+             where the status is one of 'ok', 'slower', 'faster',
+             'new' (not in the baseline), or 'missing' (not run)
+    """
+    retval = []
+    for name in sorted(set(results) | set(baseline)):
+        was = baseline.get(name, {}).get(key)
+        now = results.get(name, {}).get(key)
+        ratio = None
+        if was is None:
+            status = 'new'
+        elif now is None:
+            status = 'missing'
+        else:
+            ratio = now / was
+            status = 'ok'
+            if (1.0 + tolerance) < ratio:
+                status = 'slower'
+            elif ratio < 1.0 / (1.0 + tolerance):
+                status = 'faster'
+        retval.append((name, was, now, ratio, status))
+    return retval
+
+
+def regressions(rows):
+    """Names of the cases compare() found to be slower."""
+    return [ r[0] for r in rows if 'slower' == r[4] ]
+
+
+def _ms(v):
+    if v is None: return '%10s' % '-'
+    return '%10.3f' % (v * 1000)
+
+
+def report(results, rows=None):
+    """Text table of results, against a baseline if rows are given."""
+    if rows is None:
+        lines = ['%-32s %10s %10s %7s' % (
+            'Case', 'Best (ms)', 'Med (ms)', 'Loops')]
+        for name in sorted(results):
+            r = results[name]
+            lines.append('%-32s %s %s %7d' % (
+                name, _ms(r['best']), _ms(r['median']), r['number']))
+        return '\n'.join(lines) + '\n'
+
+    lines = ['%-32s %10s %10s %7s  %s' % (
+        'Case', 'Base (ms)', 'Now (ms)', 'Ratio', 'Status')]
+    for (name, was, now, ratio, status) in rows:
+        r = '%7s' % '-'
+        if ratio is not None: r = '%6.2fx' % ratio
+        lines.append('%-32s %s %s %s  %s' % (
+            name, _ms(was), _ms(now), r, status))
+    return '\n'.join(lines) + '\n'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Times model evaluation, sweeps and solvers.')
+    parser.add_argument('patterns', nargs='*',
+                        help='only run cases matching these (fnmatch)')
+    parser.add_argument('-l', '--list', action='store_true',
+                        help='list the cases and exit')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='timing samples per case')
+    parser.add_argument('-b', '--baseline', nargs='?', const=BASELINE,
+                        help='compare against this baseline file '
+                        '(default: %s)' % BASELINE)
+    parser.add_argument('-s', '--save', nargs='?', const=BASELINE,
+                        help='save the results as a baseline file '
+                        '(default: %s)' % BASELINE)
+    parser.add_argument('-t', '--tolerance', type=float, default=TOLERANCE,
+                        help='slowdown (fraction) still considered ok')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for (name, case) in CASES: print(name)
+        return 0
+
+    results = run(args.patterns, repeat=args.repeat, log=sys.stderr)
+
+    status = 0
+    if args.baseline:
+        rows = compare(results, load(args.baseline),
+                       tolerance=args.tolerance)
+        sys.stdout.write(report(results, rows))
+        slow = regressions(rows)
+        if slow:
+            sys.stdout.write('\nSlower than the baseline: %s\n'
+                             % ', '.join(slow))
+            status = 1
+    else:
+        sys.stdout.write(report(results))
+
+    if args.save:
+        save(results, args.save)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
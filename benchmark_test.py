@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+import pytest
+
+import benchmark
+import income as myMeager
+from position import GrantBook
+
+
+class TestBenchmark(object):
+
+    def test_synthetic_grants(self):
+        a = benchmark.synthetic_grants(50, seed=3)
+        b = benchmark.synthetic_grants(50, seed=3)
+        assert(len(a) == 50)
+        assert([ g.name for g in a ] == [ g.name for g in b ])
+        assert([ g.exercised for g in a ] == [ g.exercised for g in b ])
+        for g in a:
+            assert(g.exercised <= g.vested(benchmark.EXERCISED_BY))
+            assert(g.sold <= g.exercised)
+
+    def test_book_matches_list(self):
+        lst = benchmark.synthetic_model(30)
+        book = benchmark.synthetic_model(30, book=True)
+        assert(isinstance(book.grants_lst, GrantBook))
+        for m in (lst, book):
+            m.override(m.enum.sales_orders, myMeager.sales_orders_all(m))
+        assert(book.cleared_from_sale_usd
+               == pytest.approx(lst.cleared_from_sale_usd))
+
+    def test_run(self):
+        calls = []
+        def __case():
+            return lambda: calls.append(1)
+        res = benchmark.run(['b*'], repeat=3, min_sample_s=0.0,
+                            cases=[('a', __case), ('b', __case)])
+        assert(list(res.keys()) == ['b'])
+        assert(res['b']['number'] == 1)
+        assert(len(calls) == 3)
+        assert(res['b']['best'] <= res['b']['median'])
+
+    def test_compare(self, tmp_path):
+        base = {
+            'same': {'best': 1.0},
+            'slow': {'best': 1.0},
+            'fast': {'best': 1.0},
+            'gone': {'best': 1.0},
+            }
+        now = {
+            'same': {'best': 1.1},
+            'slow': {'best': 2.0},
+            'fast': {'best': 0.5},
+            'new': {'best': 1.0},
+            }
+        path = str(tmp_path / 'base.json')
+        benchmark.save(base, path)
+        rows = benchmark.compare(now, benchmark.load(path), tolerance=0.25)
+        status = dict([ (r[0], r[4]) for r in rows ])
+        assert(status == {'same': 'ok', 'slow': 'slower', 'fast': 'faster',
+                          'gone': 'missing', 'new': 'new'})
+        assert(benchmark.regressions(rows) == ['slow'])
+        assert('slower' in benchmark.report(now, rows))
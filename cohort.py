@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+import numpy as np
+import pylink
+
+import taxes as deathAnd
+import income as myMeager
+import position as anAwkward
+from position import GrantBook
+
+
+def grant_id(employee, name):
+    """Name of an employee's grant once it is in the shared book."""
+    return '%d/%s' % (employee, name)
+
+
+def _is_table(name):
+    return name.endswith('_tax_table')
+
+
+def _table_key(employee):
+    """Hashable summary of the tax tables one employee files under."""
+    return tuple(sorted([ (k, tuple(sorted(v.items())))
+                          for (k, v) in employee.items()
+                          if _is_table(k) ]))
+
+
+def group_by_tables(employees):
+    """Bucket employees that share the same tax tables.
+
+    Everybody in a bucket can be pushed through one model together,
+    since the bracket tables are the only per-person inputs that can't
+    be held as an array.
+
+    returns: [[<employee index>, ...], ...] in order of first appearance
+    """
+    groups = {}
+    for i, emp in enumerate(employees):
+        groups.setdefault(_table_key(emp), []).append(i)
+    return list(groups.values())
+
+
+def cohort_book(employees, idx=None):
+    """Combine the grants of several employees into one owned GrantBook.
+
+    employees: list of employee dicts (see evaluate)
+    idx:       which employees to include (default: all of them)
+
+    The owner column is the position within idx, and every grant is
+    renamed with grant_id so that names can't collide.
+    """
+    if idx is None: idx = range(len(employees))
+    grants = []
+    names = []
+    owners = []
+    for (j, i) in enumerate(idx):
+        lst = employees[i].get('grants', [])
+        if isinstance(lst, GrantBook): lst = list(lst)
+        for g in lst:
+            grants.append(g)
+            names.append(grant_id(i, g.name))
+            owners.append(j)
+    return GrantBook.from_grants(grants,
+                                 name=np.array(names, dtype=object),
+                                 owner=owners,
+                                 n_owners=len(idx))
+
+
+def cohort_model(employees, idx=None, **constants):
+    """Build one model covering several employees with the same tables.
+
+    employees: list of employee dicts (see evaluate)
+    idx:       which employees to include (default: all of them)
+    constants: node values shared by everyone
+
+    Every other per-employee value becomes an array with one entry per
+    employee (in idx order).
+    """
+    if idx is None: idx = list(range(len(employees)))
+    first = employees[idx[0]]
+
+    kwargs = dict(constants)
+    for (k, v) in first.items():
+        if _is_table(k): kwargs[k] = v
+
+    keys = set()
+    for i in idx:
+        keys.update(employees[i].keys())
+    keys -= set(['grants', 'sales_orders'])
+    for k in sorted(keys):
+        if _is_table(k): continue
+        col = [ employees[i].get(k, constants.get(k)) for i in idx ]
+        if any([ v is None for v in col ]):
+            raise KeyError("No value for %s for some employees" % k)
+        kwargs[k] = np.array(col, dtype=float)
+
+    return pylink.DAGModel([deathAnd.Taxes(),
+                            anAwkward.Position(cohort_book(employees, idx)),
+                            myMeager.Income(),],
+                           **kwargs)
+
+
+def _employee_orders(employees, idx):
+    retval = []
+    for i in idx:
+        for o in employees[i].get('sales_orders', []):
+            o = dict(o)
+            o['id'] = grant_id(i, o['id'])
+            retval.append(o)
+    return retval
+
+
+def evaluate(employees, nodes, orders=None, **constants):
+    """Evaluate a set of nodes for a whole table of employees at once.
+
+    employees: list of dicts, one per employee, each holding:
+                 grants:       list of Grants (or a GrantBook)
+                 sales_orders: (optional) that employee's own orders
+                 *_tax_table:  their filing tables
+                 anything else: per-employee node values
+                               (reg_income_usd, fed_withheld_usd, ...)
+    nodes:     names of the nodes to collect
+    orders:    callable(m) placing sales orders for everyone at once
+               (e.g. income.sales_orders_rsu); otherwise each
+               employee's own sales_orders are used
+    constants: node values shared by everyone (ipo_price_usd,
+               query_date, ...), also used as the default for any
+               per-employee value that is left out
+
+    Employees are grouped by their tax tables, and each group goes
+    through a single shared model in one vectorized pass.  Share
+    prices must be scalars here -- the employees are the array axis.
+
+    returns: {<node name>: <np.array with one value per employee>, ...}
+    """
+    n = len(employees)
+    retval = dict([ (name, np.zeros(n)) for name in nodes ])
+
+    for idx in group_by_tables(employees):
+        m = cohort_model(employees, idx, **constants)
+        if orders is not None:
+            m.override(m.enum.sales_orders, orders(m))
+        else:
+            m.override(m.enum.sales_orders, _employee_orders(employees, idx))
+
+        for name in nodes:
+            val = np.asarray(getattr(m, name), dtype=float)
+            retval[name][idx] = np.broadcast_to(val, (len(idx),))
+
+    return retval
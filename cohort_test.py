@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+
+import numpy as np
+import pylink
+import pytest
+
+import cohort
+import taxes as deathAnd
+import income as myMeager
+import position as anAwkward
+from position import Grant
+
+
+FED_JOINT = {
+    0      : 0.1,
+    19750  : 0.12,
+    80250  : 0.22,
+    171050 : 0.24,
+    326600 : 0.32,
+    414700 : 0.35,
+    622050 : 0.37
+    }
+
+FED_SINGLE = dict([ (k / 2, v) for (k, v) in FED_JOINT.items() ])
+
+CA_MARRIED = {
+    0 : 0.01,
+    17618 : 0.02,
+    41766 : 0.04,
+    65920 : 0.06,
+    91506 : 0.08,
+    115648 : 0.093,
+    590746 : 0.103,
+    708890 : 0.113,
+    1181484 : 0.123,
+    1999999 : 0.133
+    }
+
+CONSTANTS = {
+    'fed_std_deduction_usd': 24800,
+    'amt_exemption_rolloff_threshhold_usd': 1036800,
+    'amt_exemption_base_usd': 113400,
+    'state_std_deduction_usd': 4537,
+    'ipo_price_usd': 12,
+    'query_date': '9/29/20',
+    'iso_exercise_income_usd': 0,
+    'palantir_401k_usd': 0,
+    'palantir_fsa_usd': 0,
+    'palantir_drca_usd': 0,
+    'ext_amt_income_usd': 0,
+    'fed_withheld_usd': 20000,
+    'state_withheld_usd': 15000,
+    }
+
+NODES = ['outstanding_taxes_usd',
+         'cleared_from_sale_usd',
+         'amt_taxes_usd',
+         'rsu_income_usd',
+         'shares_vested_n',
+         'shares_withheld_rsu_n',
+         'shares_sold_rsu_n',
+         'shares_sold_nso_n']
+
+
+def grants(scale):
+    return [
+        Grant(name='rsu',
+              vehicle='rsu',
+              strike_usd=0,
+              start='1/1/19',
+              n_periods=48,
+              n_shares=96000 * scale,
+              period_months=1),
+        Grant(name='nso',
+              vehicle='nso',
+              strike_usd=2,
+              start='1/1/10',
+              n_periods=1,
+              n_shares=10000 * scale,
+              exercised=500,
+              sold=250,
+              period_months=1),
+        Grant(name='iso',
+              vehicle='iso',
+              strike_usd=4,
+              start='1/1/15',
+              n_periods=48,
+              n_shares=250000 * scale,
+              period_months=3),
+        ]
+
+
+@pytest.fixture
+def employees():
+    return [
+        {'grants': grants(1),
+         'reg_income_usd': 150000,
+         'fed_tax_table': FED_JOINT,
+         'state_tax_table': CA_MARRIED},
+        {'grants': grants(2),
+         'reg_income_usd': 90000,
+         'fed_withheld_usd': 5000,
+         'fed_tax_table': FED_SINGLE,
+         'state_tax_table': CA_MARRIED},
+        {'grants': grants(3)[:1],
+         'reg_income_usd': 400000,
+         'fed_tax_table': FED_JOINT,
+         'state_tax_table': CA_MARRIED},
+        ]
+
+
+def alone(emp, orders):
+    kwargs = dict(CONSTANTS)
+    kwargs.update(dict([ (k, v) for (k, v) in emp.items() if k != 'grants' ]))
+    m = pylink.DAGModel([deathAnd.Taxes(),
+                         myMeager.Income(),
+                         anAwkward.Position(emp['grants'])],
+                        **kwargs)
+    m.override(m.enum.sales_orders, orders(m))
+    return m
+
+
+class TestCohort(object):
+
+    def test_group_by_tables(self, employees):
+        assert [[0, 2], [1]] == cohort.group_by_tables(employees)
+
+    def test_cohort_book(self, employees):
+        book = cohort.cohort_book(employees, [1, 2])
+        assert 4 == len(book)
+        assert 2 == book.n_owners
+        assert [0, 0, 0, 1] == book.owner.tolist()
+        assert '2/rsu' == book.name[3]
+
+        tot = book.sum_by_vehicle(book.n_shares)
+        assert [192000, 288000] == tot['rsu'].tolist()
+        assert [500000, 0] == tot['iso'].tolist()
+
+    def test_evaluate(self, employees):
+        orders = myMeager.sales_orders_rsu
+        res = cohort.evaluate(employees, NODES, orders=orders, **CONSTANTS)
+
+        for (i, emp) in enumerate(employees):
+            m = alone(emp, orders)
+            for name in NODES:
+                assert abs(res[name][i] - getattr(m, name)) < 1e-6
+
+    def test_evaluate_deductions(self, employees):
+        for (i, emp) in enumerate(employees):
+            emp['fed_std_deduction_usd'] = 12400 * (i + 1)
+            emp['state_std_deduction_usd'] = 4537 * (i + 1)
+        orders = myMeager.sales_orders_rsu
+        res = cohort.evaluate(employees, NODES, orders=orders, **CONSTANTS)
+
+        for (i, emp) in enumerate(employees):
+            m = alone(emp, orders)
+            for name in NODES:
+                assert abs(res[name][i] - getattr(m, name)) < 1e-6
+
+    def test_evaluate_all(self, employees):
+        orders = myMeager.sales_orders_all
+        nodes = NODES + ['shares_sold_iso_n', 'shares_sellable_restricted_n']
+        res = cohort.evaluate(employees, nodes, orders=orders, **CONSTANTS)
+        assert res['shares_sold_iso_n'].any()
+
+        for (i, emp) in enumerate(employees):
+            m = alone(emp, orders)
+            for name in nodes:
+                assert abs(res[name][i] - getattr(m, name)) < 1e-6
+
+    def test_evaluate_own_orders(self, employees):
+        employees[1]['sales_orders'] = [
+            {'id': 'nso', 'qty': 1000, 'price': 12, 'prefer_exercise': True},
+            ]
+        res = cohort.evaluate(employees, NODES, **CONSTANTS)
+
+        for (i, emp) in enumerate(employees):
+            m = alone(emp, lambda m: emp.get('sales_orders', []))
+            for name in NODES:
+                assert abs(res[name][i] - getattr(m, name)) < 1e-6
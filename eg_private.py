@@ -22,7 +22,9 @@ GRANTS = [
     # in a few easy things you can find (such as number of shares, and
     # strike price), as well as three rows from your vesting schedule.
     # Using those three rows, it'll work out the vesting schedule for
-    # you.  Check the definition in position.py for more details.
+    # you.  Check the definition in position.py for more details.  If
+    # you'd rather load every grant from a vesting export, see
+    # importer.load.
     from_table(name='RSU-TK421',
                vehicle='rsu',
                first_date='1/1/19', first_val=1500,
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+
+import math
+
+import numpy as np
+
+import income as myMeager
+from position import GrantBook
+from position import VEHICLES
+from report import comma
+
+
+# Up to this many grants we can afford to try every combination (split
+# into two halves of 2^12 sums each); beyond it we fall back on the DP.
+MITM_MAX_N = 24
+
+# Largest subset-sum (in quanta) the DP tracks.  Share counts beyond
+# this get quantized, which costs at most half a quantum per grant (a
+# whole one with at_least, which rounds down so as never to fall short).
+DP_MAX_BITS = 1 << 18
+
+
+def _half_sums(weights):
+    """Sums of every subset of weights; bit k of the index is grant k."""
+    sums = np.zeros(1, dtype=np.int64)
+    for w in weights:
+        sums = np.concatenate([sums, sums + w])
+    return sums
+
+
+def _mitm(weights, target, at_least):
+    """Exact subset sum by meet-in-the-middle."""
+    n = len(weights)
+    if at_least and int(weights.sum()) < target:
+        # Nothing gets there, so the closest is the largest (as in _dp)
+        at_least = False
+    h = n // 2
+    left = _half_sums(weights[:h])
+    right = _half_sums(weights[h:])
+    order = np.argsort(right, kind='stable')
+    right = right[order]
+
+    # For every left sum, the right sums just below and above the gap
+    want = target - left
+    hi = np.minimum(np.searchsorted(right, want, side='left'), len(right)-1)
+    lo = np.maximum(np.searchsorted(right, want, side='right') - 1, 0)
+
+    best = None
+    for j in (lo, hi):
+        tot = left + right[j]
+        if at_least:
+            err = np.where(tot >= target, tot - target, np.iinfo(np.int64).max)
+        else:
+            err = np.abs(tot - target)
+        i = int(err.argmin())
+        if best is None or err[i] < best[0]:
+            best = (err[i], i, int(order[j[i]]))
+
+    (_, i, k) = best
+    chosen = np.zeros(n, dtype=bool)
+    chosen[:h] = [ bool((i >> b) & 1) for b in range(h) ]
+    chosen[h:] = [ bool((k >> b) & 1) for b in range(n - h) ]
+    return chosen
+
+
+def _dp(weights, target, at_least, max_bits):
+    """Subset sum using a python int as the bitset of reachable sums.
+
+    Each layer is kept so the choice can be walked back afterwards.
+    """
+    total = int(np.sum(weights))
+    q = max(1, int(math.ceil(total / float(max_bits))))
+    if at_least:
+        # Rounding down means the real sum is never below what the DP
+        # sees, so reaching t in quanta reaches target in shares
+        wq = [ int(w // q) for w in weights ]
+        t = int(math.ceil(target / float(q)))
+    else:
+        wq = [ int(round(w / float(q))) for w in weights ]
+        t = int(round(target / float(q)))
+    t = max(0, t)
+
+    layers = [1]
+    for w in wq:
+        layers.append(layers[-1] | (layers[-1] << w))
+    reach = layers[-1]
+
+    # Closest reachable sum at or above t, and at or below it
+    above = reach >> t
+    up = None
+    if above:
+        up = t + ((above & -above).bit_length() - 1)
+    below = reach & ((1 << (t + 1)) - 1)
+    down = below.bit_length() - 1 if below else None
+
+    if at_least and up is not None:
+        s = up
+    elif down is None:
+        s = up
+    elif up is None:
+        s = down
+    else:
+        s = up if (up - t) < (t - down) else down
+
+    chosen = np.zeros(len(weights), dtype=bool)
+    for i in range(len(wq), 0, -1):
+        if not (layers[i-1] >> s) & 1:
+            chosen[i-1] = True
+            s -= wq[i-1]
+    return chosen
+
+
+def best_subset(weights, target, at_least=False, max_bits=DP_MAX_BITS):
+    """Picks the subset of weights whose sum lands closest to target.
+
+    weights:  non-negative integer weights
+    target:   sum we're aiming for
+    at_least: only accept sums >= target (if none gets there,
+              the largest sum)
+    max_bits: see DP_MAX_BITS
+
+    Small sets are solved exactly by meet-in-the-middle.  Larger ones
+    go through a bitset DP, which is exact as long as the sum of the
+    weights fits in max_bits.
+
+    returns: np.array of bools, True for each weight in the subset
+    """
+    weights = np.asarray(weights, dtype=np.int64)
+    if not len(weights):
+        return np.zeros(0, dtype=bool)
+    if len(weights) <= MITM_MAX_N:
+        return _mitm(weights, target, at_least)
+    return _dp(weights, target, at_least, max_bits)
+
+
+def elect(vested, rate, target_frac, at_least=False, names=None):
+    """Chooses sell-all vs sell-to-cover per grant to hit a sell fraction.
+
+    A sell-to-cover grant only gives up the shares withheld for taxes
+    (rate), a sell-all grant gives up everything.
+
+    vested:      vested shares per RSU grant
+    rate:        withholding rate (e.g. m.shares_withheld_rsu_rate)
+    target_frac: fraction of all vested shares we want gone
+    at_least:    never fall short of the target (e.g. to cover taxes)
+    names:       grant names (default: their indices)
+
+    returns: {
+        'sell_all':      [<name>, ...],
+        'sell_to_cover': [<name>, ...],
+        'shares_n':      shares that leave (sold + withheld),
+        'frac':          that as a fraction of everything vested,
+        'target_frac':   target_frac,
+        }
+    """
+    vested = np.asarray(vested, dtype=np.int64)
+    if names is None: names = list(range(len(vested)))
+    total = int(vested.sum())
+
+    # Everyone gives up rate*v; sell-all grants give up the rest too.
+    # So we want the sell-all set to add up to this:
+    want = (target_frac - rate) * total / (1.0 - rate)
+    chosen = best_subset(vested, want, at_least=at_least)
+
+    shares = rate * total + (1.0 - rate) * int(vested[chosen].sum())
+    return {
+        'sell_all': [ n for (n, c) in zip(names, chosen) if c ],
+        'sell_to_cover': [ n for (n, c) in zip(names, chosen) if not c ],
+        'shares_n': shares,
+        'frac': shares / total if total else 0.0,
+        'target_frac': target_frac,
+        }
+
+
+def describe(res):
+    """A few lines of text saying what elect() came up with."""
+    return '\n'.join([
+        'Sell all:       %s' % ', '.join(map(str, res['sell_all'])),
+        'Sell to cover:  %s' % ', '.join(map(str, res['sell_to_cover'])),
+        'Shares leaving: %s (%.2f%%, aiming for %.2f%%)'
+        % (comma(res['shares_n'], dec=False, white=False),
+           100.0 * res['frac'], 100.0 * res['target_frac']),
+        ])
+
+
+def rsu_elections(m, target_frac, at_least=False):
+    """elect() for the vested RSU grants in the model.
+
+    Uses what's vested (and not yet liquidated) on the query date, and
+    the model's RSU withholding rate.
+    """
+    grants = m.grants_lst
+    if isinstance(grants, GrantBook):
+        rsu = grants.vehicle == VEHICLES.index('rsu')
+        vested = grants.vested_unliquidated(m.query_date)[rsu]
+        names = list(grants.name[rsu])
+    else:
+        grants = [ g for g in grants if g.vehicle == 'rsu' ]
+        vested = [ g.vested_unliquidated(m.query_date) for g in grants ]
+        names = [ g.name for g in grants ]
+    return elect(vested, m.shares_withheld_rsu_rate, target_frac,
+                 at_least=at_least, names=names)
+
+
+def sales_orders_elections(m, elections, price=None):
+    """Sales orders selling everything left in the sell-all grants.
+
+    The sell-to-cover grants don't need orders: sales_simulation
+    already withholds from every grant.
+    """
+    sell_all = set(elections['sell_all'])
+    return [ o for o in myMeager.sales_orders_rsu(m, price=price)
+             if o['id'] in sell_all ]
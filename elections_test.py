@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+import itertools
+
+import numpy as np
+import pytest
+
+import elections
+from position import GrantBook
+from sweep_test import GRANTS
+from sweep_test import model
+
+
+def brute(weights, target, at_least):
+    best = None
+    for mask in itertools.product([False, True], repeat=len(weights)):
+        s = sum([ w for (w, c) in zip(weights, mask) if c ])
+        if at_least and s < target:
+            continue
+        if best is None or abs(s - target) < best:
+            best = abs(s - target)
+    if best is None:
+        # Nothing reaches the target: the largest sum will have to do
+        return brute(weights, target, False)
+    return best
+
+
+class TestElections(object):
+
+    def test_best_subset(self):
+        rng = np.random.RandomState(7)
+        for trial in range(50):
+            w = rng.randint(0, 1000, rng.randint(1, 11))
+            t = rng.uniform(-10, w.sum() * 1.2 + 10)
+            for at_least in (False, True):
+                best = brute(w, t, at_least)
+                for chosen in (elections._mitm(w, t, at_least),
+                               elections._dp(w, t, at_least, 1 << 20)):
+                    s = w[chosen].sum()
+                    if at_least and w.sum() >= t: assert s >= t
+                    assert abs(s - t) <= best + 0.5
+
+    def test_best_subset_large_at_least(self):
+        # Enough grants for the DP, and enough shares to be quantized
+        rng = np.random.RandomState(5)
+        for trial in range(20):
+            w = rng.randint(100, 20000, 60)
+            assert w.sum() > elections.DP_MAX_BITS
+            t = w.sum() * rng.uniform(0.05, 0.95)
+            chosen = elections.best_subset(w, t, at_least=True)
+            assert w[chosen].sum() >= t
+
+        vested = np.random.RandomState(0).randint(100, 20000, 60)
+        res = elections.elect(vested, 0.22, 0.5, at_least=True)
+        assert res['frac'] >= 0.5
+
+    def test_best_subset_unreachable(self):
+        w = np.array([700, 900, 231, 1000])
+        for at_least in (False, True):
+            for chosen in (elections._mitm(w, 3116, at_least),
+                           elections._dp(w, 3116, at_least, 1 << 20),
+                           elections.best_subset(w, 3116, at_least)):
+                assert chosen.all()
+
+    def test_best_subset_large(self):
+        rng = np.random.RandomState(3)
+        w = rng.randint(100, 20000, 300)
+        t = w.sum() * 0.37
+        chosen = elections.best_subset(w, t)
+        assert 300 == len(chosen)
+        # quantized, but never by more than half a quantum per grant
+        q = np.ceil(w.sum() / float(elections.DP_MAX_BITS))
+        assert abs(w[chosen].sum() - t) <= q * len(w) / 2.0
+
+    def test_elect(self):
+        vested = [10000, 20000, 2000, 50000]
+        res = elections.elect(vested, 0.22, 0.5,
+                              names=['a', 'b', 'c', 'd'])
+        # Want (0.5 - 0.22) * 82000 / 0.78 = 29436 of them sold outright
+        assert ['a', 'b'] == res['sell_all']
+        assert ['c', 'd'] == res['sell_to_cover']
+        assert abs(res['frac'] - (0.22 + 0.78 * 30000 / 82000.)) < 1e-9
+
+        res = elections.elect(vested, 0.22, 0.5, at_least=True)
+        assert res['frac'] >= 0.5
+
+        res = elections.elect(vested, 0.22, 0.0)
+        assert [] == res['sell_all']
+        assert abs(res['frac'] - 0.22) < 1e-9
+
+    def test_rsu_elections(self, model):
+        m = model
+        res = elections.rsu_elections(m, 1.0)
+        assert ['rsu'] == res['sell_all']
+        orders = elections.sales_orders_elections(m, res)
+        assert ['rsu'] == [ o['id'] for o in orders ]
+
+        res = elections.rsu_elections(m, 0.0)
+        assert ['rsu'] == res['sell_to_cover']
+        assert [] == elections.sales_orders_elections(m, res)
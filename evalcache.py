@@ -0,0 +1,412 @@
+#!/usr/bin/env python
+
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import types
+
+import numpy as np
+
+import sweep
+
+
+# Default cache file (in the directory you run from)
+PATH = '.evalcache.sqlite'
+
+# Most values kept before the least recently used results are dropped
+MAX_ENTRIES = 5000000
+
+# Changing any of these changes what the model computes
+CODE = ['taxes.py', 'income.py', 'position.py']
+
+# One row per (model, node): the prices seen so far (sorted) and the
+# node's value at each of them, as raw float64 arrays
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key    TEXT PRIMARY KEY,
+    prices BLOB NOT NULL,
+    vals   BLOB NOT NULL,
+    n      INTEGER NOT NULL,
+    used   INTEGER NOT NULL
+);
+"""
+
+# What identifies a grant (see GrantBook.from_grants)
+GRANT_FIELDS = ['name', 'vehicle', 'n_shares', 'n_cliff', 'exercised',
+                'sold', 'strike_usd', 'start', 'n_periods', 'period_months',
+                'negative_cliff', 'withheld', 'liquidated']
+
+_code = None
+
+
+def code_fingerprint():
+    """Hash of the model's source (so editing it empties the cache)."""
+    global _code
+    if _code is None:
+        import pylink
+        h = hashlib.sha256()
+        h.update(str(getattr(pylink, '__version__', '')).encode())
+        here = os.path.dirname(os.path.abspath(__file__))
+        for fname in CODE:
+            with open(os.path.join(here, fname), 'rb') as fd:
+                h.update(fd.read())
+        _code = h.hexdigest()
+    return _code
+
+
+def _grants(grants):
+    """The grants as columns, whether a list of Grants or a GrantBook."""
+    from position import GrantBook
+    if not isinstance(grants, GrantBook):
+        grants = list(grants)
+        grants = dict([ (f, [ _canonical(getattr(g, f)) for g in grants ])
+                        for f in GRANT_FIELDS ])
+        return ['grants', grants]
+    retval = dict([ (f, _canonical(getattr(grants, f)))
+                    for f in GRANT_FIELDS + ['owner', 'n_owners'] ])
+    return ['book', retval]
+
+
+def _is_grant(v):
+    from position import Grant
+    return isinstance(v, Grant)
+
+
+def _code_of(code):
+    """The bytecode, names and constants (nested functions too)."""
+    consts = []
+    for c in code.co_consts:
+        if isinstance(c, types.CodeType):
+            consts.append(_code_of(c))
+        elif isinstance(c, bytes):
+            consts.append(['bytes', c.hex()])
+        elif c is Ellipsis:
+            consts.append(['Ellipsis'])
+        else:
+            consts.append(_canonical(c))
+    return [hashlib.sha256(code.co_code).hexdigest(),
+            list(code.co_names), consts]
+
+
+def _names(code):
+    """Every global (or attribute) name code, or code within it, uses."""
+    retval = set(code.co_names)
+    for c in code.co_consts:
+        if isinstance(c, types.CodeType):
+            retval |= _names(c)
+    return retval
+
+
+_sources = {}
+
+
+def _source(name):
+    """Hash of a module's source file (None if it hasn't got one).
+
+    Kept until the file's size or modification time changes.
+    """
+    path = getattr(sys.modules.get(name), '__file__', None)
+    if not path or not path.endswith('.py'):
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (path, st.st_mtime_ns, st.st_size)
+    if key not in _sources:
+        with open(path, 'rb') as fd:
+            _sources[key] = hashlib.sha256(fd.read()).hexdigest()
+    return _sources[key]
+
+
+def _identity(v):
+    """Which thing a global name refers to (not its contents).
+
+    Modules, functions and classes are named by where they live, along
+    with the source of the module they live in (so editing a helper
+    changes the key); anything else has to be something _canonical
+    can vouch for.
+    """
+    if isinstance(v, types.ModuleType):
+        return ['module', v.__name__, _source(v.__name__)]
+    if isinstance(v, (types.FunctionType, types.BuiltinFunctionType, type)):
+        mod = getattr(v, '__module__', None)
+        return [type(v).__name__, mod,
+                getattr(v, '__qualname__', v.__name__), _source(mod)]
+    return _canonical(v)
+
+
+def _canonical(v):
+    """Something json can dump the same way every time for v.
+
+    Raises TypeError for anything we can't vouch for (such as objects
+    whose repr is just their address).
+    """
+    from position import GrantBook
+
+    if v is None or isinstance(v, (bool, int, float, str)):
+        return v
+    if isinstance(v, (np.bool_, np.integer, np.floating)):
+        return v.item()
+    if isinstance(v, (datetime.date, datetime.datetime)):
+        return ['date', v.isoformat()]
+    if isinstance(v, np.ndarray):
+        if v.dtype == object:
+            return ['ndarray', list(v.shape), _canonical(v.tolist())]
+        return ['ndarray', v.dtype.str, list(v.shape),
+                hashlib.sha256(np.ascontiguousarray(v).tobytes()).hexdigest()]
+    if isinstance(v, dict):
+        items = [ [_canonical(k), _canonical(x)] for (k, x) in v.items() ]
+        return ['dict', sorted(items, key=json.dumps)]
+    if isinstance(v, GrantBook):
+        return _grants(v)
+    if _is_grant(v):
+        return _grants([v])
+    if isinstance(v, (list, tuple)):
+        if v and all([ _is_grant(g) for g in v ]):
+            return _grants(v)
+        return [ _canonical(x) for x in v ]
+    if isinstance(v, (set, frozenset)):
+        return ['set', sorted([ _canonical(x) for x in v ], key=json.dumps)]
+    if isinstance(v, types.FunctionType):
+        # Its code (and its module's source), the globals it refers
+        # to, and whatever it closes over (e.g. flags)
+        cells = [ c.cell_contents for c in (v.__closure__ or []) ]
+        names = sorted(_names(v.__code__))
+        used = [ [n, _identity(v.__globals__[n])] for n in names
+                 if n in v.__globals__ ]
+        return ['function', v.__module__, v.__qualname__,
+                _source(v.__module__),
+                _code_of(v.__code__),
+                used,
+                _canonical(cells),
+                _canonical(v.__defaults__),
+                _canonical(v.__kwdefaults__)]
+    if isinstance(v, (types.BuiltinFunctionType, types.ModuleType, type)):
+        return _identity(v)
+    if hasattr(v, '__dict__') and not hasattr(v, 'enum'):
+        # (a model as an argument would be anything but stable)
+        return ['object', type(v).__module__, type(v).__qualname__,
+                _canonical(vars(v))]
+    raise TypeError("Can't fingerprint %r" % (v,))
+
+
+def _hash(*parts):
+    return hashlib.sha256(json.dumps(_canonical(list(parts)),
+                                     sort_keys=True).encode()).hexdigest()
+
+
+def fingerprint(m, skip=()):
+    """Hash of everything the model's answers depend upon.
+
+    That's the code, the grants (grants_lst), every static or
+    overridden node (constants, tax tables, orders, ...) and which
+    nodes are calculated, but not the tributaries themselves.
+
+    skip: names of nodes to leave out (ones about to be overridden)
+    """
+    import parallel
+    snap = parallel.snapshot(m)
+    static = dict([ (k, v) for (k, v) in snap['static'].items()
+                    if k not in skip ])
+    overridden = dict([ (k, v) for (k, v) in snap['overridden'].items()
+                        if k not in skip ])
+    return _hash(code_fingerprint(),
+                 type(m).__module__, type(m).__qualname__,
+                 snap['calculated'], snap['grants'], static, overridden)
+
+
+class Cache(object):
+    """Node values on disk, keyed by the model's fingerprint.
+
+        cache = Cache()
+        res = cache.sweep(m, prices, nodes, orders=...)
+
+    Values are stored against a hash of the model (see fingerprint),
+    the node, and anything else that went into them (orders,
+    overrides), along with the share prices they were computed at.
+    Asking again with anything changed simply misses.  Once there are
+    more than max_entries values, the least recently used results are
+    dropped.
+    """
+
+    def __init__(self, path=PATH, max_entries=MAX_ENTRIES):
+        """path:        SQLite file (':memory:' for a throwaway cache)
+        max_entries: most values (points) to keep
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        with self.db:
+            self.db.executescript(SCHEMA)
+        (self._tick,) = self.db.execute(
+            'SELECT COALESCE(MAX(used), 0) FROM results').fetchone()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        """Number of values stored."""
+        return self.db.execute(
+            'SELECT COALESCE(SUM(n), 0) FROM results').fetchone()[0]
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def clear(self):
+        with self.db:
+            self.db.execute('DELETE FROM results')
+
+    def load(self, key):
+        """(<sorted prices>, <values>) stored for key (empty if none).
+
+        Marks them as just used.  Like store, this doesn't commit; wrap
+        a batch of calls in "with cache.db:".
+        """
+        row = self.db.execute('SELECT prices, vals FROM results WHERE key=?',
+                              (key,)).fetchone()
+        if row is None:
+            return (np.zeros(0), np.zeros(0))
+        self.db.execute('UPDATE results SET used=? WHERE key=?',
+                        (self._tick, key))
+        return (np.frombuffer(row[0]), np.frombuffer(row[1]))
+
+    def store(self, key, prices, values):
+        """Replaces what's stored for key (prices must be sorted)."""
+        prices = np.ascontiguousarray(prices, dtype=float)
+        values = np.ascontiguousarray(values, dtype=float)
+        self.db.execute('INSERT OR REPLACE INTO results '
+                        '(key, prices, vals, n, used) VALUES (?, ?, ?, ?, ?)',
+                        (key, prices.tobytes(), values.tobytes(),
+                         len(prices), self._tick))
+
+    def evict(self):
+        """Drops the least recently used results beyond max_entries."""
+        rows = self.db.execute(
+            'SELECT key, n FROM results ORDER BY used DESC').fetchall()
+        total = 0
+        drop = []
+        for (key, n) in rows:
+            total += n
+            if self.max_entries < total:
+                drop.append((key,))
+        if drop:
+            with self.db:
+                self.db.executemany('DELETE FROM results WHERE key=?', drop)
+
+    def sweep(self, m, prices, nodes, orders=None, **overrides):
+        """sweep.price_sweep, only computing the prices we don't have.
+
+        The prices missing for any of the nodes are pushed through the
+        model in a single pass (all of the nodes at once), and merged
+        into what's stored for next time.  Array-valued overrides are
+        one value per price, so they go straight to price_sweep without
+        the cache, as do order generators we can't fingerprint.
+
+        returns: {<node name>: <np.array shaped like prices>, ...}
+        """
+        if any([ np.ndim(v) for v in overrides.values() ]):
+            return sweep.price_sweep(m, prices, nodes, orders=orders,
+                                     **overrides)
+
+        prices = np.asarray(prices, dtype=float)
+        flat = prices.ravel()
+
+        skip = ['ipo_price_usd'] + list(overrides.keys())
+        if orders is not None: skip.append('sales_orders')
+        try:
+            base = _hash(fingerprint(m, skip), orders, overrides)
+        except TypeError:
+            return sweep.price_sweep(m, prices, nodes, orders=orders,
+                                     **overrides)
+
+        self._tick += 1
+        with self.db:
+            stored = {}
+            missing = np.zeros(len(flat), dtype=bool)
+            last = None
+            for name in nodes:
+                (have, vals) = self.load(base + ':' + name)
+                if last is not None and np.array_equal(have, last[0]):
+                    # Usually the nodes were all stored at the same prices
+                    (pos, hit) = last[1:]
+                elif len(have):
+                    pos = np.minimum(np.searchsorted(have, flat),
+                                     len(have) - 1)
+                    hit = have[pos] == flat
+                else:
+                    pos = np.zeros(len(flat), dtype=int)
+                    hit = np.zeros(len(flat), dtype=bool)
+                last = (have, pos, hit)
+                stored[name] = (have, vals, pos, hit)
+                missing |= ~hit
+
+            todo = np.unique(flat[missing])
+            self.hits += int((~missing).sum())
+            self.misses += int(missing.sum())
+            new = {}
+            if len(todo):
+                new = sweep.price_sweep(m, todo, nodes, orders=orders,
+                                        **overrides)
+
+            res = {}
+            for name in nodes:
+                (have, vals, pos, hit) = stored[name]
+                out = np.empty(len(flat))
+                out[hit] = vals[pos[hit]]
+                if len(todo):
+                    # Merge the new points in with the old
+                    every = np.concatenate([have, todo])
+                    order = np.argsort(every, kind='stable')
+                    (every, first) = np.unique(every[order],
+                                               return_index=True)
+                    merged = np.concatenate([vals, new[name]])[order][first]
+                    self.store(base + ':' + name, every, merged)
+                    idx = np.searchsorted(every, flat[~hit])
+                    out[~hit] = merged[idx]
+                res[name] = out.reshape(prices.shape)
+        if len(todo): self.evict()
+        return res
+
+    def collect(self, m, nodes):
+        """Current values of some (numeric) nodes, via the cache.
+
+        Only single numbers are stored (not a cohort's arrays).
+
+        returns: {<node name>: <value>, ...}
+        """
+        price = float(m.ipo_price_usd)
+        base = _hash(fingerprint(m, ['ipo_price_usd']))
+
+        self._tick += 1
+        added = False
+        retval = {}
+        with self.db:
+            for name in nodes:
+                key = base + ':' + name
+                (have, vals) = self.load(key)
+                i = np.searchsorted(have, price)
+                if i < len(have) and have[i] == price:
+                    self.hits += 1
+                    retval[name] = float(vals[i])
+                    continue
+                self.misses += 1
+                retval[name] = getattr(m, name)
+                if not np.ndim(retval[name]):
+                    self.store(key, np.insert(have, i, price),
+                               np.insert(vals, i, float(retval[name])))
+                    added = True
+        if added: self.evict()
+        return retval
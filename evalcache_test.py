@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+
+import sys
+
+import numpy as np
+import pytest
+
+import evalcache
+import income as myMeager
+import parallel
+import report
+import scenarios
+import sweep
+from position import GrantBook
+from sweep_test import GRANTS
+from sweep_test import model
+
+
+NODES = ['outstanding_taxes_usd', 'cleared_from_sale_usd', 'amt_taxes_usd']
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with evalcache.Cache(str(tmp_path / 'cache.sqlite')) as c:
+        yield c
+
+
+class TestFingerprint(object):
+
+    def test_stable(self, model):
+        fp = evalcache.fingerprint(model)
+        assert fp == evalcache.fingerprint(model)
+        assert fp == evalcache.fingerprint(
+            parallel.rebuild(parallel.snapshot(model)))
+
+    def test_changes(self, model):
+        fp = evalcache.fingerprint(model)
+        skip = evalcache.fingerprint(model, ['reg_income_usd'])
+
+        model.override(model.enum.reg_income_usd, model.reg_income_usd + 1)
+        assert fp != evalcache.fingerprint(model)
+        assert skip == evalcache.fingerprint(model, ['reg_income_usd'])
+
+        fp = evalcache.fingerprint(model)
+        model.override(model.enum.grants_lst, GRANTS[:2])
+        assert fp != evalcache.fingerprint(model)
+
+    def test_grants(self, model):
+        fp = evalcache.fingerprint(model)
+        model.override(model.enum.grants_lst, GrantBook.from_grants(GRANTS))
+        assert fp != evalcache.fingerprint(model)
+
+    def test_orders(self):
+        def __orders(flag):
+            return lambda m, price: flag
+        assert (evalcache._hash(__orders(True))
+                == evalcache._hash(__orders(True)))
+        assert (evalcache._hash(__orders(True))
+                != evalcache._hash(__orders(False)))
+
+        strat = scenarios.Strategy(myMeager.sales_orders_all, nso_first=True)
+        same = scenarios.Strategy(myMeager.sales_orders_all, nso_first=True)
+        other = scenarios.Strategy(myMeager.sales_orders_all, nso_first=False)
+        assert evalcache._hash(strat) == evalcache._hash(same)
+        assert evalcache._hash(strat) != evalcache._hash(other)
+
+    def test_orders_code(self):
+        # Same bytecode, different callee or constant
+        rsu = lambda m, p: myMeager.sales_orders_rsu(m, price=p)
+        every = lambda m, p: myMeager.sales_orders_all(m, price=p)
+        held = lambda m, p: myMeager.sales_orders_all(m, price=p,
+                                                      restricted=True)
+        free = lambda m, p: myMeager.sales_orders_all(m, price=p,
+                                                      restricted=False)
+        assert evalcache._hash(rsu) != evalcache._hash(every)
+        assert evalcache._hash(held) != evalcache._hash(free)
+
+        def __nested(flag):
+            def __orders(m, p):
+                return (lambda: myMeager.sales_orders_all(m, price=p,
+                                                          restricted=flag))()
+            return __orders
+        assert (evalcache._hash(__nested(True))
+                != evalcache._hash(__nested(False)))
+
+    def test_orders_helper(self, tmp_path, monkeypatch):
+        # Editing a helper the orders call (outside the model's own
+        # code) changes the key, even across runs
+        path = tmp_path / 'my_helpers.py'
+        path.write_text('def orders(m, p):\n    return []\n')
+        monkeypatch.syspath_prepend(str(tmp_path))
+        import my_helpers
+        monkeypatch.setitem(sys.modules, 'my_helpers', my_helpers)
+        orders = lambda m, p: my_helpers.orders(m, p)
+        before = evalcache._hash(orders)
+        assert before == evalcache._hash(orders)
+
+        path.write_text('def orders(m, p):\n    return [{}]\n')
+        assert before != evalcache._hash(orders)
+
+    def test_orders_unknown(self):
+        # Globals we can't vouch for aren't cached at all
+        with pytest.raises(TypeError):
+            evalcache._hash(lambda m, p: _UNKNOWN)
+
+
+_UNKNOWN = object()
+
+
+class TestCache(object):
+
+    def test_sweep(self, model, cache):
+        x = np.linspace(5, 25, 21)
+        orders = myMeager.sales_orders_rsu
+        expected = sweep.price_sweep(model, x, NODES, orders=orders)
+
+        res = cache.sweep(model, x, NODES, orders=orders)
+        assert (0, 21) == (cache.hits, cache.misses)
+        for name in NODES:
+            assert np.allclose(expected[name], res[name])
+
+        # Only the new points get computed
+        y = np.linspace(5, 25, 41)
+        res = cache.sweep(model, y, NODES, orders=orders)
+        assert (21, 41) == (cache.hits, cache.misses)
+        expected = sweep.price_sweep(model, y, NODES, orders=orders)
+        for name in NODES:
+            assert np.allclose(expected[name], res[name])
+        assert 41 * len(NODES) == len(cache)
+
+        # A different model misses
+        model.override(model.enum.reg_income_usd, 250000)
+        res = cache.sweep(model, x, NODES, orders=orders)
+        assert 41 + 21 == cache.misses
+        expected = sweep.price_sweep(model, x, NODES, orders=orders)
+        for name in NODES:
+            assert np.allclose(expected[name], res[name])
+
+    def test_orders(self, model, cache):
+        x = [10, 20, 30]
+        rsu = lambda m, p: myMeager.sales_orders_rsu(m, price=p)
+        every = lambda m, p: myMeager.sales_orders_all(m, price=p)
+        for orders in [rsu, every]:
+            res = cache.sweep(model, x, ['total_income_usd'], orders=orders)
+            expected = sweep.price_sweep(model, x, ['total_income_usd'],
+                                         orders=orders)
+            assert np.allclose(expected['total_income_usd'],
+                               res['total_income_usd'])
+        assert (0, 6) == (cache.hits, cache.misses)
+
+    def test_persist(self, model, tmp_path):
+        path = str(tmp_path / 'cache.sqlite')
+        x = np.linspace(5, 25, 11)
+        with evalcache.Cache(path) as c:
+            first = c.sweep(model, x, NODES)
+        with evalcache.Cache(path) as c:
+            again = c.sweep(parallel.rebuild(parallel.snapshot(model)),
+                            x, NODES)
+            assert (11, 0) == (c.hits, c.misses)
+        for name in NODES:
+            assert (first[name] == again[name]).all()
+
+    def test_lru(self, model, cache):
+        cache.max_entries = 2 * 10
+        x = np.linspace(5, 25, 10)
+        cache.sweep(model, x, ['outstanding_taxes_usd'])
+        cache.sweep(model, x, ['cleared_from_sale_usd'])
+        cache.sweep(model, x, ['outstanding_taxes_usd'])
+        cache.sweep(model, x, ['amt_taxes_usd'])
+        assert 20 == len(cache)
+
+        # cleared_from_sale_usd was the least recently used
+        (hits, misses) = (cache.hits, cache.misses)
+        cache.sweep(model, x, ['outstanding_taxes_usd'])
+        cache.sweep(model, x, ['cleared_from_sale_usd'])
+        assert (hits + 10, misses + 10) == (cache.hits, cache.misses)
+
+    def test_collect(self, model, cache):
+        rec = report.Report(model).collect()
+        cached = report.Report(model, cache=cache)
+        assert rec == cached.collect()
+        assert 0 == cache.hits
+        assert rec == cached.collect()
+        assert len(report.TAX_NODES) == cache.hits
+        assert (report.Report(model).render('text')
+                == cached.render('text'))
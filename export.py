@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+
+import csv
+import datetime
+import itertools
+import os
+import warnings
+
+import numpy as np
+
+import sweep
+
+
+# Rows per chunk when we're the ones doing the chunking
+CHUNK = 100000
+
+FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    }
+
+ARROW_WARNING = """
+pyarrow isn't installed, so %s is being written as CSV instead (%s).
+pip install pyarrow to get Parquet/Arrow files.
+"""
+
+
+def _pyarrow():
+    """pyarrow, or None if it isn't installed."""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def _column(v, n):
+    """A batch column as a 1-D numpy array of n values."""
+    v = np.asarray(v)
+    if v.ndim == 0:
+        v = np.full(n, v.item())
+    return v.ravel()
+
+
+def _batch(batch):
+    n = max([ np.size(v) for v in batch.values() ])
+    return dict([ (name, _column(v, n)) for (name, v) in batch.items() ])
+
+
+class CSVWriter(object):
+    """Streams batches of columns into a CSV file.
+
+    The columns (and their order) are fixed by the first batch.
+    """
+
+    fmt = 'csv'
+
+    def __init__(self, path):
+        self.path = path
+        self.columns = None
+        self.rows = 0
+        self._fd = open(path, 'w', newline='')
+        self._csv = csv.writer(self._fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, batch):
+        """batch: {<column>: <np.array or scalar>, ...}"""
+        batch = _batch(batch)
+        if self.columns is None:
+            self.columns = list(batch.keys())
+            self._csv.writerow(self.columns)
+        assert(set(batch.keys()) == set(self.columns))
+
+        # tolist() hands back python floats, which print shortest-exact
+        cols = [ batch[c].tolist() for c in self.columns ]
+        self._csv.writerows(zip(*cols))
+        self.rows += len(cols[0]) if cols else 0
+
+    def close(self):
+        if self._fd is not None:
+            self._fd.close()
+            self._fd = None
+
+
+class ArrowWriter(object):
+    """Streams batches of columns into a Parquet or Arrow IPC file.
+
+    Each batch becomes a row group (Parquet) or record batch (Arrow),
+    so only one batch is ever held in memory.
+    """
+
+    def __init__(self, path, fmt='parquet'):
+        assert(fmt in ['parquet', 'arrow'])
+        self.pa = _pyarrow()
+        assert(self.pa is not None)
+        self.path = path
+        self.fmt = fmt
+        self.columns = None
+        self.rows = 0
+        self._schema = None
+        self._sink = None
+        self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _open(self, schema):
+        pa = self.pa
+        self._schema = schema
+        if 'parquet' == self.fmt:
+            self._writer = pa.parquet.ParquetWriter(self.path, schema)
+        else:
+            self._sink = pa.OSFile(self.path, 'wb')
+            self._writer = pa.ipc.new_file(self._sink, schema)
+
+    def write(self, batch):
+        """batch: {<column>: <np.array or scalar>, ...}"""
+        pa = self.pa
+        batch = _batch(batch)
+        if self.columns is None:
+            self.columns = list(batch.keys())
+        assert(set(batch.keys()) == set(self.columns))
+
+        arrays = [ pa.array(batch[c].tolist() if batch[c].dtype == object
+                            else batch[c])
+                   for c in self.columns ]
+        if self._writer is None:
+            self._open(pa.schema([ (c, a.type)
+                                   for (c, a) in zip(self.columns, arrays) ]))
+        rb = pa.RecordBatch.from_arrays(arrays, schema=self._schema)
+        if 'parquet' == self.fmt:
+            self._writer.write_table(pa.Table.from_batches([rb]))
+        else:
+            self._writer.write_batch(rb)
+        self.rows += rb.num_rows
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+
+def open_writer(path, fmt=None):
+    """A writer for path, picking the format from its extension.
+
+    fmt: 'csv', 'parquet' or 'arrow' (default: from the extension)
+
+    Parquet and Arrow need pyarrow; without it we warn and write CSV
+    next to the requested path instead (check the writer's path).
+    """
+    if fmt is None:
+        ext = os.path.splitext(path)[1].lower()
+        fmt = FORMATS.get(ext, 'csv')
+    assert(fmt in ['csv', 'parquet', 'arrow'])
+
+    if 'csv' != fmt:
+        if _pyarrow() is not None:
+            return ArrowWriter(path, fmt)
+        csv_path = os.path.splitext(path)[0] + '.csv'
+        warnings.warn(ARROW_WARNING % (path, csv_path))
+        path = csv_path
+    return CSVWriter(path)
+
+
+def chunks(data, chunk=CHUNK):
+    """Splits {<column>: <np.array>} into batches of up to chunk rows."""
+    data = _batch(data)
+    n = len(next(iter(data.values()))) if data else 0
+    for lo in range(0, n, chunk):
+        yield dict([ (name, v[lo:lo+chunk]) for (name, v) in data.items() ])
+
+
+def write(path, data, chunk=CHUNK, fmt=None):
+    """Writes columns out to path.
+
+    data: either {<column>: <np.array>, ...} (e.g. from price_sweep or
+          montecarlo.simulate), or an iterable of such batches (e.g.
+          iter_sweep, montecarlo.iter_simulate) which is streamed
+    chunk: rows per batch when data is a single dict
+
+    returns: the writer (closed), for its path, columns and rows
+    """
+    if isinstance(data, dict):
+        data = chunks(data, chunk)
+    with open_writer(path, fmt) as writer:
+        for batch in data:
+            writer.write(batch)
+    return writer
+
+
+def iter_sweep(m, prices, nodes, chunk=CHUNK, orders=None, **overrides):
+    """sweep.price_sweep, a chunk of prices at a time.
+
+    prices may be any iterable (even a generator), so the whole sweep
+    never needs to be in memory.
+
+    yields: {'ipo_price_usd': <prices>, <node>: <np.array>, ...}
+    """
+    it = iter(prices)
+    while True:
+        x = np.fromiter(itertools.islice(it, chunk), dtype=float)
+        if not len(x):
+            return
+        retval = {'ipo_price_usd': x}
+        retval.update(sweep.price_sweep(m, x, nodes, orders=orders,
+                                        **overrides))
+        yield retval
+
+
+def export_sweep(path, m, prices, nodes, chunk=CHUNK, fmt=None, orders=None,
+                 **overrides):
+    """Streams a price sweep into a file, one column per node.
+
+    See iter_sweep and sweep.price_sweep for the arguments.
+    """
+    return write(path, iter_sweep(m, prices, nodes, chunk=chunk,
+                                  orders=orders, **overrides), fmt=fmt)
+
+
+def iter_cube(cube, chunk=CHUNK):
+    """Flattens a scenarios.ResultCube into batches of rows.
+
+    There's a column for each axis (holding the labels) and one for
+    each node.  Dates are written as yyyy-mm-dd strings.
+    """
+    def __labels(labels):
+        if any([ isinstance(x, datetime.date) for x in labels ]):
+            labels = [ x.isoformat() if isinstance(x, datetime.date)
+                       else x for x in labels ]
+        return np.asarray(labels)
+
+    n = int(np.prod(cube.shape))
+    labels = [ (name, __labels(lbls)) for (name, lbls) in cube.axes ]
+    flat = [ (node, np.asarray(cube[node]).reshape(-1)) for node in cube.nodes ]
+    for lo in range(0, n, chunk):
+        idx = np.arange(lo, min(n, lo + chunk))
+        pos = np.unravel_index(idx, cube.shape)
+        batch = {}
+        for ((name, lbls), p) in zip(labels, pos):
+            batch[name] = lbls[p]
+        for (node, v) in flat:
+            batch[node] = v[idx]
+        yield batch
+
+
+def export_cube(path, cube, chunk=CHUNK, fmt=None):
+    """Writes a scenarios.ResultCube out, one row per scenario."""
+    return write(path, iter_cube(cube, chunk), fmt=fmt)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+import csv
+
+import numpy as np
+import pytest
+
+import export
+import income as myMeager
+import montecarlo
+import scenarios
+import sweep
+from sweep_test import model
+
+
+NODES = ['outstanding_taxes_usd', 'cleared_from_sale_usd']
+
+
+def orders(m, price):
+    return myMeager.sales_orders_all(m, price=price)
+
+
+def read_csv(path):
+    with open(path, newline='') as fd:
+        rows = list(csv.reader(fd))
+    return (rows[0], rows[1:])
+
+
+class TestExport(object):
+
+    def test_write(self, tmp_path):
+        path = str(tmp_path / 'out.csv')
+        data = {'a': np.arange(7.0), 'b': np.arange(7) * 0.1, 'c': 'x'}
+        w = export.write(path, data, chunk=3)
+        assert(w.rows == 7)
+        (head, rows) = read_csv(path)
+        assert(head == ['a', 'b', 'c'])
+        assert(len(rows) == 7)
+        assert([ float(r[1]) for r in rows ] == data['b'].tolist())
+        assert(set([ r[2] for r in rows ]) == set(['x']))
+
+    def test_sweep(self, model, tmp_path):
+        m = model
+        prices = np.linspace(5, 25, 11)
+        path = str(tmp_path / 'sweep.csv')
+
+        # A generator, so it can't be sliced up front
+        w = export.export_sweep(path, m, (p for p in prices), NODES,
+                                chunk=4, orders=orders)
+        assert(w.rows == 11)
+
+        (head, rows) = read_csv(path)
+        assert(head == ['ipo_price_usd'] + NODES)
+        want = sweep.price_sweep(m, prices, NODES, orders=orders)
+        for (k, name) in enumerate(head):
+            got = np.array([ float(r[k]) for r in rows ])
+            if 0 == k:
+                assert((got == prices).all())
+            else:
+                assert((got == want[name]).all())
+
+    def test_montecarlo(self, model, tmp_path):
+        path = str(tmp_path / 'mc.csv')
+        dist = montecarlo.LogNormal(12, 0.4)
+        w = export.write(path, montecarlo.iter_simulate(
+            model, dist, n=50, batch=20, orders=orders, seed=3))
+        assert(w.rows == 50)
+        (head, rows) = read_csv(path)
+        res = montecarlo.simulate(model, dist, n=50, batch=20,
+                                  orders=orders, seed=3)
+        k = head.index('cleared_from_sale_usd')
+        assert([ float(r[k]) for r in rows ]
+               == res['cleared_from_sale_usd'].tolist())
+
+    def test_cube(self, model, tmp_path):
+        strategies = [scenarios.Strategy(myMeager.sales_orders_rsu),
+                      scenarios.Strategy(myMeager.sales_orders_all)]
+        cube = scenarios.grid(model, [10.0, 20.0], ['9/29/20', '3/15/21'],
+                              strategies, NODES)
+        path = str(tmp_path / 'cube.csv')
+        export.export_cube(path, cube, chunk=3)
+        (head, rows) = read_csv(path)
+        assert(head == cube.dims + NODES)
+        assert(len(rows) == 8)
+
+        recs = list(cube.records())
+        for (r, rec) in zip(rows, recs):
+            assert(float(r[0]) == rec['ipo_price_usd'])
+            assert(r[1] == rec['query_date'])
+            assert(r[2] == rec['strategy'])
+            assert(float(r[4]) == rec['cleared_from_sale_usd'])
+
+    def test_fallback(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(export, '_pyarrow', lambda: None)
+        path = str(tmp_path / 'out.parquet')
+        with pytest.warns(UserWarning):
+            w = export.write(path, {'a': np.arange(3.0)})
+        assert(w.fmt == 'csv')
+        assert(w.path == str(tmp_path / 'out.csv'))
+        assert(read_csv(w.path)[0] == ['a'])
+
+    @pytest.mark.parametrize('ext', ['parquet', 'arrow'])
+    def test_arrow(self, tmp_path, ext):
+        pa = pytest.importorskip('pyarrow')
+        path = str(tmp_path / ('out.' + ext))
+        data = {'a': np.arange(7.0), 'b': np.array(['x'] * 7)}
+        w = export.write(path, data, chunk=3)
+        assert(w.fmt == ext)
+        if 'parquet' == ext:
+            import pyarrow.parquet
+            t = pyarrow.parquet.read_table(path)
+        else:
+            import pyarrow.ipc
+            t = pyarrow.ipc.open_file(path).read_all()
+        assert(t.column('a').to_pylist() == data['a'].tolist())
+        assert(t.column('b').to_pylist() == ['x'] * 7)
@@ -0,0 +1,457 @@
+#!/usr/bin/env python
+
+import csv
+import datetime
+import os
+import re
+
+import numpy as np
+
+from position import Grant
+from position import GrantBook
+from position import parse_date
+
+
+# Column headings we recognize (compared lower case, letters and digits
+# only), for Shareworks, Carta and the like
+FIELDS = {
+    'name': ['grantname', 'grantid', 'grantnumber', 'grant', 'awardid',
+             'awardnumber', 'securityid', 'certificateid', 'name'],
+    'vest_date': ['vestdate', 'vestingdate', 'releasedate', 'date'],
+    'vest_n': ['sharesvesting', 'vestingshares', 'vestedshares',
+               'sharesvested', 'vestquantity', 'quantityvested',
+               'quantity', 'shares', 'amount', 'vestn'],
+    'vehicle': ['awardtype', 'granttype', 'securitytype', 'equitytype',
+                'optiontype', 'type', 'vehicle'],
+    'n_shares': ['sharesgranted', 'grantedshares', 'quantitygranted',
+                 'totalshares', 'grantshares', 'granted', 'nshares'],
+    'strike_usd': ['exerciseprice', 'strikeprice', 'grantprice', 'strike',
+                   'strikeusd'],
+    'exercised': ['sharesexercised', 'exercisedshares', 'exercised'],
+    'sold': ['sharessold', 'soldshares', 'sold'],
+    }
+
+REQUIRED = ['name', 'vest_date', 'vest_n']
+
+# What the vehicles get called (lower case, letters only)
+VEHICLE_NAMES = {
+    'iso': 'iso',
+    'incentivestockoption': 'iso',
+    'nso': 'nso',
+    'nqso': 'nso',
+    'nqo': 'nso',
+    'nonqualified': 'nso',
+    'nonqualifiedstockoption': 'nso',
+    'nonstatutorystockoption': 'nso',
+    'rsu': 'rsu',
+    'rsus': 'rsu',
+    'restrictedstockunit': 'rsu',
+    'restrictedstockunits': 'rsu',
+    }
+
+# Most bad grants named in an error
+MAX_ERRORS = 5
+
+_EPOCH = datetime.date(1970, 1, 1).toordinal()
+_DAYS = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def _key(s):
+    return re.sub('[^a-z0-9]', '', str(s).lower())
+
+
+def _vehicle(v):
+    k = re.sub('[^a-z]', '', str(v).lower())
+    if k in VEHICLE_NAMES: return VEHICLE_NAMES[k]
+    if k.startswith('non') or k.startswith('nq'): return 'nso'
+    if 'incentive' in k: return 'iso'
+    if 'restricted' in k: return 'rsu'
+    raise ValueError("Unknown vehicle: %s" % v)
+
+
+def _number(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        pass
+    if v is None: return 0.0
+    v = str(v).replace(',', '').replace('$', '').strip()
+    if not v: return 0.0
+    return float(v)
+
+
+def _numbers(vals):
+    """np.array of floats, from cells that may be "1,234" or "$5.00"."""
+    try:
+        return np.array(vals, dtype=float)
+    except (TypeError, ValueError):
+        return np.array([ _number(v) for v in vals ], dtype=float)
+
+
+###############################################################################
+# Month arithmetic, for whole arrays of dates                                 #
+###############################################################################
+
+def _month_days(y, m):
+    leap = (y % 4 == 0) & ((y % 100 != 0) | (y % 400 == 0))
+    return _DAYS[m - 1] + ((m == 2) & leap)
+
+
+def _ymd(ords):
+    """(<years>, <months>, <days>) of an array of date ordinals."""
+    days = (np.asarray(ords, dtype=np.int64) - _EPOCH).astype('datetime64[D]')
+    months = days.astype('datetime64[M]')
+    n = months.astype(np.int64)
+    d = (days - months.astype('datetime64[D]')).astype(np.int64) + 1
+    return (n // 12 + 1970, n % 12 + 1, d)
+
+
+def _ords(y, m, d):
+    months = ((y - 1970) * 12 + (m - 1)).astype('datetime64[M]')
+    days = months.astype('datetime64[D]') + (d - 1)
+    return days.astype(np.int64) + _EPOCH
+
+
+def mon_diff_many(start, end):
+    """position.mon_diff for arrays of date ordinals."""
+    (sy, sm, sd) = _ymd(start)
+    (ey, em, ed) = _ymd(end)
+    retval = 12 * (ey - sy) + (em - sm)
+    ends = (sd == _month_days(sy, sm)) & (ed == _month_days(ey, em))
+    retval -= (~ends & (sd > ed))
+    return np.maximum(retval, 0)
+
+
+def mon_add_many(start, n):
+    """position.mon_add for arrays of date ordinals and month counts."""
+    (sy, sm, sd) = _ymd(start)
+    t = sm - 1 + np.asarray(n, dtype=np.int64)
+    y = sy + t // 12
+    m = t % 12 + 1
+    last = _month_days(y, m)
+    short = sd > last
+    retval = _ords(y, m, np.minimum(sd, last))
+
+    # Too short a month: the end of the month if we started on one,
+    # otherwise the first of the next
+    spill = short & (sd != _month_days(sy, sm))
+    return retval + spill
+
+
+###############################################################################
+# Reading                                                                     #
+###############################################################################
+
+def read_rows(path, fmt=None):
+    """Streams the rows (header first) out of a CSV or XLSX export.
+
+    fmt: 'csv' or 'xlsx' (default: from the extension)
+
+    XLSX files need openpyxl, and only the first sheet is read.
+    """
+    if fmt is None:
+        fmt = 'xlsx' if os.path.splitext(path)[1].lower() in [
+            '.xlsx', '.xlsm'] else 'csv'
+    assert(fmt in ['csv', 'xlsx'])
+
+    if 'csv' == fmt:
+        with open(path, newline='', encoding='utf-8-sig') as fd:
+            for row in csv.reader(fd):
+                yield row
+        return
+
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportError("Reading %s needs openpyxl "
+                          "(pip install openpyxl), or export it as CSV"
+                          % path)
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in wb.worksheets[0].iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        wb.close()
+
+
+def _columns_of(header):
+    """{<field>: <column index>} for whichever fields the header has."""
+    keys = [ _key(h) for h in header ]
+    retval = {}
+    for field, aliases in FIELDS.items():
+        for alias in aliases:
+            if alias in keys:
+                retval[field] = keys.index(alias)
+                break
+    missing = [ f for f in REQUIRED if f not in retval ]
+    if missing:
+        raise ValueError("No %s column in: %s"
+                         % (' or '.join(missing), ', '.join(map(str, header))))
+    return retval
+
+
+def _collect(rows, vehicle):
+    """One pass over the rows, into numpy columns.
+
+    returns: (<grant names>,
+              {<grant field>: <value from each grant's first row>},
+              {'gid': <grant of each row>, 'ords': <vest dates>,
+               'qty': <shares vesting>})
+    """
+    rows = iter(rows)
+    cols = _columns_of(next(rows))
+    (i_name, i_date, i_n) = [ cols[f] for f in REQUIRED ]
+    wide = max(cols.values())
+
+    index = {}
+    names = []
+    firsts = []
+    gid = []
+    dates = []
+    qty = []
+    for row in rows:
+        if len(row) <= wide:
+            row = list(row) + [None] * (wide + 1 - len(row))
+        name = row[i_name]
+        when = row[i_date]
+        # Blank lines, totals, footnotes...
+        if name is None or when is None or '' == name or '' == when:
+            continue
+        name = str(name).strip()
+        g = index.get(name)
+        if g is None:
+            g = index[name] = len(names)
+            names.append(name)
+            firsts.append(row)
+        gid.append(g)
+        dates.append(when)
+        qty.append(row[i_n])
+
+    # Dates repeat a lot (every grant vests on the same few days)
+    seen = {}
+    ords = np.empty(len(dates), dtype=np.int64)
+    for (i, d) in enumerate(dates):
+        o = seen.get(d)
+        if o is None:
+            o = seen[d] = parse_date(d).toordinal()
+        ords[i] = o
+
+    per_grant = {}
+    for field in ['vehicle', 'n_shares', 'strike_usd', 'exercised', 'sold']:
+        if field in cols:
+            per_grant[field] = [ r[cols[field]] for r in firsts ]
+    if 'vehicle' not in per_grant:
+        if vehicle is None:
+            raise ValueError("No vehicle column, so a vehicle has to be "
+                             "given")
+        per_grant['vehicle'] = [vehicle] * len(names)
+
+    rows = {
+        'gid': np.array(gid, dtype=np.int64),
+        'ords': ords,
+        'qty': _numbers(qty),
+        }
+    return (names, per_grant, rows)
+
+
+###############################################################################
+# Inference                                                                   #
+###############################################################################
+
+def _matches(gid, pos, ords, qty, start, n_cliff, n_periods, period,
+             negative_cliff, n_shares):
+    """Which grants' rows fit the schedule a Grant would have.
+
+    gid, pos, ords, qty are per (sorted) row: the grant, which vesting
+    period the row falls on, its date and its shares.  The rest are per
+    grant, as for Grant (see Grant._build_schedule).  Periods that
+    vest nothing needn't have a row, but rows can't skip any others
+    (the dates wouldn't line up).
+    """
+    g = gid
+    n = len(start)
+    per = np.maximum(n_periods, 1).astype(float)[g]
+    nv = (n_shares - n_cliff + np.where(negative_cliff, n_cliff, 0))[g]
+    def __vested(p):
+        return np.where(p >= n_periods[g], n_shares[g],
+                        np.where(p < 0, 0.0,
+                                 np.round(p / per * nv + n_cliff[g])))
+
+    due = mon_add_many(start[g], pos * period[g])
+    off = (due != ords) | (__vested(pos) - __vested(pos - 1) != qty)
+    off |= (pos > n_periods[g])
+
+    return 0 == np.bincount(g, weights=off, minlength=n)
+
+
+def infer(rows, vehicle=None):
+    """Works out every grant's vesting schedule from its vesting rows.
+
+    rows:    iterable of rows, the header first (see read_rows)
+    vehicle: vehicle for every grant, if there's no column saying
+
+    As with position.from_table, the first vesting row is the cliff,
+    the first two give the period, the first and last give the number
+    of periods, and a last row that comes up short is a negative cliff.
+    Grants that don't fit that are tried without a cliff, starting a
+    period before the first row.  All of the grants are worked out at
+    once, on the sorted rows.
+
+    Then every row is checked against the schedule the Grant would
+    have (dates and shares, see Grant._build_schedule), along with the
+    total against n_shares (when there's a column for it).
+
+    returns: {<Grant/GrantBook argument>: <list or np.array>, ...},
+             one entry per grant
+    raises:  ValueError naming the grants that don't add up
+    """
+    (names, per_grant, r) = _collect(rows, vehicle)
+    n = len(names)
+    if not n:
+        raise ValueError("No vesting rows")
+
+    order = np.lexsort((r['ords'], r['gid']))
+    gid = r['gid'][order]
+    ords = r['ords'][order]
+    qty = r['qty'][order]
+
+    k = np.bincount(gid, minlength=n)
+    first = np.concatenate([[0], np.cumsum(k)[:-1]])
+    second = first + (1 < k)
+    last = first + k - 1
+    pos = np.arange(len(gid)) - first[gid]
+
+    total = np.bincount(gid, weights=qty, minlength=n)
+    if 'n_shares' in per_grant:
+        n_shares = _numbers(per_grant['n_shares'])
+    else:
+        n_shares = total
+
+    bad = np.zeros(n, dtype=bool)
+    why = np.empty(n, dtype=object)
+    def __flag(mask, reason):
+        mask = mask & ~bad
+        why[mask] = reason
+        bad[:] |= mask
+
+    __flag(total != n_shares, "vesting rows don't add up to n_shares")
+
+    # The schedule, with the first row as the cliff...
+    start = ords[first]
+    period = np.where(1 < k, mon_diff_many(start, ords[second]), 1)
+    full = mon_diff_many(start, ords[last])
+    n_periods = np.where(1 < k, full // np.maximum(period, 1), 1)
+    n_cliff = np.where(1 < k, qty[first], n_shares)
+    negative_cliff = (2 < k) & (qty[last] < qty[second] - 1)
+
+    cliff = _matches(gid, pos, ords, qty, start, n_cliff, n_periods,
+                     period, negative_cliff, n_shares)
+    cliff &= (0 < period) | (1 == k)
+
+    # ...or without one, starting a period before the first row.  The
+    # start's day is the latest day any row falls on: the others are
+    # ends of shorter months (1/31 -> 2/29) or spilled over into the
+    # next one (1/29 -> 3/1), which counts as the month before.
+    (y, m, d) = _ymd(ords)
+    day = np.zeros(n, dtype=np.int64)
+    np.maximum.at(day, gid, d)
+    month = 12 * y + (m - 1) - ((d < day[gid]) & (1 == d))
+    plain_period = month[second] - month[first]
+    begin = month[first] - plain_period
+    (by, bm) = (begin // 12, begin % 12 + 1)
+    plain_start = _ords(by, bm, np.minimum(day, _month_days(by, bm)))
+
+    plain = _matches(gid, pos + 1, ords, qty, plain_start, np.zeros(n), k,
+                     plain_period, np.zeros(n, dtype=bool), n_shares)
+    plain &= ~cliff & (1 < k) & (0 < plain_period)
+    start = np.where(plain, plain_start, start)
+    period = np.where(plain, plain_period, period)
+    n_cliff = np.where(plain, 0, n_cliff)
+    n_periods = np.where(plain, k, n_periods)
+    negative_cliff &= ~plain
+
+    off = ~(cliff | plain)
+    __flag(off & (0 == period) & (0 == plain_period),
+           "two vesting rows in the same month")
+    __flag(off & (full != n_periods * period), "irregular vesting dates")
+    __flag(off, "vesting rows don't match a regular schedule")
+
+    if bad.any():
+        idx = np.flatnonzero(bad)
+        msgs = [ '%s: %s' % (names[i], why[i]) for i in idx[:MAX_ERRORS] ]
+        if MAX_ERRORS < len(idx):
+            msgs.append('...and %d more' % (len(idx) - MAX_ERRORS))
+        raise ValueError("Invalid grants:\n  " + '\n  '.join(msgs))
+
+    def __col(field):
+        if field not in per_grant:
+            return np.zeros(n, dtype=np.int64)
+        v = _numbers(per_grant[field])
+        if 'strike_usd' != field and (v == np.round(v)).all():
+            v = v.astype(np.int64)
+        return v
+
+    return {
+        'name': names,
+        'vehicle': [ _vehicle(v) for v in per_grant['vehicle'] ],
+        'n_shares': n_shares.astype(np.int64),
+        'n_cliff': n_cliff.astype(np.int64),
+        'exercised': __col('exercised'),
+        'sold': __col('sold'),
+        'strike_usd': __col('strike_usd'),
+        'start': [ datetime.date.fromordinal(int(o)) for o in start ],
+        'n_periods': n_periods.astype(np.int64),
+        'period_months': period.astype(np.int64),
+        'negative_cliff': negative_cliff,
+        }
+
+
+def to_grants(cols):
+    """Grant objects from infer()'s columns."""
+    fields = list(cols.keys())
+    vals = [ c.tolist() if isinstance(c, np.ndarray) else c
+             for c in [ cols[f] for f in fields ] ]
+    return [ Grant(**dict(zip(fields, row))) for row in zip(*vals) ]
+
+
+def load(path, book=False, fmt=None, vehicle=None):
+    """Reads the grants out of a Shareworks/Carta style vesting export.
+
+    The export has a row per vesting event: the grant's name, the date
+    and the number of shares.  It may also have columns for the
+    vehicle, shares granted, strike price, and shares exercised and
+    sold, which are taken from each grant's first row.
+
+    path:    CSV or XLSX file
+    book:    return a GrantBook rather than a list of Grants
+    fmt:     'csv' or 'xlsx' (default: from the extension)
+    vehicle: vehicle for every grant, if there's no column saying
+
+    returns: list of Grants, or a GrantBook
+    """
+    cols = infer(read_rows(path, fmt), vehicle=vehicle)
+    if book:
+        return GrantBook(**cols)
+    return to_grants(cols)
+
+
+def write_schedule(path, grants):
+    """Writes grants out as a vesting export load() can read back.
+
+    One row per vesting event (events that vest nothing are left out),
+    with the grant details repeated on every row, as Shareworks does.
+    """
+    with open(path, 'w', newline='') as fd:
+        out = csv.writer(fd)
+        out.writerow(['Grant Name', 'Award Type', 'Shares Granted',
+                      'Exercise Price', 'Exercised', 'Sold',
+                      'Vest Date', 'Shares Vesting'])
+        for g in grants:
+            was = 0
+            for (d, n) in g.vesting_schedule():
+                if n != was:
+                    out.writerow([g.name, g.vehicle.upper(), g.n_shares,
+                                  g.strike_usd, g.exercised, g.sold,
+                                  '%d/%d/%d' % (d.month, d.day, d.year),
+                                  int(n - was)])
+                was = n
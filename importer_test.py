@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+import datetime
+
+import numpy as np
+import pytest
+
+import benchmark
+import importer
+from position import Grant
+from position import GrantBook
+from position import from_table
+from position import mon_add
+from position import mon_diff
+from position import parse_date
+
+
+HEADER = ['Grant Name', 'Award Type', 'Shares Granted', 'Exercise Price',
+          'Vest Date', 'Shares Vesting']
+
+
+def tk421_rows():
+    """The RSU from eg_private, as Shareworks lists it."""
+    start = parse_date('1/1/19')
+    rows = [HEADER, ['RSU-TK421', 'RSU', '96,000', '', '1/1/19', '1,500']]
+    for i in range(1, 48):
+        d = mon_add(start, i)
+        rows.append(['RSU-TK421', 'RSU', '96,000', '',
+                     '%d/%d/%d' % (d.month, d.day, d.year), '2,000'])
+    rows.append(['RSU-TK421', 'RSU', '96,000', '', '1/1/23', '500'])
+    return rows
+
+
+def vested(grants, dates):
+    return np.array([ g.vested_many(dates) for g in grants ])
+
+
+DATES = [ datetime.date(y, m, 1) for y in range(2010, 2026)
+          for m in range(1, 13) ]
+
+
+class TestMonths(object):
+
+    def test_many(self):
+        days = [ datetime.date(2019, 1, 1) + datetime.timedelta(days=i)
+                 for i in range(0, 800, 3) ]
+        ords = np.array([ d.toordinal() for d in days ])
+
+        for n in [-3, 0, 1, 3, 12, 13]:
+            got = importer.mon_add_many(ords, np.full(len(ords), n))
+            assert [ mon_add(d, n).toordinal() for d in days ] == got.tolist()
+
+        end = ords[::-1]
+        got = importer.mon_diff_many(ords, end)
+        assert ([ mon_diff(a, b) for (a, b) in zip(days, days[::-1]) ]
+                == got.tolist())
+
+
+class TestImporter(object):
+
+    def test_from_table(self):
+        cols = importer.infer(tk421_rows())
+        (g,) = importer.to_grants(cols)
+        h = from_table(name='RSU-TK421',
+                       vehicle='rsu',
+                       first_date='1/1/19', first_val=1500,
+                       second_date='2/1/19', second_val=2000,
+                       last_date='1/1/23', last_val=500,
+                       n_shares=96000)
+        assert 'rsu' == g.vehicle
+        assert g.negative_cliff
+        for f in ['n_shares', 'n_cliff', 'start', 'n_periods',
+                  'period_months', 'negative_cliff']:
+            assert getattr(h, f) == getattr(g, f)
+
+    def test_round_trip(self, tmp_path):
+        grants = benchmark.synthetic_grants(300)
+        path = str(tmp_path / 'vesting.csv')
+        importer.write_schedule(path, grants)
+
+        back = importer.load(path)
+        assert [ g.name for g in grants ] == [ g.name for g in back ]
+        assert (vested(grants, DATES) == vested(back, DATES)).all()
+        for (g, h) in zip(grants, back):
+            assert g.vehicle == h.vehicle
+            assert g.strike_usd == h.strike_usd
+            assert g.exercised == h.exercised
+            assert g.sold == h.sold
+
+        book = importer.load(path, book=True)
+        assert isinstance(book, GrantBook)
+        on = parse_date('6/1/21')
+        assert (book.vested(on) == [ g.vested(on) for g in grants ]).all()
+
+    def test_month_ends(self, tmp_path):
+        # Ends of months vest at the ends of shorter ones (1/31 ->
+        # 2/29), and days past a short month's end spill into the next
+        # (1/29 -> 3/1 in 2019)
+        grants = []
+        for (i, start) in enumerate(['1/31/20', '3/31/20', '8/31/20',
+                                     '2/29/16', '11/30/18', '1/29/19',
+                                     '8/30/12', '5/31/19']):
+            for period in [1, 3, 6]:
+                for n_cliff in [0, 100]:
+                    grants.append(Grant(name='g%d-%d-%d'
+                                        % (i, period, n_cliff),
+                                        vehicle='rsu',
+                                        start=start,
+                                        n_shares=4800,
+                                        n_cliff=n_cliff,
+                                        n_periods=12,
+                                        period_months=period))
+        path = str(tmp_path / 'vesting.csv')
+        importer.write_schedule(path, grants)
+
+        back = importer.load(path)
+        days = [ datetime.date(2012, 1, 1) + datetime.timedelta(days=i)
+                 for i in range(0, 365 * 10) ]
+        assert (vested(grants, days) == vested(back, days)).all()
+        for (g, h) in zip(grants, back):
+            assert g.period_months == h.period_months
+
+    def test_vehicle(self):
+        rows = [ [r[0]] + r[4:] for r in tk421_rows() ]
+        with pytest.raises(ValueError):
+            importer.infer(rows)
+        cols = importer.infer(rows, vehicle='rsu')
+        assert ['rsu'] == cols['vehicle']
+        assert [96000] == cols['n_shares'].tolist()
+
+    def test_invalid(self):
+        rows = tk421_rows()
+        del rows[10]
+        with pytest.raises(ValueError, match='RSU-TK421'):
+            importer.infer(rows)
+
+        rows = tk421_rows()
+        rows[10][-1] = '2,001'
+        with pytest.raises(ValueError, match='RSU-TK421'):
+            importer.infer(rows)
+
+        with pytest.raises(ValueError, match='vest_date'):
+            importer.infer([['Grant Name', 'Shares'], ['a', '1']])
+
+    def test_blank_rows(self):
+        rows = tk421_rows()
+        rows.insert(5, [])
+        rows.append(['Total', '', '', '', '', '96,000'])
+        (g,) = importer.to_grants(importer.infer(rows))
+        assert 96000 == g.n_shares
+
+    def test_xlsx(self, tmp_path):
+        openpyxl = pytest.importorskip('openpyxl')
+        wb = openpyxl.Workbook()
+        for row in tk421_rows():
+            wb.active.append(row)
+        path = str(tmp_path / 'vesting.xlsx')
+        wb.save(path)
+        (g,) = importer.load(path)
+        assert 48 == g.n_periods
@@ -1,8 +1,90 @@
 #!/usr/bin/env python
 
-import copy
 import math
-import pylink
+import numpy as np
+
+from position import GrantBook
+from position import VEHICLES
+
+
+class SalesOrderBook(object):
+    """Sales orders, checked and indexed once.
+
+    Every order is checked against the grants up front, then the
+    orders are indexed by vehicle and by grant id, with the share
+    counts totalled per vehicle.
+    """
+
+    KEYS = ['id', 'qty', 'price', 'prefer_exercise']
+
+    def __init__(self, orders, grants):
+        """
+        orders: list of sales orders
+                ({'id':, 'qty':, 'price':, 'prefer_exercise':}, ...)
+        grants: {<name>: <Grant>, ...} or a GrantBook
+
+        If the GrantBook has owners, shares come back as one value per
+        owner.
+        """
+        self.orders = orders
+        self.ids = []
+        self.rows = None
+        n = len(orders)
+
+        is_book = isinstance(grants, GrantBook)
+        vehicle = np.zeros(n, dtype=np.int8)
+        if is_book: self.rows = np.zeros(n, dtype=np.int64)
+        qty = np.zeros(n)
+
+        for (k, o) in enumerate(orders):
+            for key in self.KEYS:
+                if key not in o:
+                    raise KeyError("Sales order #%d has no %s" % (k, key))
+            name = o['id']
+            if name not in grants:
+                raise KeyError("Sales order #%d is for an unknown grant: %s"
+                               % (k, name))
+            assert(0 == np.ndim(o['qty']))
+            assert(0 <= o['qty'])
+            assert(np.all(0 <= np.asarray(o['price'])))
+
+            self.ids.append(name)
+            qty[k] = o['qty']
+            if is_book:
+                self.rows[k] = grants.index[name]
+                vehicle[k] = grants.vehicle[self.rows[k]]
+            else:
+                vehicle[k] = VEHICLES.index(grants[name].vehicle)
+
+        self.vehicle = vehicle
+        self.qty = qty
+
+        self.by_vehicle = dict([ (typ, []) for typ in VEHICLES ])
+        self.by_id = {}
+        for (k, name) in enumerate(self.ids):
+            self.by_vehicle[VEHICLES[vehicle[k]]].append(k)
+            self.by_id.setdefault(name, []).append(k)
+
+        # Per-vehicle totals (per-owner too, if need be)
+        owner = None
+        if is_book and grants.owner is not None:
+            owner = grants.owner[self.rows]
+            n_owners = grants.n_owners
+
+        self.shares = {}
+        for typ in VEHICLES:
+            idx = self.by_vehicle[typ]
+            if owner is None:
+                self.shares[typ] = int(qty[idx].sum())
+            else:
+                self.shares[typ] = np.bincount(owner[idx], weights=qty[idx],
+                                               minlength=n_owners)
+
+    def __len__(self):
+        return len(self.orders)
+
+    def __iter__(self):
+        return iter(self.orders)
 
 
 class Income(object):
@@ -27,6 +109,7 @@ class Income(object):
 
             # Sales Orders
             'sales_orders': [],
+            'sales_order_book': self.sales_order_book,
             }
 
     def shares_available_rsu_n(self, m):
@@ -42,6 +125,9 @@ class Income(object):
                 * (1.0 - m.shares_withheld_iso_rate))
 
     def sales_simulation(self, m):
+        if isinstance(m.grants_lst, GrantBook):
+            return self.book_sales_simulation(m)
+
         cost = 0.0
         retval = {
             'objs': [],
@@ -50,7 +136,10 @@ class Income(object):
             'rsu':  0,
             }
 
-        end = copy.deepcopy(m.grants_dict)
+        # Copy-on-write views, so the original grants stay untouched
+        end = {}
+        for name in m.grants_dict:
+            end[name] = m.grants_dict[name].overlay()
 
         touched = {}
 
@@ -61,11 +150,11 @@ class Income(object):
             grant.withhold(m.query_date, rate)
 
         # Process the sales orders (in order, allowing for duplicates)
-        for order in m.sales_orders:
-            g = m.grants_dict[order['id']]
+        orders = m.sales_order_book
+        for (k, order) in enumerate(orders):
+            copied = end[orders.ids[k]]
+            g = copied
             rate = getattr(m, 'shares_withheld_%s_rate' % g.vehicle)
-
-            copied = end[g.name]
             touched[g.name] = copied
 
             # Execute the sell order on the copy -- this is where we
@@ -101,23 +190,82 @@ class Income(object):
         retval['end'] = end
         return retval
 
+    def book_sales_simulation(self, m):
+        """sales_simulation, for when the grants live in a GrantBook.
+
+        The end state is a (copy-on-write) copy of the book rather than
+        a dict of grants.  If the book has owners, the sales income
+        comes back as one value per owner (and the sale price must be
+        a scalar).
+        """
+        cost = 0.0
+        retval = {
+            'objs': [],
+            'iso':  0,
+            'nso':  0,
+            'rsu':  0,
+            }
+
+        book = m.grants_lst
+        end = book.copy()
+
+        # One total per person if the book covers several of them
+        if book.owner is not None:
+            for typ in VEHICLES:
+                retval[typ] = np.zeros(book.n_owners)
+
+        # Process withholdings
+        rates = np.array([ getattr(m, 'shares_withheld_%s_rate' % typ)
+                           for typ in VEHICLES ])
+        rates = rates[end.vehicle]
+        end.withhold(m.query_date, rates)
+
+        # Vesting doesn't change as we sell
+        vested = end.vested(m.query_date)
+
+        # Process the sales orders (in order, allowing for duplicates)
+        orders = m.sales_order_book
+        for (k, order) in enumerate(orders):
+            i = orders.rows[k]
+            tmp = end.sell(i,
+                           m.query_date,
+                           order['qty'],
+                           order['price'],
+                           rates[i],
+                           prefer_exercise=order['prefer_exercise'],
+                           update=True,
+                           vested=vested)
+            retval['objs'].append(tmp)
+
+            # Collect the results of the sale
+            typ = VEHICLES[end.vehicle[i]]
+            if book.owner is None:
+                retval[typ] += tmp['net_usd']
+            else:
+                retval[typ][book.owner[i]] += tmp['net_usd']
+            cost += tmp['cost']
+
+        retval['cost'] = cost
+        retval['end'] = end
+        return retval
+
+    def sales_order_book(self, m):
+        grants = m.grants_lst
+        if not isinstance(grants, GrantBook): grants = m.grants_dict
+        return SalesOrderBook(m.sales_orders, grants)
+
     def shares_sold_rsu_n(self, m):
-        gdict = m.grants_dict
-        l = [ o for o in m.sales_orders if gdict[o['id']].vehicle == 'rsu' ]
-        return int(sum([o['qty'] for o in l]))
+        return m.sales_order_book.shares['rsu']
 
     def shares_sold_iso_n(self, m):
-        gdict = m.grants_dict
-        l = [ o for o in m.sales_orders if gdict[o['id']].vehicle == 'iso' ]
-        return int(sum([o['qty'] for o in l]))
+        return m.sales_order_book.shares['iso']
 
     def shares_sold_nso_n(self, m):
-        gdict = m.grants_dict
-        l = [ o for o in m.sales_orders if gdict[o['id']].vehicle == 'nso' ]
-        return int(sum([o['qty'] for o in l]))
+        return m.sales_order_book.shares['nso']
 
     def rem_grants_lst(self, m):
         d = m.rem_grants_dict
+        if isinstance(d, GrantBook): return d
         return [d[g.name] for g in m.grants_lst]
 
     def rem_grants_dict(self, m):
@@ -174,7 +322,8 @@ def sales_orders_options(m,
     """Place sell orders for all options possible
 
     If you don't specify a sales price, it'll automatically use the
-    IPO price which is used for RSU withholding computations.
+    IPO price which is used for RSU withholding computations.  The
+    price may also be a numpy array (see sweep.price_sweep).
 
     If you would prefer to liquidate shares that are currently held,
     set prefer_exercise to True.
@@ -186,7 +335,16 @@ def sales_orders_options(m,
 
     # default to the ipo price
     if price is None: price = m.ipo_price_usd
-    assert(0 <= price)
+    assert(np.all(0 <= np.asarray(price)))
+
+    if isinstance(m.grants_lst, GrantBook):
+        return book_sales_orders_options(m,
+                                         price,
+                                         prefer_exercise=prefer_exercise,
+                                         cheap_first=cheap_first,
+                                         restricted=restricted,
+                                         vested=vested,
+                                         nso_first=nso_first)
 
     # Set up the list of sales orders
     option_lst = []
@@ -210,7 +368,7 @@ def sales_orders_options(m,
         else:
             n = g.n_shares - g.liquidated
         if restricted:
-            n = min(remaining_restricted, n)
+            n = np.minimum(remaining_restricted, n)
             remaining_restricted -= n
         retval.append({
             'id': g.name,
@@ -221,12 +379,74 @@ def sales_orders_options(m,
 
     return retval
 
+def book_sales_orders_options(m,
+                              price,
+                              prefer_exercise=True,
+                              cheap_first=True,
+                              restricted=True,
+                              vested=True,
+                              nso_first=False):
+    """sales_orders_options, for grants in a GrantBook"""
+    book = m.grants_lst
+
+    rates = np.array([ getattr(m, 'shares_withheld_%s_rate' % typ)
+                       for typ in VEHICLES ])
+    if vested:
+        avail = book.available(m.query_date, rates[book.vehicle])
+    else:
+        avail = book.n_shares - book.liquidated
+
+    # Same ordering as grant_lst_for_vehicle (stable sort on strike)
+    strike = book.strike_usd if cheap_first else -book.strike_usd
+    vehicles = ['nso', 'iso'] if nso_first else ['iso', 'nso']
+    rows = []
+    for typ in vehicles:
+        idx = np.nonzero(book.vehicle == VEHICLES.index(typ))[0]
+        rows.extend(idx[np.argsort(strike[idx], kind='stable')])
+
+    retval = []
+
+    # How many shares can be legally sold?  (per owner, in a cohort)
+    remaining_restricted = m.shares_sellable_restricted_n
+    owned = np.ndim(remaining_restricted) and book.owner is not None
+    if owned: remaining_restricted = np.array(remaining_restricted)
+
+    for i in rows:
+        n = avail[i]
+        if restricted and owned:
+            o = book.owner[i]
+            n = min(remaining_restricted[o], n)
+            remaining_restricted[o] -= n
+        elif restricted:
+            n = np.minimum(remaining_restricted, n)
+            remaining_restricted = remaining_restricted - n
+        retval.append({
+            'id': book.name[i],
+            'qty': n,
+            'price': price,
+            'prefer_exercise': prefer_exercise
+            })
+
+    return retval
+
 def sales_orders_rsu(m, price=None, **ignore):
     retval = []
 
     # default to the ipo price
     if price is None: price = m.ipo_price_usd
-    assert(0 <= price)
+    assert(np.all(0 <= np.asarray(price)))
+
+    book = m.grants_lst
+    if isinstance(book, GrantBook):
+        avail = book.available(m.query_date, m.shares_withheld_rsu_rate)
+        for i in np.nonzero(book.vehicle == VEHICLES.index('rsu'))[0]:
+            retval.append({
+                'id': book.name[i],
+                'qty': avail[i],
+                'price': price,
+                'prefer_exercise': False, # not used
+                })
+        return retval
 
     for g in m.grants_lst:
         if g.vehicle == 'rsu':
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+import numpy as np
+import pytest
+
+import income as myMeager
+from income import SalesOrderBook
+from position import GrantBook
+from sweep_test import GRANTS
+from sweep_test import model
+
+
+def order(name, qty, price=10):
+    return {'id': name, 'qty': qty, 'price': price, 'prefer_exercise': True}
+
+
+ORDERS = [
+    order('rsu', 100),
+    order('iso', 50, price=12),
+    order('rsu', 25),
+    ]
+
+
+class TestSalesOrderBook(object):
+
+    def test_index(self):
+        grants = dict([ (g.name, g) for g in GRANTS ])
+        sob = SalesOrderBook(ORDERS, grants)
+        assert 3 == len(sob)
+        assert [0, 2] == sob.by_vehicle['rsu']
+        assert [1] == sob.by_vehicle['iso']
+        assert [] == sob.by_vehicle['nso']
+        assert [0, 2] == sob.by_id['rsu']
+        assert {'iso': 50, 'nso': 0, 'rsu': 125} == sob.shares
+        assert sob.rows is None
+
+        book = GrantBook.from_grants(GRANTS)
+        sob = SalesOrderBook(ORDERS, book)
+        assert [0, 2, 0] == sob.rows.tolist()
+        assert {'iso': 50, 'nso': 0, 'rsu': 125} == sob.shares
+
+    def test_owners(self):
+        book = GrantBook.from_grants(GRANTS + GRANTS,
+                                     name=['a', 'b', 'c', 'd', 'e', 'f'],
+                                     owner=[0, 0, 0, 1, 1, 1])
+        sob = SalesOrderBook([order('a', 10), order('d', 20), order('a', 1)],
+                             book)
+        assert [11, 20] == sob.shares['rsu'].tolist()
+        assert [0, 0] == sob.shares['iso'].tolist()
+
+    def test_validate(self):
+        grants = dict([ (g.name, g) for g in GRANTS ])
+        with pytest.raises(KeyError):
+            SalesOrderBook([order('nope', 1)], grants)
+        with pytest.raises(KeyError):
+            SalesOrderBook([{'id': 'rsu', 'qty': 1}], grants)
+        with pytest.raises(AssertionError):
+            SalesOrderBook([order('rsu', -1)], grants)
+
+    def test_shares_sold(self, model):
+        m = model
+        m.override(m.enum.sales_orders, ORDERS)
+        assert 125 == m.shares_sold_rsu_n
+        assert 50 == m.shares_sold_iso_n
+        assert 0 == m.shares_sold_nso_n
+        assert m.sales_order_book is m.sales_order_book
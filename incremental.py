@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+
+import datetime
+
+import numpy as np
+import pylink
+
+
+# IncrementalDAGModel takes over pylink's cache handling (its _values,
+# _cache, _calc, _stack, _record_parent and _calculate), so it only
+# runs on the versions it has been checked against
+PYLINK_VERSIONS = ['0.9']
+
+# Values that can't change behind our back
+_IMMUTABLE = (type(None), bool, int, float, complex, str, bytes,
+              np.generic, datetime.date, datetime.timedelta)
+
+_MISSING = object()
+
+
+def same_value(a, b):
+    """Whether two node values are interchangeable.
+
+    Arrays are compared elementwise, anything else with ==.  When in
+    doubt (e.g. == doesn't give a plain answer) they're different.
+    The same list, dict or array is never the same value, since it may
+    have been changed in place since we last saw it.
+    """
+    if a is b:
+        return isinstance(a, _IMMUTABLE)
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        a = np.asarray(a)
+        b = np.asarray(b)
+        return (a.shape == b.shape
+                and a.dtype == b.dtype
+                and bool(np.array_equal(a, b)))
+    try:
+        return bool(a == b)
+    except (ValueError, TypeError):
+        return False
+
+
+class IncrementalDAGModel(pylink.DAGModel):
+    """DAGModel that only recomputes what an override actually changed.
+
+    The stock DAGModel throws away the cached value of everything
+    downstream of an overridden node.  This one leaves the cache alone
+    and instead keeps a revision number:
+
+     * Overriding a node with the value it already has does nothing
+       (handing back the same list, dict or array counts as a change,
+       in case it was modified in place).
+
+     * Otherwise the revision goes up, and the node is marked as
+       changed in that revision.
+
+     * When a cached node is asked for, the nodes it read last time
+       are brought up to date first.  If none of them changed since
+       the node was last checked, the cached value is still good.
+
+     * If it does have to be recomputed, and comes out the same as
+       before, the nodes reading it don't have to be recomputed.
+
+    It's a drop-in replacement for pylink.DAGModel.  The counters in
+    stats (since the model was built) and last (since the most recent
+    override or revert) show how much work was saved:
+
+        overrides: overrides that changed something
+        skipped:   overrides that didn't
+        computed:  calculators that actually ran
+        reused:    cached values found to still be good
+    """
+
+    def __init__(self, contrib=[], **extras):
+        version = str(getattr(pylink, '__version__', None))
+        if version not in PYLINK_VERSIONS:
+            raise RuntimeError("IncrementalDAGModel relies on pylink "
+                               "internals, and hasn't been checked against "
+                               "pylink %s (only %s); use pylink.DAGModel"
+                               % (version, ', '.join(PYLINK_VERSIONS)))
+        self._revision = 0
+        self._changed_at = {}
+        self._verified_at = {}
+        self._read = {}
+        self._reading = []
+        self.reset_stats()
+        pylink.DAGModel.__init__(self, contrib, **extras)
+
+    def reset_stats(self):
+        self.stats = dict.fromkeys(['overrides', 'skipped',
+                                    'computed', 'reused'], 0)
+        self.last = dict(self.stats)
+
+    def _count(self, key):
+        self.stats[key] += 1
+        self.last[key] += 1
+
+    def _bump(self, node):
+        self._revision += 1
+        self._changed_at[node] = self._revision
+        self._count('overrides')
+
+    def clear_cache(self):
+        pylink.DAGModel.clear_cache(self)
+        self._verified_at = {}
+        self._read = {}
+
+    def override(self, node, value):
+        self.last = dict.fromkeys(self.last.keys(), 0)
+        if node in self._values and same_value(self._values[node], value):
+            self._count('skipped')
+            return
+        self._values[node] = value
+        self._cache.pop(node, None)
+        self._bump(node)
+
+    def revert(self, node):
+        self.last = dict.fromkeys(self.last.keys(), 0)
+        if node in self._values:
+            if node in self._calc:
+                del self._values[node]
+                self._cache.pop(node, None)
+                self._verified_at.pop(node, None)
+                self._bump(node)
+            else:
+                name = self.node_name(node)
+                msg = "You can't revert a static value: %s" % name
+                raise AttributeError(msg)
+
+    def cached_calculate(self, node, clear_stack=False):
+        if clear_stack:
+            orig_stack = self._stack
+            self._stack = []
+
+        self._record_parent(node)
+        if self._reading:
+            self._reading[-1].add(node)
+        retval = self._fresh(node)
+
+        if clear_stack:
+            self._stack = orig_stack
+        return retval
+
+    def _fresh(self, node):
+        """The node's value, recomputing only if something it read moved."""
+        if node in self._values:
+            return self._values[node]
+
+        cached = self._cache.get(node, _MISSING)
+        checked = self._verified_at.get(node, -1)
+        if cached is not _MISSING:
+            if checked == self._revision:
+                return cached
+
+            for dep in self._read.get(node, ()):
+                self._fresh(dep)
+                if self._changed_at.get(dep, 0) > checked:
+                    break
+            else:
+                self._verified_at[node] = self._revision
+                self._count('reused')
+                return cached
+
+        # Unlike the stock model, put the stack back if a calculator
+        # blows up, so the next evaluation doesn't see a bogus loop
+        depth = len(self._stack)
+        self._reading.append(set())
+        try:
+            retval = self._calculate(node)
+        finally:
+            read = self._reading.pop()
+            del self._stack[depth:]
+        self._read[node] = read
+        self._count('computed')
+
+        if cached is _MISSING or not same_value(cached, retval):
+            self._changed_at[node] = self._revision
+        self._verified_at[node] = self._revision
+        return retval
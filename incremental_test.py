@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+import numpy as np
+import pylink
+import pytest
+
+import income as myMeager
+import incremental
+import parallel
+import sweep
+from sweep_test import model
+
+NODES = ['outstanding_taxes_usd',
+         'cleared_from_sale_usd',
+         'amt_taxes_usd',
+         'amt_free_iso_exercise_income_usd',
+         'shares_sold_rsu_n']
+
+
+@pytest.fixture
+def inc(model):
+    snap = parallel.snapshot(model)
+    snap['cls'] = incremental.IncrementalDAGModel
+    return parallel.rebuild(snap)
+
+
+def same(a, b):
+    for name in NODES:
+        assert np.all(getattr(a, name) == getattr(b, name))
+
+
+class TestIncremental(object):
+
+    def test_same_value(self):
+        assert incremental.same_value(1, 1.0)
+        assert not incremental.same_value(1, 2)
+        assert incremental.same_value(np.arange(3), np.arange(3))
+        assert not incremental.same_value(np.arange(3), np.arange(4))
+        assert not incremental.same_value(np.arange(3), 1)
+        assert incremental.same_value([{'a': 1}], [{'a': 1}])
+        assert not incremental.same_value([{'a': np.arange(2)}],
+                                          [{'a': np.arange(2)}])
+
+    def test_matches(self, model, inc):
+        same(model, inc)
+        for m in (model, inc):
+            m.override(m.enum.sales_orders, myMeager.sales_orders_all(m))
+        same(model, inc)
+        for m in (model, inc):
+            m.override(m.enum.ipo_price_usd, 20)
+            m.override(m.enum.iso_exercise_income_usd, 50000)
+        same(model, inc)
+        for m in (model, inc):
+            m.override(m.enum.amt_exemption_usd, 0)
+        same(model, inc)
+        for m in (model, inc):
+            m.revert(m.enum.amt_exemption_usd)
+        same(model, inc)
+
+    def test_sweep(self, model, inc):
+        x = np.linspace(5, 25, 11)
+        a = sweep.price_sweep(model, x, NODES, orders=myMeager.sales_orders_rsu)
+        b = sweep.price_sweep(inc, x, NODES, orders=myMeager.sales_orders_rsu)
+        for name in NODES:
+            assert np.array_equal(a[name], b[name])
+        same(model, inc)
+
+    def test_counters(self, inc):
+        m = inc
+        m.outstanding_taxes_usd
+
+        m.override(m.enum.query_date, m.query_date)
+        assert 1 == m.last['skipped']
+        m.outstanding_taxes_usd
+        assert 0 == m.last['computed']
+
+        # Only the tax side reads the ISO exercise income
+        m.override(m.enum.iso_exercise_income_usd, 1000)
+        m.outstanding_taxes_usd
+        assert 1 == m.last['overrides']
+        assert 0 < m.last['computed']
+        assert 0 < m.last['reused']
+        assert m.last['computed'] < m.stats['computed']
+
+    def test_early_cutoff(self):
+        calls = []
+        class Tiny(object):
+            def __init__(self):
+                self.tribute = {
+                    'a': 1,
+                    'positive': self.positive,
+                    'label': self.label,
+                    }
+            def positive(self, m):
+                calls.append('positive')
+                return m.a > 0
+            def label(self, m):
+                calls.append('label')
+                return 'up' if m.positive else 'down'
+
+        m = incremental.IncrementalDAGModel([Tiny()])
+        assert 'up' == m.label
+        assert ['label', 'positive'] == calls
+
+        # positive comes out the same, so label isn't recomputed
+        m.override(m.enum.a, 5)
+        assert 'up' == m.label
+        assert ['label', 'positive', 'positive'] == calls
+        assert 1 == m.last['computed']
+        assert 1 == m.last['reused']
+
+        m.override(m.enum.a, -1)
+        assert 'down' == m.label
+        assert 2 == m.last['computed']
+
+    def test_bad_calc(self, inc):
+        m = inc
+        m.override(m.enum.sales_orders, [{'id': 'nope'}])
+        with pytest.raises(KeyError):
+            m.cleared_from_sale_usd
+        assert [] == m._stack
+        m.override(m.enum.sales_orders, [])
+        m.cleared_from_sale_usd
+
+    def test_mutated(self):
+        class Toy(object):
+            def __init__(self):
+                self.tribute = {
+                    'lst': [],
+                    'total': lambda m: sum(m.lst),
+                    }
+
+        totals = []
+        for cls in (pylink.DAGModel, incremental.IncrementalDAGModel):
+            m = cls([Toy()])
+            lst = [1, 2]
+            m.override(m.enum.lst, lst)
+            m.total
+            lst.append(10)
+            m.override(m.enum.lst, lst)
+            totals.append(m.total)
+        assert [13, 13] == totals
+        assert not incremental.same_value(lst, lst)
+        assert incremental.same_value(3, 3)
+
+    def test_pylink_version(self, monkeypatch):
+        monkeypatch.setattr(pylink, '__version__', '0.10', raising=False)
+        with pytest.raises(RuntimeError, match='0.10'):
+            incremental.IncrementalDAGModel([])
@@ -1,19 +1,25 @@
 #!/usr/bin/env python
 
+# Taken first thing so that --timing can report on our own imports
+import time
+T_IMPORT = time.time()
+
+import argparse
+import importlib
 import math
-import pylink
-import matplotlib.pyplot as plt
-import os
-import pprint
+import sys
+import warnings
+
+import numpy as np
 
 import income as myMeager
 import position as anAwkward
 import taxes as deathAnd
 import report as explosive
-import private
+import plots
+import sweep
 
-if float(pylink.__version__) < 0.9:
-    s = """
+PYLINK_WARNING = """
 ===============================================================================
 ===                            WARNING                                      ===
 ===============================================================================
@@ -44,8 +50,10 @@ if (!willing_to_upgrade && want_to_c0d3)
 /*
  * WORKAROUND and DESCRIPTION
  *
- * Follow the example provided in amt_free_iso where we override the
- * thing we're solving for to be the lowest value in the search range
+ * Nothing in here calls solve_for any more (the AMT-free ISO
+ * exercise income is worked out in closed form), so this only bites
+ * if you call it yourself.  If you do, first override the thing
+ * you're solving for to be the lowest value in the search range
  * (really just any value in the search range).  Otherwise, what can
  * happen in versions before 0.9 is that you can accidentally leave
  * that value close to the correct value, but outside the search
@@ -60,23 +68,55 @@ if (!willing_to_upgrade && want_to_c0d3)
 }
 
 """
-    print(s)
-    input('Press <enter> to continue.')
+
+
+def check_pylink():
+    """Warns (without stopping) if the loaded pylink predates 0.9.
+
+    Only looks at pylink if something has already imported it, so it
+    doesn't cost anything at startup.
+
+    returns: True if pylink is new enough (or isn't loaded yet)
+    """
+    pylink = sys.modules.get('pylink')
+    if pylink is None:
+        return True
+    if float(pylink.__version__) < 0.9:
+        warnings.warn(PYLINK_WARNING)
+        return False
+    return True
 
 from report import comma
 
 class Investigator(object):
     """Executes a number of queries against the financial model."""
 
-    def __init__(self, model):
+    def __init__(self, model, renderer=None, cache=None):
+        """
+        model:    the DAGModel to ask
+        renderer: plots.Renderer deciding how (and whether) the plots
+                  get drawn (default: 600 dpi PNGs, right away)
+        cache:    evalcache.Cache to take the sweeps and tax summaries
+                  from (default: compute everything)
+        """
+        check_pylink()
         self.m = model
         self.e = model.enum
-        self.rep = explosive.Report(model)
+        if renderer is None: renderer = plots.Renderer()
+        self.renderer = renderer
+        self.cache = cache
+        self.sweep = sweep.price_sweep
+        if cache is not None: self.sweep = cache.sweep
+        anAwkward.normalize_dates(model)
+        self.rep = explosive.Report(model, cache=cache)
 
     def _qst(self, num, msg):
+        self._banner('Question #%d'%num, msg)
+
+    def _banner(self, title, msg):
         print()
         print('/%s/'%('*'*78))
-        print('/* %-75s*/'%('Question #%d'%num))
+        print('/* %-75s*/'%(title))
         print('/* %-75s*/'%(msg))
         print('/%s/'%('*'*78))
         print()
@@ -84,6 +124,7 @@ class Investigator(object):
 
     def question_1(self):
         self._qst(1, "How many RSUs will be automatically withheld?")
+        m = self.m
 
         print(
             """These numbers are for shares vesting throughout the
@@ -110,6 +151,7 @@ withholdings that will happen afterwards.
 
     def question_3(self):
         self._qst(3, "How many RSUs need to be sold to cover tax burden?")
+        m = self.m
         needed = int(math.ceil(m.outstanding_taxes_usd /
                                float(m.ipo_price_usd)))
         print("Share Price:  $ %.2f" % m.ipo_price_usd)
@@ -125,6 +167,7 @@ withholdings that will happen afterwards.
 
     def question_4(self):
         self._qst(4, "How much cash if we sell it all (starting with the expensive NSOs)?")
+        m = self.m
         orders = myMeager.sales_orders_all(self.m,
                                            nso_first=True,
                                            cheap_first=False)
@@ -158,6 +201,7 @@ withholdings that will happen afterwards.
 
     def question_5(self):
         self._qst(5, "How much cash if we sell the RSUs?")
+        m = self.m
         orders = myMeager.sales_orders_rsu(self.m)
         self.m.override(self.e.sales_orders, orders)
 
@@ -167,31 +211,58 @@ withholdings that will happen afterwards.
 
         print("We Clear: %s"%comma(m.cleared_from_sale_usd))
 
-    def amt_free_iso(self, strike=None):
-        m = self.m
-        e = m.enum
+    def _iso_strike(self, strike=None):
         if strike is None:
-            g = [g for g in m.grants_lst if g.vehicle=='iso'][0]
+            g = [g for g in self.m.grants_lst if g.vehicle=='iso'][0]
             strike = g.strike_usd
+        return strike
 
-        dollars = 0
-        amti_gap = 0
-        n_shares = 0
+    def amt_free_iso(self, strike=None):
+        m = self.m
+        strike = self._iso_strike(strike)
 
         max_val = m.shares_available_iso_n*(m.ipo_price_usd-strike)
 
+        iso_in = m.amt_free_iso_exercise_income_usd
+        iso_in = float(max(0, min(iso_in, max_val)))
+
+        n_shares = iso_in / float(strike)
+        n_shares = int(min(n_shares, m.shares_vested_outstanding_iso_n))
+
+        cost = n_shares * strike
+
+        return (iso_in, n_shares, strike, cost)
+
+    def amt_free_iso_sweep(self, prices, orders=None, strike=None):
+        """Same as amt_free_iso, but for a whole array of share prices.
+
+        prices: iterable of share prices
+        orders: callable(m, price) placing the sales orders for each
+                price (see sweep.price_sweep)
+        strike: strike price of the ISOs (default: first one we find)
 
-        ### BUG IN PYLINK ###
-        # https://github.com/harrison-caudill/pylink/issues/47
-        m.override(e.iso_exercise_income_usd, 0)
-        ### BUG IN PYLINK ###
+        returns: (<iso income>, <n shares>, <strike>, <cost>) where
+                 everything but the strike is an array
+        """
+        m = self.m
+        strike = self._iso_strike(strike)
+        prices = np.asarray(prices, dtype=float)
+
+        res = self.sweep(m, prices,
+                         ['amt_free_iso_exercise_income_usd',
+                          'shares_available_iso_n',
+                          'shares_vested_outstanding_iso_n'],
+                         orders=orders)
 
-        iso_in = m.solve_for(e.iso_exercise_income_usd,
-                             e.amt_taxes_usd, m.fed_reg_income_taxes_usd,
-                             0, max_val, max_val/10.0, rounds=5)
+        max_val = res['shares_available_iso_n']*(prices-strike)
+
+        iso_in = res['amt_free_iso_exercise_income_usd']
+        iso_in = np.maximum(0, np.minimum(iso_in, max_val))
 
         n_shares = iso_in / float(strike)
-        n_shares = int(min(n_shares, m.shares_vested_outstanding_iso_n))
+        n_shares = np.minimum(n_shares,
+                              res['shares_vested_outstanding_iso_n'])
+        n_shares = n_shares.astype(int)
 
         cost = n_shares * strike
 
@@ -199,6 +270,7 @@ withholdings that will happen afterwards.
 
     def question_6(self):
         self._qst(6, "If we sell it all, how many ISOs can we buy w/o AMT?")
+        m = self.m
         orders = myMeager.sales_orders_all(self.m)
         self.m.override(self.e.sales_orders, orders)
 
@@ -224,6 +296,7 @@ withholdings that will happen afterwards.
 
     def question_7(self):
         self._qst(7, "If we sell all RSUs, how many ISOs can we buy w/o AMT?")
+        m = self.m
 
         # Place an order for all RSUs
         orders = myMeager.sales_orders_rsu(self.m)
@@ -255,117 +328,123 @@ withholdings that will happen afterwards.
 
         m.override(self.e.iso_exercise_income_usd, orig)
 
-    def question_8(self, rsu_only=False):
-        augment = "RSU + NSO"
-        if rsu_only: augment = "RSU Only"
-        self._qst(8, "Basic financials vs share price (%s)" % augment)
+    def financials_vs_price(self, rsu_only=False):
+        """Sweeps the basic financials across a range of share prices.
 
+        rsu_only: only sell the RSUs (otherwise RSUs + NSOs)
+
+        returns: {'x': <prices>, '<series>': <np.array>, ...} along with
+                 the prices at which the AMT exemption starts rolling
+                 off and is gone (-1 if it doesn't happen)
+        """
         m = self.m
-        e = m.enum
 
-        # Set up the loop
+        # Set up the sweep
         lo = 5.0  # low fmv
         hi = 25.0 # high fmv
         up = 100
-        orig = m.ipo_price_usd
+        x = np.linspace(lo, hi, up+1)
 
-        x =       []
-        y_gross = []
-        y_net =   []
-        y_tax =   []
-        y_amti =  []
+        def __orders(m, price):
+            if rsu_only:
+                return myMeager.sales_orders_rsu(m, price=price)
+            return myMeager.sales_orders_all(m,
+                                             nso_first=True,
+                                             cheap_first=False,
+                                             prefer_exercise=True,
+                                             restricted=True,
+                                             price=price)
+
+        res = self.sweep(m, x,
+                         ['total_income_usd',
+                          'reg_income_usd',
+                          'outstanding_taxes_usd',
+                          'amt_taxable_income_usd',
+                          'cleared_from_sale_usd',
+                          'amt_base_income_usd',
+                          'amt_exemption_usd'],
+                         orders=__orders)
 
         amt_exemption_rolloff = -1
         amt_exemption_gone = -1
 
-        for i in range(up+1):
-            fmv = (i*(hi-lo)/up)+lo
-            x.append(fmv)
-
-            m.override(e.ipo_price_usd, fmv)
-            orders = myMeager.sales_orders_all(m,
-                                               nso_first=True,
-                                               cheap_first=False,
-                                               prefer_exercise=True,
-                                               restricted=True,
-                                               price=fmv)
-            if rsu_only:
-                orders = myMeager.sales_orders_rsu(self.m, price=fmv)
-            self.m.override(self.e.sales_orders, orders)
-
-            if (0 > amt_exemption_rolloff
-                and m.amt_base_income_usd > m.amt_exemption_rolloff_threshhold_usd):
-                amt_exemption_rolloff = fmv
-
-            if (0 > amt_exemption_gone
-                and m.amt_exemption_usd == 0):
-                amt_exemption_gone = fmv
-
-                m.override(e.iso_exercise_income_usd, 0)
-                m.override(e.ext_amt_income_usd, 0)
-
-            y_gross.append(m.total_income_usd-m.reg_income_usd)
-            y_tax.append(m.outstanding_taxes_usd)
-            y_amti.append(m.amt_taxable_income_usd)
-            y_net.append(m.cleared_from_sale_usd)
-
-        # Reset our state
-        m.override(e.ipo_price_usd, orig)
-
-        # Let's make our plots
-        fig, ax = plt.subplots()
-        ax.set_ylabel('Value (USD)')
-
-        ax.plot(x, y_gross, label='Gross Sales Income (post Withholding)')
-        ax.plot(x, y_tax, label='Outstanding Tax Bill')
-        ax.plot(x, y_amti, label='AMTI')
-        ax.plot(x, y_net, label='Net Income from Sale')
-
-        if 0 < amt_exemption_rolloff:
-            ax.axvline(amt_exemption_rolloff)
-            ax.text(amt_exemption_rolloff,
-                    m.amt_exemption_rolloff_threshhold_usd*1.1,
-                    'AMT Rolloff',
-                    rotation=45)
-
-        if 0 < amt_exemption_gone:
-            ax.axvline(amt_exemption_gone)
-            ax.text(amt_exemption_gone,
-                    m.amt_exemption_rolloff_threshhold_usd*1.1,
-                    'AMT Exemp. Gone',
-                    rotation=45)
-
-        ax.grid()
-        fig.suptitle('Financials vs FMV (%s)'%augment)
-        ax.legend()
-
-        fname = 'fin_all.png'
-        if rsu_only: fname = 'fin_rsu.png'
-        path = os.path.join('.', fname)
-        fig.savefig(path, transparent=False, dpi=600)
+        crit = m.amt_exemption_rolloff_threshhold_usd
+        rolled = res['amt_base_income_usd'] > crit
+        if rolled.any():
+            amt_exemption_rolloff = x[rolled.argmax()]
+
+        gone = res['amt_exemption_usd'] == 0
+        if gone.any():
+            amt_exemption_gone = x[gone.argmax()]
+
+        return {
+            'augment': "RSU Only" if rsu_only else "RSU + NSO",
+            'x': x,
+            'gross_usd': res['total_income_usd'] - res['reg_income_usd'],
+            'taxes_usd': res['outstanding_taxes_usd'],
+            'amti_usd': res['amt_taxable_income_usd'],
+            'net_usd': res['cleared_from_sale_usd'],
+            'rolloff_threshold_usd': crit,
+            'amt_exemption_rolloff': amt_exemption_rolloff,
+            'amt_exemption_gone': amt_exemption_gone,
+            }
 
-    def question_9(self):
-        self._qst(9, "What does exercisable ISOs look like vs IPO price?")
+    def question_8(self, rsu_only=False):
+        augment = "RSU + NSO"
+        if rsu_only: augment = "RSU Only"
+        self._qst(8, "Basic financials vs share price (%s)" % augment)
+
+        data = self.financials_vs_price(rsu_only=rsu_only)
 
+        fname = 'fin_all'
+        if rsu_only: fname = 'fin_rsu'
+        self.renderer.render(plots.financials, data, fname)
+        return data
+
+    def iso_outlook_vs_price(self):
+        """Sweeps the AMT-free ISO exercises across a range of prices.
+
+        Leaves the query date at 3/15/21.
+
+        returns: {'x': <prices>, '<series>': <np.array>, ...} along with
+                 where (and at what share count) the AMT exemption
+                 rolls off, is gone, and all ISOs become exercisable
+                 (-1 if it doesn't happen)
+        """
         m = self.m
-        e = m.enum
 
-        # Set up the loop
+        # Set up the sweep
         lo = 12.0  # low fmv
         hi = 15.0 # high fmv
         up = 100
-        orig = m.ipo_price_usd
-        x = []
-        y_iso_n = []
-        y_gross = []
-        y_tax = []
-        y_cleared = []
-        y_ex_cost = []
-        y_rem = []
-        y_test = []
-        y_amt_diff = []
-        m.override(self.e.query_date, '3/15/21')
-        #m.override(self.e.query_date, '12/31/35')
+        x = np.linspace(lo, hi, up, endpoint=False)
+        m.override(self.e.query_date, anAwkward.parse_date('3/15/21'))
+        #m.override(self.e.query_date, anAwkward.parse_date('12/31/35'))
+
+        def __orders(m, price):
+            return myMeager.sales_orders_all(m,
+                                             nso_first=True,
+                                             cheap_first=False,
+                                             prefer_exercise=True,
+                                             restricted=False,
+                                             price=price)
+
+        (amt, y_iso_n, strike, y_ex_cost) = self.amt_free_iso_sweep(
+            x, orders=__orders)
+
+        # Where the AMT exemption is before exercising anything...
+        res = self.sweep(m, x,
+                         ['amt_base_income_usd',
+                          'amt_exemption_usd'],
+                         orders=__orders,
+                         iso_exercise_income_usd=0)
+
+        # ...and what the money looks like once we have
+        out = self.sweep(m, x,
+                         ['total_income_usd',
+                          'cleared_from_sale_usd'],
+                         orders=__orders,
+                         iso_exercise_income_usd=amt)
 
         # triggers for vertical lines
         amt_exemption_rolloff = -1
@@ -374,116 +453,98 @@ withholdings that will happen afterwards.
         rolloff_val = -1
         gone_val = -1
 
-        for i in range(up):
-            fmv = (i*(hi-lo)/up)+lo
-            x.append(fmv)
-
-            m.override(e.ipo_price_usd, fmv)
-            orders_all = myMeager.sales_orders_all(m,
-                                                   nso_first=True,
-                                                   cheap_first=False,
-                                                   prefer_exercise=True,
-                                                   restricted=False,
-                                                   price=fmv)
-            orders_opts = myMeager.sales_orders_options(m,
-                                                        nso_first=True,
-                                                        cheap_first=False,
-                                                        prefer_exercise=True,
-                                                        restricted=False,
-                                                        price=fmv)
-            orders_rsu = myMeager.sales_orders_rsu(m,price=fmv)
-            self.m.override(self.e.sales_orders, orders_all)
-
-            (amt, iso, strike, cost) = self.amt_free_iso()
-
-            if (0 > amt_exemption_rolloff
-                and m.amt_base_income_usd > m.amt_exemption_rolloff_threshhold_usd-10*m.ipo_price_usd
-                and m.amt_base_income_usd < m.amt_exemption_rolloff_threshhold_usd+10*m.ipo_price_usd):
-                amt_exemption_rolloff = fmv
-                rolloff_val = iso
-
-            if (0 > amt_exemption_gone
-                and 0 < amt_exemption_rolloff
-                and m.amt_exemption_usd == 0):
-                amt_exemption_gone = fmv
-                gone_val = iso
-
-            if ((0 > iso_saturated)
-                and (iso >= m.shares_vested_outstanding_iso_n)):
-                iso_saturated = fmv
-
-            m.override(self.e.iso_exercise_income_usd, amt)
-
-            a = m.fed_reg_income_taxes_usd
-            b = m.amt_taxes_usd
-
-            y_iso_n.append(iso)
-            cleared = m.cleared_from_sale_usd
-
-            y_gross.append(m.total_income_usd)
-            # y_tax.append(m.outstanding_taxes_usd)
-            y_cleared.append(cleared)
-            y_ex_cost.append(cost)
-            # y_rem.append(cleared - cost)
-            
-        m.override(e.ipo_price_usd, orig)
-
-        # Let's make our plots
-        fig, ax_shares = plt.subplots()
-        ax_shares.set_xlabel('Share Price (USD)')
-
-        ax_shares.set_ylabel('ISOs (n)')
-        ax_shares.plot(x, y_iso_n,
-                       label='AMT Free ISO Exercises',
-                       color='tab:purple')
-
-        color = 'tab:green'
-        ax_dollars = ax_shares.twinx()
-        ax_dollars.set_ylabel('Value ($k)')
-
-        y_cleared = [x/1000 for x in y_cleared]
-        y_gross = [x/1000 for x in y_gross]
-        y_ex_cost = [x/1000 for x in y_ex_cost]
-        y_rem = [x/1000 for x in y_rem]
-        ax_dollars.set_ylim(0, y_gross[-1]*1.1)
-
-        ax_dollars.plot(x, y_gross, label='Pre-Tax Income')
-        ax_dollars.plot(x, y_cleared, label='Post-Tax Cash from Sale')
-        # ax_dollars.plot(x, y_tax, label='Taxes Owed')
-        # ax_dollars.plot(x, y_cleared, label='Post-Tax Income')
-        #ax_dollars.plot(x, y_ex_cost, label='Cost to Exercise')
-        # ax_dollars.plot(x, y_rem, label='Remaining')
-
-        if 0 < amt_exemption_rolloff:
-            ax_shares.axvline(amt_exemption_rolloff)
-            ax_shares.text(amt_exemption_rolloff,
-                           rolloff_val*1.05,
-                           'AMT Rolloff',
-                           rotation=45)
-
-        if 0 < amt_exemption_gone:
-            ax_shares.axvline(amt_exemption_gone)
-            ax_shares.text(amt_exemption_gone,
-                           gone_val*.95,
-                           'AMT Exemp. Gone',
-                           rotation=45)
-
-        if 0 < iso_saturated:
-            ax_shares.axvline(iso_saturated)
-            ax_shares.text(iso_saturated,
-                           m.shares_vested_outstanding_iso_n*.95,
-                           "All ISO's Available",
-                           rotation=0)
-
-        fig.suptitle('ISO Outlook vs FMV')
-        ax_shares.legend(loc=3)
-        ax_dollars.legend()
-
-        fname = 'iso.png'
-        path = os.path.join('.', fname)
-        fig.savefig(path, transparent=False, dpi=600)
-
-    def go(self):
+        crit = m.amt_exemption_rolloff_threshhold_usd
+        near = np.abs(res['amt_base_income_usd'] - crit) < 10*x
+        if near.any():
+            i = near.argmax()
+            amt_exemption_rolloff = x[i]
+            rolloff_val = y_iso_n[i]
+
+            gone = res['amt_exemption_usd'] == 0
+            gone[:i] = False
+            if gone.any():
+                i = gone.argmax()
+                amt_exemption_gone = x[i]
+                gone_val = y_iso_n[i]
+
+        iso_max = m.shares_vested_outstanding_iso_n
+        saturated = y_iso_n >= iso_max
+        if saturated.any():
+            iso_saturated = x[saturated.argmax()]
+
+        return {
+            'x': x,
+            'iso_n': y_iso_n,
+            'exercise_cost_usd': y_ex_cost,
+            'gross_usd': out['total_income_usd'],
+            'cleared_usd': out['cleared_from_sale_usd'],
+            'amt_exemption_rolloff': amt_exemption_rolloff,
+            'rolloff_n': rolloff_val,
+            'amt_exemption_gone': amt_exemption_gone,
+            'gone_n': gone_val,
+            'iso_saturated': iso_saturated,
+            'iso_max_n': iso_max,
+            }
+
+    def question_9(self):
+        self._qst(9, "What does exercisable ISOs look like vs IPO price?")
+
+        data = self.iso_outlook_vs_price()
+        self.renderer.render(plots.iso_outlook, data, 'iso')
+        return data
+
+    def price_distribution(self, dist=None, n=1000000, seed=None):
+        """Question 8's financials, but with random share prices.
+
+        Sells the RSUs and NSOs (as question 8 does) at n prices drawn
+        from dist and reports percentiles and tail risk of the taxes,
+        the cleared cash, and the AMT-free ISO capacity.
+
+        dist: price distribution from montecarlo (default: lognormal
+              around the IPO price with a sigma of 0.4)
+        n:    number of samples
+        seed: for the random number generator
+
+        returns: the montecarlo.summarize() summary
+        """
+        import montecarlo
+        m = self.m
+        if dist is None: dist = montecarlo.LogNormal(m.ipo_price_usd, 0.4)
+        self._banner('Monte Carlo',
+                     "Financials across {:,} random share prices".format(n))
+
+        def __orders(m, price):
+            return myMeager.sales_orders_all(m,
+                                             nso_first=True,
+                                             cheap_first=False,
+                                             prefer_exercise=True,
+                                             restricted=True,
+                                             price=price)
+
+        samples = montecarlo.simulate(m, dist, n=n, orders=__orders,
+                                      seed=seed)
+        summary = montecarlo.summarize(samples)
+        print(montecarlo.report(summary))
+        return summary
+
+    def go(self, workers=None):
+        """Ask all of the questions.
+
+        workers: if given, ask them all at once across that many
+                 processes (see parallel.run_questions) and print the
+                 answers in order once they're all in; the plots are
+                 still drawn by self.renderer
+        """
+        if workers is not None:
+            import parallel
+            for txt in parallel.run_questions(self.m, workers=workers,
+                                              renderer=self.renderer,
+                                              cache=self.cache):
+                print(txt, end='')
+            self.renderer.wait()
+            print()
+            return
+
         self.question_1()
         self.question_2()
         self.question_3()
@@ -494,9 +555,115 @@ withholdings that will happen afterwards.
         self.question_8()
         self.question_8(rsu_only=True)
         self.question_9()
+        self.renderer.wait()
+        print()
+
+def main(argv=None):
+    """Command line entry point.
+
+    Nothing heavy (pylink, matplotlib) gets imported until the model
+    module is loaded or a plot is drawn, so --help and friends come
+    back right away.  Use --timing to see where startup time goes.
+    """
+    t_start = time.time()
+
+    p = argparse.ArgumentParser(
+        description="Ask the Investigator questions about your model.")
+    p.add_argument('-m', '--model', default='private',
+                   help="module defining MODEL (default: private)")
+    p.add_argument('-q', '--questions', default=None,
+                   help="comma separated question numbers (default: all)")
+    p.add_argument('-j', '--workers', type=int, default=None,
+                   help="ask the questions across this many processes")
+    p.add_argument('--no-plots', action='store_true',
+                   help="skip drawing the plots")
+    p.add_argument('--format', default='png',
+                   help="plot file format, e.g. png, svg, pdf")
+    p.add_argument('--dpi', type=int, default=600,
+                   help="plot resolution for raster formats")
+    p.add_argument('--background', action='store_true',
+                   help="draw the plots in a background process")
+    p.add_argument('--timing', action='store_true',
+                   help="report import and run times on stderr")
+    p.add_argument('--profile', choices=['table', 'folded'], default=None,
+                   help="time every node (the questions run serially): "
+                   "a sorted table, or folded stacks for flamegraph.pl")
+    p.add_argument('--profile-out', default=None,
+                   help="write the profile here instead of stderr")
+    p.add_argument('--monte-carlo', type=int, default=None, metavar='N',
+                   help="report the financials across N random share "
+                   "prices (the questions are skipped unless -q is given)")
+    p.add_argument('--sigma', type=float, default=0.4,
+                   help="log-price volatility for --monte-carlo")
+    p.add_argument('--seed', type=int, default=None,
+                   help="random seed for --monte-carlo")
+    p.add_argument('--cache', nargs='?', default=None, metavar='PATH',
+                   const='.evalcache.sqlite',
+                   help="keep the sweeps and tax summaries in an on-disk "
+                   "cache, recomputing only what changed (default PATH: "
+                   "%(const)s)")
+    args = p.parse_args(argv)
+
+    t_load = time.time()
+    model = importlib.import_module(args.model).MODEL
+    t_model = time.time()
+
+    renderer = plots.Renderer(fmt=args.format,
+                              dpi=args.dpi,
+                              background=args.background,
+                              enabled=not args.no_plots)
+    cache = None
+    if args.cache is not None:
+        import evalcache
+        cache = evalcache.Cache(args.cache)
+    dixon_hill = Investigator(model, renderer=renderer, cache=cache)
+
+    prof = None
+    workers = args.workers
+    if args.profile is not None:
+        import profiler
+        prof = profiler.Profiler(model)
+        prof.attach()
+        workers = None
+
+    if args.questions is None and args.monte_carlo is None:
+        dixon_hill.go(workers=workers)
+    elif args.questions is not None:
+        for num in args.questions.split(','):
+            getattr(dixon_hill, 'question_%d' % int(num))()
+        renderer.wait()
         print()
 
+    if args.monte_carlo is not None:
+        import montecarlo
+        dist = montecarlo.LogNormal(model.ipo_price_usd, args.sigma)
+        dixon_hill.price_distribution(dist, n=args.monte_carlo,
+                                      seed=args.seed)
+    if cache is not None: cache.close()
+    t_done = time.time()
+
+    if prof is not None:
+        prof.detach()
+        if 'table' == args.profile:
+            txt = prof.table()
+        else:
+            txt = prof.folded()
+        if args.profile_out is None:
+            sys.stderr.write(txt)
+        else:
+            with open(args.profile_out, 'w') as fd:
+                fd.write(txt)
+
+    if args.timing:
+        sys.stderr.write("investigator import: %6.1f ms\n"
+                         % ((t_start - T_IMPORT) * 1000))
+        sys.stderr.write("startup:             %6.1f ms\n"
+                         % ((t_load - T_IMPORT) * 1000))
+        sys.stderr.write("model:               %6.1f ms (%s)\n"
+                         % ((t_model - t_load) * 1000, args.model))
+        sys.stderr.write("questions:           %6.1f ms\n"
+                         % ((t_done - t_model) * 1000))
+
+
 if __name__ == '__main__':
-    m = private.MODEL
-    dixon_hill = Investigator(m)
-    dixon_hill.go()
+    main()
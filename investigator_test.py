@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import types
+import warnings
+
+import pytest
+
+import investigator
+import plots
+from sweep_test import model
+
+
+class TestInvestigator(object):
+
+    def test_check_pylink(self, monkeypatch):
+        monkeypatch.setitem(sys.modules, 'pylink',
+                            types.SimpleNamespace(__version__='0.8'))
+        with pytest.warns(UserWarning):
+            assert not investigator.check_pylink()
+
+        monkeypatch.setitem(sys.modules, 'pylink',
+                            types.SimpleNamespace(__version__='0.9'))
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            assert investigator.check_pylink()
+
+    def test_go_workers(self, model, monkeypatch, capsys, tmp_path):
+        monkeypatch.chdir(tmp_path)
+        off = plots.Renderer(enabled=False)
+        investigator.Investigator(model, renderer=off).go(workers=2)
+        assert 'Question #9' in capsys.readouterr()[0]
+        assert [] == os.listdir(str(tmp_path))
+
+        # The plots come back and are drawn the caller's way
+        svg = plots.Renderer(outdir=str(tmp_path), fmt='svg')
+        investigator.Investigator(model, renderer=svg).go(workers=2)
+        assert (['fin_all.svg', 'fin_rsu.svg', 'iso.svg']
+                == sorted(os.listdir(str(tmp_path))))
+
+    def test_main(self, model, monkeypatch, capsys):
+        monkeypatch.setitem(sys.modules, 'fake_private',
+                            types.SimpleNamespace(MODEL=model))
+        investigator.main(['-m', 'fake_private', '-q', '1,3',
+                           '--no-plots', '--timing'])
+        (out, err) = capsys.readouterr()
+        assert 'Question #1' in out
+        assert 'Question #3' in out
+        assert 'Question #2' not in out
+        assert 'startup:' in err
+
+    def test_main_monte_carlo(self, model, monkeypatch, capsys):
+        monkeypatch.setitem(sys.modules, 'fake_private',
+                            types.SimpleNamespace(MODEL=model))
+        investigator.main(['-m', 'fake_private', '--monte-carlo', '1000',
+                           '--seed', '1', '--no-plots'])
+        (out, err) = capsys.readouterr()
+        assert 'Question #' not in out
+        assert 'Financials across 1,000 random share prices' in out
+        assert 'iso_capacity_usd' in out
+
+    def test_main_cache(self, model, monkeypatch, capsys, tmp_path):
+        monkeypatch.setitem(sys.modules, 'fake_private',
+                            types.SimpleNamespace(MODEL=model))
+        path = str(tmp_path / 'cache.sqlite')
+        argv = ['-m', 'fake_private', '-q', '2,8', '--no-plots',
+                '--cache', path]
+        investigator.main(argv)
+        (first, err) = capsys.readouterr()
+        investigator.main(argv)
+        (again, err) = capsys.readouterr()
+        assert first == again
+        assert os.path.exists(path)
+
+    def test_main_workers(self, model, monkeypatch, capsys, tmp_path):
+        monkeypatch.setitem(sys.modules, 'fake_private',
+                            types.SimpleNamespace(MODEL=model))
+        monkeypatch.chdir(tmp_path)
+        investigator.main(['-m', 'fake_private', '-j', '2', '--no-plots',
+                           '--cache', 'cache.sqlite'])
+        (out, err) = capsys.readouterr()
+        assert 'Question #9' in out
+        assert [] == [ f for f in os.listdir('.')
+                       if not f.startswith('cache.sqlite') ]
+
+        # The workers filled the cache in
+        import evalcache
+        with evalcache.Cache('cache.sqlite') as c:
+            assert len(c)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+
+import numpy as np
+
+import sweep
+
+
+# What simulate() collects for every sample
+NODES = [
+    'outstanding_taxes_usd',
+    'cleared_from_sale_usd',
+    'amt_free_iso_exercise_income_usd',
+    'rem_shares_vested_outstanding_iso_n',
+    'rem_exercise_cost_vested_outstanding_iso_usd',
+    ]
+
+# Which end of each series hurts (for the tail statistics)
+WORST = {
+    'price_usd': 'low',
+    'outstanding_taxes_usd': 'high',
+    'cleared_from_sale_usd': 'low',
+    'iso_capacity_usd': 'low',
+    }
+
+PERCENTILES = [1, 5, 25, 50, 75, 95, 99]
+
+
+###############################################################################
+# Price distributions                                                         #
+###############################################################################
+
+class LogNormal(object):
+    """Share price drawn straight from a lognormal distribution."""
+
+    def __init__(self, median_usd, sigma):
+        """median_usd: median share price
+        sigma:      standard deviation of the log of the price
+        """
+        assert(0 < median_usd)
+        assert(0 <= sigma)
+        self.median_usd = median_usd
+        self.sigma = sigma
+
+    def draw(self, n, rng):
+        return rng.lognormal(np.log(self.median_usd), self.sigma, n)
+
+
+class GBM(object):
+    """Share price at the end of (or along) a geometric Brownian motion.
+
+    Handy for the price after a lockup: start at the IPO price and let
+    it wander for the length of the lockup.  Whole paths are drawn
+    (steps points each), so the sale price can also be the average
+    along the path (selling evenly, e.g. a 10b5-1 plan) or its low.
+    """
+
+    def __init__(self, start_usd, mu=0.0, sigma=0.5, years=0.5, steps=1,
+                 at='end'):
+        """start_usd: price at the start of the path
+        mu:        annual drift
+        sigma:     annual volatility
+        years:     length of the path
+        steps:     number of steps along the path
+        at:        sale price: 'end', 'mean' or 'min' of the path
+        """
+        assert(0 < start_usd)
+        assert(0 <= sigma)
+        assert(1 <= steps)
+        assert(at in ['end', 'mean', 'min'])
+        self.start_usd = start_usd
+        self.mu = mu
+        self.sigma = sigma
+        self.years = years
+        self.steps = steps
+        self.at = at
+
+    def paths(self, n, rng):
+        """n price paths, shaped (n, steps)"""
+        dt = self.years / float(self.steps)
+        drift = (self.mu - 0.5 * self.sigma**2) * dt
+        shocks = rng.standard_normal((n, self.steps)) * self.sigma * dt**0.5
+        return self.start_usd * np.exp(np.cumsum(drift + shocks, axis=1))
+
+    def draw(self, n, rng, chunk=10000):
+        if 'end' == self.at:
+            # Only the end matters, so skip straight to it
+            drift = (self.mu - 0.5 * self.sigma**2) * self.years
+            shocks = rng.standard_normal(n) * self.sigma * self.years**0.5
+            return self.start_usd * np.exp(drift + shocks)
+
+        # A chunk of paths at a time, so they don't all sit in memory
+        retval = np.empty(n)
+        for lo in range(0, n, chunk):
+            k = min(chunk, n - lo)
+            retval[lo:lo+k] = getattr(self.paths(k, rng), self.at)(axis=1)
+        return retval
+
+
+###############################################################################
+# Simulation                                                                  #
+###############################################################################
+
+def iso_capacity_usd(prices, res):
+    """optimizer.iso_capacity_usd for a whole batch of sweep results."""
+    spread = (res['rem_shares_vested_outstanding_iso_n'] * prices
+              - res['rem_exercise_cost_vested_outstanding_iso_usd'])
+    return np.maximum(0.0, np.minimum(res['amt_free_iso_exercise_income_usd'],
+                                      spread))
+
+
+def iter_simulate(m, dist, n=1000000, orders=None, batch=250000, seed=None,
+                  **overrides):
+    """Same as simulate, but hands back one batch at a time.
+
+    Only a batch worth of samples is ever in memory, which is what you
+    want when streaming them somewhere (see export.write).
+
+    yields: {'price_usd': <np.array>, ...} for up to batch samples
+    """
+    rng = np.random.default_rng(seed)
+    for lo in range(0, n, batch):
+        x = dist.draw(min(batch, n - lo), rng)
+        res = sweep.price_sweep(m, x, NODES, orders=orders, **overrides)
+        yield {
+            'price_usd': x,
+            'outstanding_taxes_usd': res['outstanding_taxes_usd'],
+            'cleared_from_sale_usd': res['cleared_from_sale_usd'],
+            'iso_capacity_usd': iso_capacity_usd(x, res),
+            }
+
+
+def simulate(m, dist, n=1000000, orders=None, batch=250000, seed=None,
+             **overrides):
+    """Evaluates the model at n share prices drawn from dist.
+
+    The prices go through sweep.price_sweep batch at a time, so each
+    batch is a single vectorized pass through the model.
+
+    m:         the DAGModel
+    dist:      price distribution (e.g. LogNormal, GBM)
+    n:         number of samples
+    orders:    order generator (see sweep.price_sweep)
+    batch:     most samples to push through the model at once
+    seed:      for numpy's random generator
+    overrides: anything else to hold during the sweep (see price_sweep)
+
+    returns: {'price_usd': <np.array>,
+              'outstanding_taxes_usd': ...,
+              'cleared_from_sale_usd': ...,
+              'iso_capacity_usd': ...}
+    """
+    retval = dict([ (name, np.empty(n)) for name in WORST ])
+    lo = 0
+    for part in iter_simulate(m, dist, n=n, orders=orders, batch=batch,
+                              seed=seed, **overrides):
+        k = len(part['price_usd'])
+        for name in WORST:
+            retval[name][lo:lo+k] = part[name]
+        lo += k
+    return retval
+
+
+###############################################################################
+# Statistics                                                                  #
+###############################################################################
+
+def tail(v, alpha=0.05, worst='low'):
+    """Value at risk and conditional value at risk of a series.
+
+    v:     samples
+    alpha: size of the tail (0.05 is the worst 5%)
+    worst: which end hurts, 'low' or 'high'
+
+    returns: (<VaR>, <CVaR>) where VaR is where the worst alpha of
+             the samples begins, and CVaR is their average
+    """
+    assert(0 < alpha < 1)
+    v = np.asarray(v, dtype=float)
+    if 'low' == worst:
+        var = np.quantile(v, alpha)
+        bad = v[v <= var]
+    else:
+        var = np.quantile(v, 1.0 - alpha)
+        bad = v[v >= var]
+    return (float(var), float(bad.mean()))
+
+
+def summarize(samples, percentiles=PERCENTILES, alpha=0.05):
+    """Percentiles and tail risk for every series simulate() returned.
+
+    returns: {<series>: {'mean': ..., 'std': ...,
+                         'percentiles': {<p>: <value>, ...},
+                         'var': ..., 'cvar': ...,
+                         'worst': 'low'|'high', 'alpha': alpha},
+              ...}
+    """
+    retval = {}
+    for name, v in samples.items():
+        worst = WORST.get(name, 'low')
+        (var, cvar) = tail(v, alpha=alpha, worst=worst)
+        pct = np.percentile(v, percentiles)
+        retval[name] = {
+            'mean': float(np.mean(v)),
+            'std': float(np.std(v)),
+            'percentiles': dict(zip(percentiles, [ float(p) for p in pct ])),
+            'var': var,
+            'cvar': cvar,
+            'worst': worst,
+            'alpha': alpha,
+            }
+    return retval
+
+
+def report(summary):
+    """Text table of a summary, one row per series."""
+    names = [ n for n in WORST if n in summary ]
+    names += sorted([ n for n in summary if n not in WORST ])
+    pcts = sorted(summary[names[0]]['percentiles'].keys())
+
+    cols = ['Mean'] + [ 'P%g' % p for p in pcts ] + ['VaR', 'CVaR']
+    lines = [ '%-24s' % 'Series' + ''.join([ '%11s' % c for c in cols ]) ]
+    for name in names:
+        s = summary[name]
+        vals = ([s['mean']]
+                + [ s['percentiles'][p] for p in pcts ]
+                + [s['var'], s['cvar']])
+        lines.append('%-24s' % name
+                     + ''.join([ '%11s' % ('{:,.0f}'.format(v)
+                                           if 100 <= abs(v)
+                                           else '%.2f' % v)
+                                 for v in vals ]))
+    s = summary[names[0]]
+    lines.append('(VaR/CVaR: worst %g%% of samples)' % (100 * s['alpha']))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+import numpy as np
+import pytest
+
+import income as myMeager
+import montecarlo
+import optimizer
+from sweep_test import model
+
+
+def orders(m, price):
+    return myMeager.sales_orders_all(m, price=price)
+
+
+class TestMonteCarlo(object):
+
+    def test_lognormal(self):
+        rng = np.random.default_rng(0)
+        x = montecarlo.LogNormal(12, 0.4).draw(100000, rng)
+        assert(np.median(x) == pytest.approx(12, rel=0.01))
+        assert(np.std(np.log(x)) == pytest.approx(0.4, rel=0.01))
+
+    def test_gbm(self):
+        rng = np.random.default_rng(0)
+        end = montecarlo.GBM(10, sigma=0.5, years=1).draw(100000, rng)
+        assert(np.mean(end) == pytest.approx(10, rel=0.01))
+
+        g = montecarlo.GBM(10, sigma=0.5, years=1, steps=12, at='min')
+        low = g.draw(1000, rng, chunk=300)
+        assert(low.shape == (1000,))
+        assert(g.paths(5, rng).shape == (5, 12))
+        assert((low <= 10 * np.exp(5 * 0.5)).all())
+        assert(np.mean(low) < 10)
+
+    def test_matches_overrides(self, model):
+        m = model
+        dist = montecarlo.LogNormal(12, 0.5)
+        res = montecarlo.simulate(m, dist, n=7, batch=3, orders=orders,
+                                  seed=1)
+
+        for i, price in enumerate(res['price_usd']):
+            m.override(m.enum.ipo_price_usd, price)
+            m.override(m.enum.sales_orders, orders(m, price))
+            assert(res['outstanding_taxes_usd'][i]
+                   == pytest.approx(m.outstanding_taxes_usd))
+            assert(res['cleared_from_sale_usd'][i]
+                   == pytest.approx(m.cleared_from_sale_usd))
+            assert(res['iso_capacity_usd'][i]
+                   == pytest.approx(optimizer.iso_capacity_usd(m)))
+
+    def test_tail(self):
+        v = np.arange(1, 101, dtype=float)
+        (var, cvar) = montecarlo.tail(v, alpha=0.1, worst='low')
+        assert(var == pytest.approx(10.9))
+        assert(cvar == pytest.approx(5.5))
+        (var, cvar) = montecarlo.tail(v, alpha=0.1, worst='high')
+        assert(var == pytest.approx(90.1))
+        assert(cvar == pytest.approx(95.5))
+
+    def test_summarize(self, model):
+        res = montecarlo.simulate(model, montecarlo.LogNormal(12, 0.4),
+                                  n=2000, orders=orders, seed=2)
+        s = montecarlo.summarize(res, percentiles=[5, 50, 95], alpha=0.05)
+        taxes = s['outstanding_taxes_usd']
+        assert(taxes['worst'] == 'high')
+        assert(taxes['percentiles'][5] <= taxes['percentiles'][50]
+               <= taxes['percentiles'][95] <= taxes['var'] <= taxes['cvar'])
+        cash = s['cleared_from_sale_usd']
+        assert(cash['cvar'] <= cash['var'] == cash['percentiles'][5])
+        txt = montecarlo.report(s)
+        assert('cleared_from_sale_usd' in txt)
+        assert('P95' in txt)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+
+import heapq
+import math
+
+import numpy as np
+
+import sweep
+from position import GrantBook
+from position import VEHICLES
+
+
+def _candidates(m, prefer_exercise):
+    """(<name>, <vehicle>, <shares available>, <kink>) for every grant
+
+    The kink is where the sale moves from one kind of share to the
+    other (held vs freshly exercised), which changes what a share is
+    worth to us.
+    """
+    on = m.query_date
+    rates = dict([ (typ, getattr(m, 'shares_withheld_%s_rate' % typ))
+                   for typ in VEHICLES ])
+    grants = m.grants_lst
+    if isinstance(grants, GrantBook):
+        veh = [ VEHICLES[v] for v in grants.vehicle ]
+        avail = grants.available(on, np.array([ rates[v] for v in veh ]))
+        if prefer_exercise:
+            kink = grants.vested_outstanding(on)
+        else:
+            kink = grants.held()
+        return list(zip(grants.name, veh, avail, kink))
+
+    retval = []
+    for g in grants:
+        if prefer_exercise:
+            kink = g.vested_outstanding(on)
+        else:
+            kink = g.held()
+        retval.append((g.name,
+                       g.vehicle,
+                       g.available(on, rates[g.vehicle]),
+                       kink))
+    return retval
+
+
+def iso_capacity_usd(m):
+    """AMT-free ISO exercise income we could actually use.
+
+    The AMT crossover (amt_free_iso_exercise_income_usd), capped by the
+    spread on the vested ISOs that are still outstanding after the
+    sale.
+    """
+    spread = (m.rem_shares_vested_outstanding_iso_n * m.ipo_price_usd
+              - m.rem_exercise_cost_vested_outstanding_iso_usd)
+    return max(0.0, min(m.amt_free_iso_exercise_income_usd, spread))
+
+
+def optimize_sales(m,
+                   iso_weight=0.0,
+                   steps=20,
+                   price=None,
+                   prefer_exercise=True,
+                   restricted=True):
+    """Finds sales orders that maximize cleared cash (and ISO headroom).
+
+    The objective is:
+
+        cleared_from_sale_usd + iso_weight * iso_capacity_usd(m)
+
+    so iso_weight is what a dollar of AMT-free ISO exercise income is
+    worth to you, relative to a dollar of cash.
+
+    Every grant's sellable shares (see Grant.available) are cut into
+    steps chunks (breaking at the switch between held and freshly
+    exercised option shares), and we greedily take whichever chunk
+    adds the most to the objective per share, until nothing helps.
+    To save evaluations, the gains worked out earlier are treated as
+    upper bounds: only the chunk at the top of the heap is re-checked.
+    That would be exact if every share were worth a little less than
+    the one before, but the objective isn't concave (it takes the
+    larger of the regular tax and AMT, the AMT exemption phases out,
+    and ISO headroom is weighed in), so this is a heuristic: a good
+    answer, not necessarily the best one.  Options sold never exceed
+    shares_sellable_restricted_n (unless restricted is False).
+
+    m:               the DAGModel
+    iso_weight:      value of a dollar of AMT-free ISO exercise income
+    steps:           number of chunks to cut each grant into
+    price:           sale price (default: ipo_price_usd)
+    prefer_exercise: passed along on the option sales orders
+    restricted:      honor the restricted option sales limit
+
+    The model's sales orders are left the way we found them.
+
+    returns: {
+        'orders':           [<Sales Order>, ...],
+        'objective':        value of the objective with those orders,
+        'cleared_usd':      cleared_from_sale_usd,
+        'iso_capacity_usd': iso_capacity_usd,
+        'evaluations':      number of times the model was evaluated,
+        }
+    """
+    if price is None: price = m.ipo_price_usd
+    assert(0 <= price)
+
+    cands = [ (name, veh, int(math.floor(avail)), int(kink))
+              for (name, veh, avail, kink) in _candidates(m, prefer_exercise)
+              if 1 <= avail ]
+    cap = [ c[2] for c in cands ]
+    kink = [ c[3] if c[1] != 'rsu' else 0 for c in cands ]
+    chunk = [ max(1, int(math.ceil(n / float(steps)))) for n in cap ]
+    is_option = [ c[1] != 'rsu' for c in cands ]
+    qty = [0] * len(cands)
+
+    restricted_left = float('inf')
+    if restricted: restricted_left = m.shares_sellable_restricted_n
+
+    def __orders(qty):
+        return [ {'id': cands[i][0],
+                  'qty': qty[i],
+                  'price': price,
+                  'prefer_exercise': prefer_exercise}
+                 for i in range(len(cands)) if qty[i] ]
+
+    counter = [0]
+    def __value(qty):
+        counter[0] += 1
+        m.override(m.enum.sales_orders, __orders(qty))
+        return (m.cleared_from_sale_usd
+                + iso_weight * iso_capacity_usd(m))
+
+    def __step(i):
+        n = min(chunk[i], cap[i] - qty[i])
+        if qty[i] < kink[i]: n = min(n, kink[i] - qty[i])
+        if is_option[i]: n = min(n, restricted_left)
+        return int(n)
+
+    def __gain(i, cur):
+        n = __step(i)
+        if n <= 0: return (None, 0)
+        nxt = list(qty)
+        nxt[i] += n
+        val = __value(nxt)
+        return ((val - cur) / n, val)
+
+    saved = sweep.snapshot_nodes(m, ['sales_orders'])
+    try:
+        cur = __value(qty)
+
+        # Max-heap (by negating) of possibly stale per-share gains
+        heap = []
+        for i in range(len(cands)):
+            (gain, val) = __gain(i, cur)
+            if gain is not None: heapq.heappush(heap, (-gain, i))
+
+        while heap:
+            (_, i) = heapq.heappop(heap)
+            (gain, val) = __gain(i, cur)
+            if gain is None or gain <= 0:
+                continue
+
+            # Still the best?  (Taking the others' older gains as upper
+            # bounds, which they usually but not always are)
+            if heap and gain < -heap[0][0]:
+                heapq.heappush(heap, (-gain, i))
+                continue
+
+            n = __step(i)
+            qty[i] += n
+            if is_option[i]: restricted_left -= n
+            cur = val
+            if __step(i) > 0:
+                heapq.heappush(heap, (-gain, i))
+
+        orders = __orders(qty)
+        m.override(m.enum.sales_orders, orders)
+        retval = {
+            'orders': orders,
+            'objective': cur,
+            'cleared_usd': m.cleared_from_sale_usd,
+            'iso_capacity_usd': iso_capacity_usd(m),
+            'evaluations': counter[0],
+            }
+    finally:
+        sweep.restore_nodes(m, saved)
+
+    return retval
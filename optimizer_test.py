@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+import pytest
+
+import income as myMeager
+import optimizer
+from sweep_test import model
+
+
+class TestOptimizer(object):
+
+    def test_sell_everything(self, model):
+        m = model
+        orders = myMeager.sales_orders_all(m, restricted=True)
+        m.override(m.enum.sales_orders, orders)
+        heuristic = m.cleared_from_sale_usd
+        m.override(m.enum.sales_orders, [])
+
+        res = optimizer.optimize_sales(m)
+        assert res['cleared_usd'] >= heuristic - 1e-6
+        assert res['objective'] == res['cleared_usd']
+        assert [] == m.sales_orders
+
+    def test_restricted(self, model):
+        m = model
+        m.override(m.enum.max_sellable_restricted_frac, 0.01)
+        limit = m.shares_sellable_restricted_n
+
+        res = optimizer.optimize_sales(m, steps=10)
+        options = [ o for o in res['orders'] if o['id'] != 'rsu' ]
+        assert 0 < sum([ o['qty'] for o in options ]) <= limit
+
+        avail = dict([ (g.name, g.available(m.query_date, 0))
+                       for g in m.grants_lst ])
+        for o in res['orders']:
+            assert o['qty'] <= avail[o['id']]
+
+    def test_underwater(self, model):
+        m = model
+        m.override(m.enum.ipo_price_usd, 1.5)
+        res = optimizer.optimize_sales(m, prefer_exercise=False)
+        # Both options are struck above the sale price, so the only
+        # options worth selling are the 250 NSOs already exercised
+        qty = dict([ (o['id'], o['qty']) for o in res['orders'] ])
+        assert 'iso' not in qty
+        assert 0 < qty['nso'] <= 250
+
+    def test_iso_weight(self, model):
+        m = model
+        res = optimizer.optimize_sales(m, iso_weight=2.0)
+        assert 0 <= res['iso_capacity_usd']
+        assert abs(res['objective']
+                   - res['cleared_usd']
+                   - 2.0 * res['iso_capacity_usd']) < 1e-6
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+
+import concurrent.futures
+import contextlib
+import io
+import os
+
+import numpy as np
+import pylink
+
+import cohort
+import income as myMeager
+import position as anAwkward
+import sweep
+import taxes as deathAnd
+
+
+# Questions (and their arguments) in the order Investigator.go asks them
+QUESTIONS = [
+    ('question_1', {}),
+    ('question_2', {}),
+    ('question_3', {}),
+    ('question_4', {}),
+    ('question_5', {}),
+    ('question_6', {}),
+    ('question_7', {}),
+    ('question_8', {}),
+    ('question_8', {'rsu_only': True}),
+    ('question_9', {}),
+    ]
+
+
+def stock(grants, cls=pylink.DAGModel, **static):
+    """The usual model: Taxes, Income and Position over the grants."""
+    return cls([deathAnd.Taxes(),
+                myMeager.Income(),
+                anAwkward.Position(grants)],
+               **static)
+
+
+def snapshot(m, build=None):
+    """Capture everything needed to rebuild a model somewhere else.
+
+    The tributaries themselves (the *_obj nodes) aren't shipped, just
+    the grants, the static values, any calculators that have been
+    overridden, and which nodes are calculated (so that rebuild can
+    tell if it didn't get the same model back).
+
+    build: callable(grants, cls, **static) making the model afresh,
+           for models with tributaries other than the stock ones (see
+           stock); it has to live at module level so that it can be
+           pickled
+
+    returns: {'cls': <model class>, 'build': build, 'grants': ...,
+              'static': {...}, 'overridden': {...},
+              'calculated': [<node name>, ...]}
+    """
+    skip = set(['grants_lst', 'grants_dict'])
+    static = {}
+    overridden = {}
+    calculated = []
+    for node in m.nodes():
+        name = m.node_name(node)
+        if m.is_calculated_node(node):
+            calculated.append(name)
+        if name in skip or name.endswith('_obj'):
+            continue
+        if m.is_overridden(node):
+            overridden[name] = m.override_value(node)
+        elif m.is_static_node(node):
+            static[name] = m.override_value(node)
+    return {
+        'cls': type(m),
+        'build': build,
+        'grants': m.grants_lst,
+        'static': static,
+        'overridden': overridden,
+        'calculated': sorted(calculated),
+        }
+
+
+def rebuild(snap):
+    """Build a fresh model from a snapshot.
+
+    raises: ValueError if the model that comes back doesn't calculate
+            the same nodes as the one in the snapshot (e.g. it had
+            extra tributaries, and no build function to make them)
+    """
+    build = snap.get('build') or stock
+    m = build(snap['grants'], snap.get('cls', pylink.DAGModel),
+              **snap['static'])
+
+    if 'calculated' in snap:
+        have = set([ m.node_name(n) for n in m.nodes()
+                     if m.is_calculated_node(n) ])
+        want = set(snap['calculated'])
+        if have != want:
+            diff = sorted(have ^ want)
+            raise ValueError("Rebuilt a different model (%s%s); pass "
+                             "snapshot a build function that makes it"
+                             % (', '.join(diff[:5]),
+                                ', ...' if 5 < len(diff) else ''))
+
+    for name, val in snap['overridden'].items():
+        m.override(m.node_num(name), val)
+    return m
+
+
+def _pool(workers):
+    if workers is None: workers = os.cpu_count()
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+
+
+def _map(fn, args, workers):
+    """Run fn over args in a process pool, or right here if workers==1."""
+    if workers == 1:
+        return [ fn(*a) for a in args ]
+    with _pool(workers) as pool:
+        futures = [ pool.submit(fn, *a) for a in args ]
+        return [ f.result() for f in futures ]
+
+
+class _Deferred(object):
+    """Stands in for a plots.Renderer, noting down what to draw.
+
+    The plots go back to the caller, whose own Renderer draws them.
+    """
+
+    def __init__(self):
+        self.plots = []
+
+    def render(self, fn, data, name):
+        self.plots.append((fn, data, name))
+        return None
+
+    def wait(self):
+        return []
+
+
+def _ask(snap, name, kwargs, cache_path):
+    # Imported here so that sweeps don't need investigator's imports
+    import evalcache
+    import investigator
+
+    m = rebuild(snap)
+    later = _Deferred()
+    cache = None
+    if cache_path is not None: cache = evalcache.Cache(cache_path)
+    buf = io.StringIO()
+    try:
+        inv = investigator.Investigator(m, renderer=later, cache=cache)
+        with contextlib.redirect_stdout(buf):
+            getattr(inv, name)(**kwargs)
+    finally:
+        if cache is not None: cache.close()
+    return (buf.getvalue(), later.plots)
+
+
+def run_questions(m, questions=QUESTIONS, workers=None, renderer=None,
+                  cache=None, build=None):
+    """Ask a number of Investigator questions at the same time.
+
+    Every question starts from its own copy of the model as it stands
+    now, so they can't trip over each other's overrides.
+
+    m:         the DAGModel
+    questions: list of (<method name>, <kwargs>) (default: all of them)
+    workers:   number of processes (default: one per cpu)
+    renderer:  plots.Renderer to draw the questions' plots with, here
+               in the caller once the answers are in (default: a
+               plain plots.Renderer).  Call its wait() afterwards if
+               it draws in the background.
+    cache:     evalcache.Cache for the questions to use; each worker
+               opens its own connection to the same file (its hit
+               counts stay in the workers)
+    build:     see snapshot
+
+    returns: list of the text each question printed, in order
+    """
+    if renderer is None:
+        import plots
+        renderer = plots.Renderer()
+
+    path = None if cache is None else cache.path
+    snap = snapshot(m, build)
+    answers = _map(_ask, [ (snap, name, kw, path)
+                           for (name, kw) in questions ],
+                   workers)
+    for (txt, todo) in answers:
+        for (fn, data, name) in todo:
+            renderer.render(fn, data, name)
+    return [ txt for (txt, todo) in answers ]
+
+
+def _sweep(snap, prices, nodes, orders, overrides):
+    return sweep.price_sweep(rebuild(snap), prices, nodes,
+                             orders=orders, **overrides)
+
+
+def price_sweep(m, prices, nodes, orders=None, workers=None, chunks=None,
+                build=None, **overrides):
+    """Same as sweep.price_sweep, but split into chunks across processes.
+
+    m:       the DAGModel
+    prices:  iterable of share prices (USD)
+    nodes:   names of the nodes to collect
+    orders:  order generator (see sweep.price_sweep); it has to live at
+             module level so that it can be pickled
+    workers: number of processes (default: one per cpu)
+    chunks:  number of pieces to split the prices into (default: workers)
+    build:   see snapshot
+
+    Array-valued overrides must be shaped like prices; they're split
+    along with them.
+
+    returns: {<node name>: <np.array shaped like prices>, ...}
+    """
+    prices = np.asarray(prices, dtype=float).ravel()
+    if workers is None: workers = os.cpu_count()
+    if chunks is None: chunks = workers
+    chunks = max(1, min(chunks, len(prices)))
+
+    splits = np.array_split(np.arange(len(prices)), chunks)
+    def __part(val, idx):
+        if np.ndim(val) and np.shape(val) == prices.shape:
+            return np.asarray(val)[idx]
+        return val
+
+    snap = snapshot(m, build)
+    args = []
+    for idx in splits:
+        over = dict([ (k, __part(v, idx)) for (k, v) in overrides.items() ])
+        args.append((snap, prices[idx], nodes, orders, over))
+
+    parts = _map(_sweep, args, workers)
+    return dict([ (name, np.concatenate([ p[name] for p in parts ]))
+                  for name in nodes ])
+
+
+def _cohort(employees, nodes, orders, constants):
+    return cohort.evaluate(employees, nodes, orders=orders, **constants)
+
+
+def cohort_evaluate(employees, nodes, orders=None, workers=None,
+                    chunk_size=1000, **constants):
+    """Same as cohort.evaluate, but with chunks of employees in parallel.
+
+    Each chunk holds employees filing under the same tax tables, so
+    it's still a single vectorized pass inside the worker.
+
+    chunk_size: most employees to send to one worker at a time
+
+    returns: {<node name>: <np.array with one value per employee>, ...}
+    """
+    n = len(employees)
+    pieces = []
+    for idx in cohort.group_by_tables(employees):
+        for i in range(0, len(idx), chunk_size):
+            pieces.append(idx[i:i+chunk_size])
+
+    args = [ ([ employees[i] for i in idx ], nodes, orders, constants)
+             for idx in pieces ]
+    parts = _map(_cohort, args, workers)
+
+    retval = dict([ (name, np.zeros(n)) for name in nodes ])
+    for idx, part in zip(pieces, parts):
+        for name in nodes:
+            retval[name][idx] = part[name]
+    return retval
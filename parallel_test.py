@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+import io
+import contextlib
+
+import numpy as np
+import pylink
+import pytest
+
+import cohort
+import cohort_test
+import income as myMeager
+import investigator
+import parallel
+import position as anAwkward
+import sweep
+import taxes as deathAnd
+from sweep_test import model
+from cohort_test import employees
+
+
+class Bonus(object):
+    """An extra tributary, as a private model might have."""
+
+    def __init__(self):
+        self.tribute = {
+            'bonus_usd': 10000,
+            'reg_income_usd': self.reg_income,
+            }
+
+    def reg_income(self, m):
+        return 150000 + m.bonus_usd
+
+
+def with_bonus(grants, cls, **static):
+    return cls([deathAnd.Taxes(),
+                myMeager.Income(),
+                anAwkward.Position(grants),
+                Bonus()],
+               **static)
+
+
+class TestParallel(object):
+
+    def test_rebuild(self, model):
+        m = model
+        m.override(m.enum.sales_orders, myMeager.sales_orders_rsu(m))
+        m.override(m.enum.iso_exercise_income_usd, 1000)
+        m.override(m.enum.fed_std_deduction_usd, 12400)
+
+        cp = parallel.rebuild(parallel.snapshot(m))
+        assert cp.is_static_node(cp.enum.fed_std_deduction_usd)
+        for name in ['outstanding_taxes_usd',
+                     'cleared_from_sale_usd',
+                     'amt_taxes_usd',
+                     'shares_sold_rsu_n']:
+            assert getattr(m, name) == getattr(cp, name)
+
+    def test_rebuild_build(self, model):
+        static = parallel.snapshot(model)['static']
+        static.pop('reg_income_usd')
+        m = with_bonus(model.grants_lst, pylink.DAGModel, **static)
+
+        # Rebuilt as the stock model, it'd have lost the bonus
+        with pytest.raises(ValueError, match='reg_income_usd'):
+            parallel.rebuild(parallel.snapshot(m))
+
+        cp = parallel.rebuild(parallel.snapshot(m, build=with_bonus))
+        assert 160000 == cp.reg_income_usd
+        assert m.outstanding_taxes_usd == cp.outstanding_taxes_usd
+
+        x = np.linspace(5, 25, 5)
+        ref = sweep.price_sweep(m, x, ['outstanding_taxes_usd'])
+        res = parallel.price_sweep(m, x, ['outstanding_taxes_usd'],
+                                   workers=2, build=with_bonus)
+        assert np.array_equal(ref['outstanding_taxes_usd'],
+                              res['outstanding_taxes_usd'])
+
+    def test_price_sweep(self, model):
+        m = model
+        x = np.linspace(5, 25, 21)
+        nodes = ['outstanding_taxes_usd', 'cleared_from_sale_usd']
+        iso = np.linspace(0, 1e5, 21)
+        ref = sweep.price_sweep(m, x, nodes,
+                                orders=myMeager.sales_orders_rsu,
+                                iso_exercise_income_usd=iso)
+        res = parallel.price_sweep(m, x, nodes, workers=2, chunks=3,
+                                   orders=myMeager.sales_orders_rsu,
+                                   iso_exercise_income_usd=iso)
+        for name in nodes:
+            assert np.array_equal(ref[name], res[name])
+
+    def test_run_questions(self, model):
+        questions = parallel.QUESTIONS[:7]
+        res = parallel.run_questions(model, questions, workers=2)
+
+        buf = io.StringIO()
+        inv = investigator.Investigator(model)
+        for (i, (name, kwargs)) in enumerate(questions):
+            buf.seek(0)
+            buf.truncate()
+            with contextlib.redirect_stdout(buf):
+                getattr(inv, name)(**kwargs)
+            assert buf.getvalue() == res[i]
+
+    def test_cohort_evaluate(self, employees):
+        orders = myMeager.sales_orders_rsu
+        ref = cohort.evaluate(employees, cohort_test.NODES, orders=orders,
+                              **cohort_test.CONSTANTS)
+        res = parallel.cohort_evaluate(employees, cohort_test.NODES,
+                                       orders=orders, workers=2,
+                                       chunk_size=1,
+                                       **cohort_test.CONSTANTS)
+        for name in cohort_test.NODES:
+            assert np.allclose(ref[name], res[name])
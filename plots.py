@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+
+import concurrent.futures
+import os
+
+
+# matplotlib is only imported once something actually gets drawn.
+# The render functions take nothing but plain data (see
+# Investigator.financials_vs_price and iso_outlook_vs_price) so that
+# they can just as easily run in another process.
+
+def _figure():
+    from matplotlib.figure import Figure
+    fig = Figure()
+    return (fig, fig.subplots())
+
+
+def financials(data, path, dpi=600):
+    """Draws the basic financials vs share price (question 8).
+
+    data: result of Investigator.financials_vs_price
+    path: where to save it (the extension picks the format)
+    dpi:  resolution for raster formats
+    """
+    (fig, ax) = _figure()
+    ax.set_ylabel('Value (USD)')
+
+    x = data['x']
+    ax.plot(x, data['gross_usd'], label='Gross Sales Income (post Withholding)')
+    ax.plot(x, data['taxes_usd'], label='Outstanding Tax Bill')
+    ax.plot(x, data['amti_usd'], label='AMTI')
+    ax.plot(x, data['net_usd'], label='Net Income from Sale')
+
+    label_y = data['rolloff_threshold_usd']*1.1
+    if 0 < data['amt_exemption_rolloff']:
+        ax.axvline(data['amt_exemption_rolloff'])
+        ax.text(data['amt_exemption_rolloff'], label_y,
+                'AMT Rolloff',
+                rotation=45)
+
+    if 0 < data['amt_exemption_gone']:
+        ax.axvline(data['amt_exemption_gone'])
+        ax.text(data['amt_exemption_gone'], label_y,
+                'AMT Exemp. Gone',
+                rotation=45)
+
+    ax.grid()
+    fig.suptitle('Financials vs FMV (%s)' % data['augment'])
+    ax.legend()
+
+    fig.savefig(path, transparent=False, dpi=dpi)
+    return path
+
+
+def iso_outlook(data, path, dpi=600):
+    """Draws the AMT-free ISO exercises vs share price (question 9).
+
+    data: result of Investigator.iso_outlook_vs_price
+    path: where to save it (the extension picks the format)
+    dpi:  resolution for raster formats
+    """
+    (fig, ax_shares) = _figure()
+    ax_shares.set_xlabel('Share Price (USD)')
+
+    x = data['x']
+    ax_shares.set_ylabel('ISOs (n)')
+    ax_shares.plot(x, data['iso_n'],
+                   label='AMT Free ISO Exercises',
+                   color='tab:purple')
+
+    ax_dollars = ax_shares.twinx()
+    ax_dollars.set_ylabel('Value ($k)')
+
+    y_gross = data['gross_usd']/1000
+    y_cleared = data['cleared_usd']/1000
+    ax_dollars.set_ylim(0, y_gross[-1]*1.1)
+
+    ax_dollars.plot(x, y_gross, label='Pre-Tax Income')
+    ax_dollars.plot(x, y_cleared, label='Post-Tax Cash from Sale')
+
+    if 0 < data['amt_exemption_rolloff']:
+        ax_shares.axvline(data['amt_exemption_rolloff'])
+        ax_shares.text(data['amt_exemption_rolloff'],
+                       data['rolloff_n']*1.05,
+                       'AMT Rolloff',
+                       rotation=45)
+
+    if 0 < data['amt_exemption_gone']:
+        ax_shares.axvline(data['amt_exemption_gone'])
+        ax_shares.text(data['amt_exemption_gone'],
+                       data['gone_n']*.95,
+                       'AMT Exemp. Gone',
+                       rotation=45)
+
+    if 0 < data['iso_saturated']:
+        ax_shares.axvline(data['iso_saturated'])
+        ax_shares.text(data['iso_saturated'],
+                       data['iso_max_n']*.95,
+                       "All ISO's Available",
+                       rotation=0)
+
+    fig.suptitle('ISO Outlook vs FMV')
+    ax_shares.legend(loc=3)
+    ax_dollars.legend()
+
+    fig.savefig(path, transparent=False, dpi=dpi)
+    return path
+
+
+class Renderer(object):
+    """Decides when, where, and how plots get drawn.
+
+    outdir:     directory to put the plots in
+    fmt:        file format ('png', or a vector format like 'svg'/'pdf')
+    dpi:        resolution for raster formats
+    background: draw in a separate process so the caller can get on
+                with the next question (call wait() to collect them)
+    enabled:    set to False to skip drawing altogether
+    """
+
+    def __init__(self,
+                 outdir='.',
+                 fmt='png',
+                 dpi=600,
+                 background=False,
+                 enabled=True):
+        self.outdir = outdir
+        self.fmt = fmt
+        self.dpi = dpi
+        self.background = background
+        self.enabled = enabled
+        self._pool = None
+        self._pending = []
+
+    def render(self, fn, data, name):
+        """Draws one plot.
+
+        fn:   render function (e.g. plots.financials)
+        data: the data to hand it
+        name: file name, without the extension
+
+        returns: the path (or a future for it in the background), or
+                 None if rendering is disabled
+        """
+        if not self.enabled:
+            return None
+
+        path = os.path.join(self.outdir, '%s.%s' % (name, self.fmt))
+        if not self.background:
+            return fn(data, path, dpi=self.dpi)
+
+        if self._pool is None:
+            self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=1)
+        fut = self._pool.submit(fn, data, path, dpi=self.dpi)
+        self._pending.append(fut)
+        return fut
+
+    def wait(self):
+        """Waits for any background plots to finish.
+
+        returns: list of the paths written since the last wait
+        """
+        retval = [ f.result() for f in self._pending ]
+        self._pending = []
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        return retval
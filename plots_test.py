@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+import os
+
+import numpy as np
+import pytest
+
+import investigator
+import plots
+from sweep_test import model
+
+
+class TestPlots(object):
+
+    def test_disabled(self, model, tmp_path):
+        r = plots.Renderer(outdir=str(tmp_path), enabled=False)
+        inv = investigator.Investigator(model, renderer=r)
+
+        data = inv.question_8(rsu_only=True)
+        assert "RSU Only" == data['augment']
+        assert data['x'].shape == data['net_usd'].shape
+        assert [] == os.listdir(str(tmp_path))
+
+        data = inv.question_9()
+        assert data['x'].shape == data['iso_n'].shape
+        assert np.all(data['iso_n'] <= data['iso_max_n'])
+        assert [] == os.listdir(str(tmp_path))
+
+    def test_inline(self, model, tmp_path):
+        r = plots.Renderer(outdir=str(tmp_path), fmt='svg')
+        inv = investigator.Investigator(model, renderer=r)
+        data = inv.financials_vs_price()
+        path = r.render(plots.financials, data, 'fin_all')
+        assert os.path.join(str(tmp_path), 'fin_all.svg') == path
+        assert os.path.getsize(path)
+
+    def test_background(self, model, tmp_path):
+        r = plots.Renderer(outdir=str(tmp_path), fmt='pdf', background=True)
+        inv = investigator.Investigator(model, renderer=r)
+        r.render(plots.financials, inv.financials_vs_price(), 'fin_all')
+        r.render(plots.iso_outlook, inv.iso_outlook_vs_price(), 'iso')
+
+        paths = r.wait()
+        assert 2 == len(paths)
+        for path in paths:
+            assert path.endswith('.pdf')
+            assert os.path.getsize(path)
+        assert [] == r.wait()
@@ -1,8 +1,9 @@
 #!/usr/bin/env python
 
+import bisect
+import copy
 import functools
-import math
-import pylink
+import numpy as np
 import calendar
 
 from report import comma
@@ -12,16 +13,70 @@ import datetime
 VEHICLES = ['iso', 'nso', 'rsu']
 
 
+# Nodes holding dates, which we'd rather not store as strings
+DATE_NODES = ['query_date']
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_date_str(d):
+    """Parse one date string (memoized, so don't hand back anything mutable).
+
+    Handles m/d/yy, m/d/yyyy and ISO-8601 (yyyy-mm-dd, with or without
+    a time tacked onto the end).  The common cases are picked apart by
+    hand, because strptime is slow.
+    """
+    d = d.strip()
+
+    if '-' in d:
+        # ISO-8601, ignoring any time of day
+        return datetime.date.fromisoformat(d[:10])
+
+    parts = d.split('/')
+    if 3 == len(parts) and all(p.isdigit() for p in parts):
+        (mon, day, yr) = parts
+        if 4 == len(yr):
+            return datetime.date(int(yr), int(mon), int(day))
+        if len(yr) <= 2:
+            # Same pivot as strptime's %y
+            yr = int(yr)
+            yr += 1900 if 69 <= yr else 2000
+            return datetime.date(yr, int(mon), int(day))
+
+    # Anything else gets the slow path (and its error messages)
+    if 4 == len(parts[-1]):
+        return datetime.datetime.strptime(d, '%m/%d/%Y').date()
+    else:
+        return datetime.datetime.strptime(d, '%m/%d/%y').date()
+
+
 def parse_date(d):
+    """Normalize d to a datetime.date.
+
+    d may be a string (m/d/yy, m/d/yyyy or yyyy-mm-dd), a datetime or
+    a date.  Anything else is handed back untouched.
+    """
     if str == type(d):
-        if 4 == len(d.split('/')[-1]):
-            return datetime.datetime.strptime(d, '%m/%d/%Y')
-        else:
-            return datetime.datetime.strptime(d, '%m/%d/%y')
+        return _parse_date_str(d)
+    elif isinstance(d, datetime.datetime):
+        return d.date()
     else:
         return d
 
 
+def normalize_dates(m, names=DATE_NODES):
+    """Swap any date strings stored in the model for datetime.date's.
+
+    That way we only ever parse them once, rather than every time
+    somebody asks how many shares have vested.
+    """
+    for name in names:
+        node = m.node_num(name)
+        if m.is_static_node(node) or m.is_overridden(node):
+            val = m.override_value(node)
+            if str == type(val):
+                m.override(node, parse_date(val))
+
+
 def mon_diff(start, end):
     retval = 12*(end.year - start.year) + (end.month - start.month)
 
@@ -34,6 +89,25 @@ def mon_diff(start, end):
     retval = max(retval, 0)
     return retval
 
+def mon_add(start, n):
+    """The first date that is n months after start, as mon_diff sees it.
+
+    In other words, the earliest date d such that mon_diff(start, d) >= n.
+    """
+    (years, month) = divmod(start.month - 1 + n, 12)
+    year = start.year + years
+    month += 1
+    last_day = calendar.monthrange(year, month)[-1]
+
+    if start.day <= last_day:
+        return datetime.date(year, month, start.day)
+
+    # The month is too short.  Ends of months line up with each other,
+    # otherwise we have to wait until the first of the next month.
+    if start.day == calendar.monthrange(start.year, start.month)[-1]:
+        return datetime.date(year, month, last_day)
+    return datetime.date(year, month, last_day) + datetime.timedelta(days=1)
+
 def from_table(name,
                vehicle,
                first_date, first_val,
@@ -46,7 +120,8 @@ def from_table(name,
     """Generate a Grant object from rows in Shareworks.
 
     Vesting schedules in Shareworks can be found by selecting the hyperlinked
-    Grant Name under Portfolio > Stock Options and Awards.
+    Grant Name under Portfolio > Stock Options and Awards.  To load a whole
+    export of them at once, see importer.load.
 
     name:       Grant ID from Shareworks
     vehicle:    one of 'iso', 'nso', or 'rsu'
@@ -73,15 +148,11 @@ def from_table(name,
     n_periods = int(full_months / float(period_months))
     assert(not (n_periods % 1))
 
-    print(n_periods)
-
     n_cliff = first_val
     negative_cliff = (last_val < (second_val-1))
 
     # is the total number of shares sane?
     regular_vest = round((n_shares-first_val-last_val)/(n_periods-1), 0)
-    print(n_shares, first_val, last_val, n_periods)
-    print(regular_vest)
     if not regular_vest == second_val:
         raise ValueError("Invalid number of share specified %d vs %d" %(
             regular_vest, second_val))
@@ -163,41 +234,69 @@ class Grant(object):
         assert(exercised is None or exercised <= n_shares)
         assert(exercised is None or sold <= exercised)
 
+        self._build_schedule()
+
+    def _build_schedule(self):
+        """Work out the whole vesting schedule up front.
+
+        _vest_ords holds the (ordinal) date on which each vesting
+        period begins to count, and _vest_counts the total number of
+        shares vested as of that date.  The first entry is the start
+        date itself (where the cliff, if any, shows up).
+        """
+        # How many shares have a regular vesting cadence?
+        n_vesting = float(self.n_shares - self.n_cliff)
+        if self.negative_cliff: n_vesting += self.n_cliff
+
+        ords = []
+        counts = []
+        for periods in range(self.n_periods + 1):
+            d = mon_add(self.start, periods * self.period_months)
+            ords.append(d.toordinal())
+
+            # Add that many shares each vesting period
+            if periods >= self.n_periods:
+                counts.append(self.n_shares)
+            else:
+                frac_vested = float(periods) / float(self.n_periods)
+                counts.append(round(frac_vested * n_vesting + self.n_cliff, 0))
+
+        self._vest_ords = ords
+        self._vest_counts = counts
+
+    def vesting_schedule(self):
+        """returns: [(<date>, <total shares vested as of then>), ...]"""
+        return [ (datetime.date.fromordinal(d), n)
+                 for (d, n) in zip(self._vest_ords, self._vest_counts) ]
+
     def unvested(self, on):
         return self.n_shares - self.vested(on)
 
     def vested(self, on):
-        on = parse_date(on)
-
-        if on < self.start:
-            # Asking for a date before vesting began
-            return 0
-
-        # number of months as measured by a banker
-        mon = mon_diff(self.start, on)
+        on = parse_date(on).toordinal()
 
         # how many vesting periods will have been completed at this time?
-        periods = int(min(float((math.floor(mon / self.period_months))),
-                          self.n_periods))
+        idx = bisect.bisect_right(self._vest_ords, on) - 1
 
-        # How many shares have a regular vesting cadence?
-        n_vesting = float(self.n_shares - self.n_cliff)
-        if self.negative_cliff: n_vesting += self.n_cliff
-
-        # Calculate the floating fraction of vested shares
-        frac_vested = float(periods) / float(self.n_periods)
+        if idx < 0:
+            # Asking for a date before vesting began
+            return 0
 
-        # Add that many shares each vesting period
-        if periods >= self.n_periods:
-            retval = self.n_shares
-        else:
-            retval = round(frac_vested * n_vesting + self.n_cliff, 0)
+        retval = self._vest_counts[idx]
 
         # quick sanity check
         assert(retval >= self.exercised)
 
         return retval
 
+    def vested_many(self, dates):
+        """Number of shares vested on each of the dates (numpy array)."""
+        ords = np.array([ parse_date(d).toordinal() for d in dates ],
+                        dtype=np.int64)
+        idx = np.searchsorted(self._vest_ords, ords, side='right') - 1
+        counts = np.asarray(self._vest_counts, dtype=float)
+        return np.where(0 > idx, 0.0, counts[np.maximum(idx, 0)])
+
     def vested_outstanding(self, on):
         return self.vested(on) - self.exercised
 
@@ -220,7 +319,12 @@ class Grant(object):
         return self.vested(on) - self.liquidated
 
     def withholding(self, on, withholding_rate):
-        return int(round(self.vested(on) * withholding_rate, 0))
+        """Shares still to be withheld for what has vested by on.
+
+        Anything already withheld (e.g. in an earlier year) counts.
+        """
+        n = int(round(self.vested(on) * withholding_rate, 0))
+        return max(0, n - int(self.withheld))
 
     def available(self, on, withholding_rate=None):
         retval = ( 0
@@ -312,14 +416,342 @@ Available:   %(avail)s
             'exercised': sell_outstanding,
             }
 
+    def overlay(self):
+        """A copy-on-write view of this grant (see GrantOverlay)."""
+        return GrantOverlay(self)
+
+
+class GrantOverlay(Grant):
+    """Copy-on-write view of a Grant.
+
+    Withholdings and sales only ever change a handful of counters, so
+    that's all we keep here.  Everything else (name, vesting schedule,
+    strike, ...) is read straight through from the base grant, which is
+    never modified.  This lets us simulate sales against the grants
+    without copying every Grant object each time.
+    """
+
+    __slots__ = ('base', 'exercised', 'sold', 'withheld', 'liquidated')
+
+    def __init__(self, base):
+        self.base = base
+        self.exercised = base.exercised
+        self.sold = base.sold
+        self.withheld = base.withheld
+        self.liquidated = base.liquidated
+
+    def __getattr__(self, name):
+        # Only called for things we don't hold ourselves
+        if 'base' == name:
+            raise AttributeError(name)
+        return getattr(self.base, name)
+
+
+class GrantBook(object):
+    """Struct-of-arrays version of a list of Grants.
+
+    Rather than one python object per grant, each attribute is kept
+    as a typed numpy column, and the usual Grant methods (vested,
+    available, outstanding_cost, ...) answer for every grant at once
+    with an array.  Position and Income accept a GrantBook anywhere
+    they'd take the list of grants, which makes large portfolios (or
+    a whole cohort's worth of grants) much cheaper to work with.
+
+    Indexing with an int or a grant name hands back a regular Grant
+    for that row, as does iterating.
+    """
+
+    # The columns that withholdings and sales change.  Everything else
+    # is shared between a book and its copies.
+    MUTABLE = ['exercised', 'sold', 'withheld', 'liquidated']
+
+    def __init__(self,
+                 name,
+                 vehicle,
+                 n_shares,
+                 n_cliff=0,
+                 exercised=0,
+                 sold=0,
+                 strike_usd=0,
+                 start=None,
+                 n_periods=48,
+                 period_months=1,
+                 negative_cliff=False,
+                 withheld=0,
+                 liquidated=None,
+                 owner=None,
+                 n_owners=None):
+        """Same arguments as Grant, but each may be a list (one per grant).
+
+        Scalars are applied to every grant.  The vehicle column is
+        stored as an index into VEHICLES.  By default liquidated
+        matches sold, as it does for a new Grant.
+
+        owner:    optional column saying which person (0..n_owners-1)
+                  holds each grant.  With owners, the totals from
+                  sum_by_vehicle (and so every summation node) come
+                  back as one value per person.
+        n_owners: number of people (default: max(owner)+1)
+        """
+        self.name = np.array(name, dtype=object)
+        n = len(self.name)
+
+        def __col(v, dtype):
+            return np.array(np.broadcast_to(np.asarray(v, dtype=dtype), n))
+
+        self.vehicle = __col([VEHICLES.index(v) for v in vehicle], np.int8)
+        self.n_shares = __col(n_shares, np.int64)
+        self.n_cliff = __col(n_cliff, np.int64)
+        self.exercised = __col(exercised, float)
+        self.sold = __col(sold, float)
+        self.withheld = __col(withheld, float)
+        if liquidated is None: liquidated = self.sold
+        self.liquidated = __col(liquidated, float)
+        self.strike_usd = __col(strike_usd, float)
+        self.n_periods = __col(n_periods, np.int64)
+        self.period_months = __col(period_months, np.int64)
+        self.negative_cliff = __col(negative_cliff, bool)
+
+        if np.ndim(start) == 0: start = [start] * n
+        start = [parse_date(d) for d in start]
+        self.start = np.array([d.toordinal() for d in start], dtype=np.int64)
+
+        # Broken out for the month arithmetic in vested()
+        self._start_year = np.array([d.year for d in start], dtype=np.int64)
+        self._start_month = np.array([d.month for d in start], dtype=np.int64)
+        self._start_day = np.array([d.day for d in start], dtype=np.int64)
+        self._start_last = np.array(
+            [d.day == calendar.monthrange(d.year, d.month)[-1] for d in start],
+            dtype=bool)
+
+        self.owner = None
+        self.n_owners = None
+        if owner is not None:
+            self.owner = __col(owner, np.int64)
+            if n_owners is None:
+                n_owners = int(self.owner.max()) + 1 if n else 0
+            self.n_owners = n_owners
+
+        self._index = None
+
+    @classmethod
+    def from_grants(cls, grants, **overrides):
+        """Build a GrantBook from a list of Grant objects.
+
+        overrides: any columns to use instead of the grants' own (such
+                   as name), plus owner/n_owners
+        """
+        fields = ['name', 'vehicle', 'n_shares', 'n_cliff', 'exercised',
+                  'sold', 'strike_usd', 'start', 'n_periods',
+                  'period_months', 'negative_cliff', 'withheld',
+                  'liquidated']
+        kwargs = dict([ (f, [getattr(g, f) for g in grants]) for f in fields ])
+        kwargs.update(overrides)
+        return cls(**kwargs)
+
+    def __len__(self):
+        return len(self.name)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.grant(i)
+
+    def __getitem__(self, key):
+        if str == type(key):
+            key = self.index[key]
+        return self.grant(key)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    @property
+    def index(self):
+        """{<grant name>: <row>, ...}"""
+        if self._index is None:
+            self._index = dict([ (n, i) for (i, n) in enumerate(self.name) ])
+        return self._index
+
+    def vehicle_of(self, name):
+        return VEHICLES[self.vehicle[self.index[name]]]
+
+    def grant(self, i):
+        """Materialize row i as a Grant."""
+        g = Grant(name=self.name[i],
+                  vehicle=VEHICLES[self.vehicle[i]],
+                  n_cliff=int(self.n_cliff[i]),
+                  n_shares=int(self.n_shares[i]),
+                  strike_usd=float(self.strike_usd[i]),
+                  start=datetime.date.fromordinal(int(self.start[i])),
+                  n_periods=int(self.n_periods[i]),
+                  period_months=int(self.period_months[i]),
+                  negative_cliff=bool(self.negative_cliff[i]))
+
+        # Set after the fact, since a sold rsu has nothing "exercised"
+        # as far as the constructor's sanity checks are concerned.
+        for field in self.MUTABLE:
+            setattr(g, field, getattr(self, field)[i].item())
+        return g
+
+    def copy(self):
+        """Copy-on-write copy: only the MUTABLE columns are duplicated."""
+        retval = copy.copy(self)
+        for field in self.MUTABLE:
+            setattr(retval, field, getattr(self, field).copy())
+        return retval
+
+    def sum_by_vehicle(self, vals):
+        """Total up a per-grant column by vehicle.
+
+        returns: {'iso': <total>, 'nso': <total>, 'rsu': <total>}
+                 where each total is an array (one per owner) if the
+                 book has owners
+        """
+        vals = np.broadcast_to(vals, len(self))
+        nv = len(VEHICLES)
+        if self.owner is None:
+            tot = np.bincount(self.vehicle, weights=vals, minlength=nv)
+            return dict(zip(VEHICLES, tot.tolist()))
+
+        bins = self.owner * nv + self.vehicle
+        tot = np.bincount(bins, weights=vals, minlength=self.n_owners * nv)
+        tot = tot.reshape(self.n_owners, nv)
+        return dict([ (typ, tot[:, i]) for (i, typ) in enumerate(VEHICLES) ])
+
+    def vested(self, on):
+        on = parse_date(on)
+
+        # mon_diff, one column at a time
+        mon = (12 * (on.year - self._start_year)
+               + (on.month - self._start_month))
+        end_last = (on.day == calendar.monthrange(on.year, on.month)[-1])
+        early = (~(self._start_last & end_last)) & (self._start_day > on.day)
+        mon = np.maximum(mon - early, 0)
+
+        # how many vesting periods will have been completed at this time?
+        periods = np.minimum(mon // self.period_months, self.n_periods)
+
+        # How many shares have a regular vesting cadence?
+        n_vesting = (self.n_shares - self.n_cliff).astype(float)
+        n_vesting += np.where(self.negative_cliff, self.n_cliff, 0)
+
+        frac_vested = periods / self.n_periods.astype(float)
+        retval = np.where(periods >= self.n_periods,
+                          self.n_shares,
+                          np.round(frac_vested * n_vesting + self.n_cliff, 0))
+
+        # quick sanity check
+        before = on.toordinal() < self.start
+        assert((before | (retval >= self.exercised)).all())
+
+        # Asking for a date before vesting began
+        retval = np.where(before, 0.0, retval)
+
+        return retval
+
+    def unvested(self, on):
+        return self.n_shares - self.vested(on)
+
+    def vested_outstanding(self, on):
+        return self.vested(on) - self.exercised
+
+    def outstanding(self):
+        return self.n_shares - self.exercised
+
+    def held(self):
+        return self.exercised - self.liquidated
+
+    def outstanding_cost(self):
+        return self.outstanding() * self.strike_usd
+
+    def vested_outstanding_cost(self, on):
+        return self.vested_outstanding(on) * self.strike_usd
+
+    def vested_unliquidated(self, on):
+        return self.vested(on) - self.liquidated
+
+    def withholding(self, on, withholding_rate):
+        """withholding_rate: scalar, or one rate per grant"""
+        n = np.round(self.vested(on) * withholding_rate, 0) - self.withheld
+        return np.maximum(n, 0).astype(np.int64)
+
+    def available(self, on, withholding_rate=None):
+        retval = self.vested(on) - self.liquidated
+        if withholding_rate is not None:
+            retval = retval - self.withholding(on, withholding_rate)
+        return retval
+
+    def withhold(self, on, withholding_rate):
+        n = self.withholding(on, withholding_rate)
+        self.liquidated += n
+        self.withheld += n
+
+    def sell(self,
+             i,
+             on,
+             n,
+             fmv_usd,
+             withholding_rate,
+             prefer_exercise=True,
+             update=False,
+             vested=None):
+        """Grant.sell, for row i.
+
+        vested: self.vested(on), if you've already got it handy
+        """
+        if vested is None: vested = self.vested(on)
+        outstanding = vested[i] - self.exercised[i]
+        held = self.exercised[i] - self.liquidated[i]
+        available = vested[i] - self.liquidated[i]
+
+        assert(available >= n)
+
+        if prefer_exercise:
+            sell_outstanding = min(n, outstanding)
+            sell_held = n - sell_outstanding
+        else:
+            sell_held = min(n, held)
+            sell_outstanding = n - sell_held
+
+        if update:
+            self.sold[i] += n
+            self.liquidated[i] += n
+            self.exercised[i] += sell_outstanding
+
+        cost = sell_outstanding * self.strike_usd[i]
+        gross = n * fmv_usd
+        net = gross - cost
+
+        return {
+            'cost':      cost,
+            'gross_usd': gross,
+            'net_usd':   net,
+            'exercised': sell_outstanding,
+            }
+
+
+def by_vehicle(grants):
+    """Bucket the grants by vehicle.
+
+    returns: {'iso': [<Grant>, ...], 'nso': [...], 'rsu': [...]}
+    """
+    retval = dict([ (typ, []) for typ in VEHICLES ])
+    for g in grants:
+        retval[g.vehicle].append(g)
+    return retval
+
 
 class Position(object):
 
     def __init__(self, grants):
+        """grants: list of Grant objects, or a GrantBook"""
         self.grants = grants
 
-        gdict = {}
-        for g in grants: gdict[g.name] = g
+        if isinstance(grants, GrantBook):
+            # Only materialized if somebody actually asks for it
+            gdict = self.grants_dict
+        else:
+            gdict = {}
+            for g in grants: gdict[g.name] = g
 
         self.tribute = {
             'position_obj': self,
@@ -331,6 +763,8 @@ class Position(object):
             'shares_sellable_restricted_n': self.shares_sellable_restricted,
             'end_of_year': self.end_of_year,
             'shares_vested_rsu_usd': self.shares_vested_rsu_usd,
+            'grants_by_vehicle': self.grants_by_vehicle,
+            'rem_grants_by_vehicle': self.rem_grants_by_vehicle,
             }
 
         self._add_summation_nodes('shares_total%s_n',
@@ -457,20 +891,42 @@ class Position(object):
         the equity position after the sales are processed, we include
         a convenience boolean for prepending 'rem_' and referencing
         the post-sale list of grant objects.
+
+        All three vehicles are totalled together in a single pass
+        over the (pre-bucketed) grants and stashed in a family node
+        named with '_by_vehicle' in place of the vehicle.  The
+        per-vehicle nodes just pick their total out of that.  If the
+        grants are in a GrantBook, the pass is a single vectorized
+        call instead.
         """
         if len(args): call=True
 
+        # One pass fills in the totals for every vehicle
+        def __family(m):
+            cargs = [getattr(m, node) for node in args]
+
+            lst = m.rem_grants_lst if rem else m.grants_lst
+            if isinstance(lst, GrantBook):
+                # The columns and methods share names with the Grant's
+                vals = getattr(lst, field)
+                if call: vals = vals(*cargs)
+                return lst.sum_by_vehicle(vals)
+
+            if call:
+                f = lambda g: getattr(g, field)(*cargs)
+            else:
+                f = lambda g: getattr(g, field)
+            buckets = m.rem_grants_by_vehicle if rem else m.grants_by_vehicle
+            return dict([ (typ, sum(map(f, buckets[typ])))
+                          for typ in VEHICLES ])
+        family = fmt % '_by_vehicle'
+        self.tribute[family] = __family
+
         # ohhh late bindings...
         for typ in VEHICLES:
             def __outer(typ):
                 def __inner(m):
-                    if call:
-                        cargs = [getattr(m, node) for node in args]
-                        f = lambda g: getattr(g, field)(*cargs) if g.vehicle == typ else 0
-                    else:
-                        f = lambda g: getattr(g, field) if g.vehicle == typ else 0
-                    lst = m.rem_grants_lst if rem else m.grants_lst
-                    return sum(list(map(f, lst)))
+                    return getattr(m, family)[typ]
                 return __inner
             f = functools.partial(__outer, typ)()
             self.tribute[fmt % ('_%s'%typ)] = f
@@ -480,12 +936,21 @@ class Position(object):
             return sum([ getattr(m, fmt % ('_%s'%typ)) for typ in VEHICLES ])
         self.tribute[fmt % ('')] = __tmp
 
+    def grants_dict(self, m):
+        return dict([ (g.name, g) for g in m.grants_lst ])
+
+    def grants_by_vehicle(self, m):
+        return by_vehicle(m.grants_lst)
+
+    def rem_grants_by_vehicle(self, m):
+        return by_vehicle(m.rem_grants_lst)
+
     def end_of_year(self, m):
         d = parse_date(m.query_date)
         yr = d.year
         mon = 12
-        day = calendar.monthrange(d.year, d.month)[-1]
-        return datetime.datetime(year=yr, month=mon, day=day)
+        day = calendar.monthrange(d.year, mon)[-1]
+        return datetime.date(year=yr, month=mon, day=day)
 
     def shares_vested_rsu_usd(self, m):
         return m.shares_vested_rsu_n * m.ipo_price_usd
@@ -504,11 +969,11 @@ class Position(object):
                          - m.shares_previously_sold_iso_n
                          + 0 )
         base = n_considered * m.max_sellable_restricted_frac
-        max_shares = int(math.floor(base))
+        max_shares = np.floor(base).astype(int)
 
         available = ( 0
                       + m.shares_vested_outstanding_iso_n
                       + m.shares_vested_outstanding_nso_n
                       + 0 )
 
-        return min(available, max_shares)
+        return np.minimum(available, max_shares)
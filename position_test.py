@@ -1,10 +1,14 @@
 #!/usr/bin/env python
 
+import datetime
 import math
+import numpy as np
 import pylink
 import pytest
 
 from position import Grant
+from position import GrantBook
+from position import mon_add
 from position import mon_diff
 from position import parse_date
 from position import from_table
@@ -23,6 +27,41 @@ def test_mon_diff():
     assert 12 == mon_diff(start, parse_date('1/2/21'))
     assert 11 == mon_diff(start, parse_date('1/1/21'))
 
+
+def test_mon_add():
+
+    for start in ['1/2/20', '1/30/20', '1/31/20', '2/29/20', '12/31/19']:
+        start = parse_date(start)
+        assert start == mon_add(start, 0)
+        for n in range(1, 30):
+            d = mon_add(start, n)
+            assert n <= mon_diff(start, d)
+            assert n > mon_diff(start, d - datetime.timedelta(days=1))
+
+    assert parse_date('3/1/20') == mon_add(parse_date('1/30/20'), 1)
+    assert parse_date('2/29/20') == mon_add(parse_date('1/31/20'), 1)
+
+def test_parse_date():
+
+    proper = datetime.date(2020, 1, 2)
+    assert proper == parse_date('1/2/20')
+    assert proper == parse_date('01/02/20')
+    assert proper == parse_date('1/2/2020')
+    assert proper == parse_date('2020-01-02')
+    assert proper == parse_date('2020-01-02T12:34:56')
+    assert proper == parse_date(datetime.datetime(2020, 1, 2, 12, 34))
+    assert proper == parse_date(proper)
+
+    # strptime's pivot for two digit years
+    assert 1999 == parse_date('1/2/99').year
+    assert 1969 == parse_date('1/2/69').year
+    assert 2068 == parse_date('1/2/68').year
+
+    with pytest.raises(ValueError):
+        parse_date('2/30/20')
+    with pytest.raises(ValueError):
+        parse_date('not a date')
+
 import position as anAwkward
 
 # iso, nso, rsu
@@ -224,6 +263,27 @@ class TestGrant(object):
         assert 0 == g.vested('2/1/20')
         assert 3 == g.vested('4/1/20')
 
+    def test_vested_many(self):
+        g = Grant(name='test',
+                  vehicle='iso',
+                  strike_usd=4,
+                  start='1/2/20',
+                  n_periods=12,
+                  n_shares=12,
+                  period_months=1)
+
+        dates = ['1/30/10', '1/30/20', '2/1/20', '2/2/20',
+                 '3/2/20', '1/2/21', '1/2/22']
+        vested = g.vested_many(dates)
+        assert isinstance(vested, np.ndarray)
+        assert [0, 0, 0, 1, 2, 12, 12] == list(vested)
+        assert [g.vested(d) for d in dates] == list(vested)
+
+        schedule = g.vesting_schedule()
+        assert 13 == len(schedule)
+        assert (datetime.date(2020, 1, 2), 0) == schedule[0]
+        assert (datetime.date(2021, 1, 2), 12) == schedule[-1]
+
     def test_from_table(self):
         g = from_table(name='RSU-TK421',
                        vehicle='rsu',
@@ -367,6 +427,54 @@ class TestGrant(object):
 
         assert 6*4 == g.vested_outstanding_cost('1/2/21')
 
+    def test_overlay(self):
+        g = Grant(name='test',
+                  vehicle='iso',
+                  strike_usd=4,
+                  start='1/2/20',
+                  exercised=2,
+                  sold=1,
+                  n_periods=12,
+                  n_shares=12,
+                  period_months=1)
+
+        o = g.overlay()
+        assert 'test' == o.name
+        assert 12 == o.vested('1/2/21')
+
+        o.withhold('1/2/21', 0.25)
+        o.sell('1/2/21', 4, 10, 0.0, prefer_exercise=True, update=True)
+
+        assert 3 == o.withheld
+        assert 5 == o.sold
+        assert 8 == o.liquidated
+        assert 6 == o.exercised
+        assert 4 == o.vested_unliquidated('1/2/21')
+
+        # The original grant is untouched
+        assert 0 == g.withheld
+        assert 1 == g.sold
+        assert 1 == g.liquidated
+        assert 2 == g.exercised
+
+    def test_withholding(self):
+        g = Grant(name='test',
+                  vehicle='rsu',
+                  start='1/2/20',
+                  n_periods=12,
+                  n_shares=12,
+                  period_months=1)
+
+        # Only what's newly vested gets withheld the second time around
+        assert 2 == g.withholding('7/2/20', 0.25)
+        g.withhold('7/2/20', 0.25)
+        assert 2 == g.withheld
+        assert 0 == g.withholding('7/2/20', 0.25)
+        assert 1 == g.withholding('1/2/21', 0.25)
+        g.withhold('1/2/21', 0.25)
+        assert 3 == g.withheld
+        assert 3 == g.liquidated
+
     def test_strike(self):
         with pytest.raises(ValueError):
             g = Grant(name='test',
@@ -407,7 +515,87 @@ class TestGrant(object):
                   period_months=1)
 
 
+class TestGrantBook(object):
+
+    def test_vested(self):
+        book = GrantBook.from_grants(GRANTS)
+        assert len(GRANTS) == len(book)
+
+        for on in ['1/1/19', '1/1/20', '2/15/20', '11/1/20', '1/1/21',
+                   '12/31/21', '1/1/30']:
+            on = parse_date(on)
+            try:
+                proper = [g.vested(on) for g in GRANTS]
+            except AssertionError:
+                # Can't have exercised more than have vested
+                with pytest.raises(AssertionError):
+                    book.vested(on)
+                continue
+            assert proper == list(book.vested(on))
+            assert ([g.available(on, 0.3) for g in GRANTS]
+                    == list(book.available(on, 0.3)))
+
+    def test_rows(self):
+        book = GrantBook.from_grants(GRANTS)
+        g = book['quarterly']
+        assert 'iso' == g.vehicle
+        assert 1<<10 == g.n_shares
+        assert 16 == g.n_periods
+        assert book[len(GRANTS)-1].name == 'quarterly'
+        assert 'nso' == book.vehicle_of('nso')
+        assert [g.name for g in GRANTS] == [g.name for g in book]
+
+    def test_copy(self):
+        book = GrantBook.from_grants(EASY)
+        end = book.copy()
+        end.withhold('1/1/21', 0.5)
+        end.sell(0, '1/1/21', 2, 10.0, 0.5, update=True)
+
+        assert [5, 5, 5] == list(end.withheld)
+        assert 2 == end.sold[0]
+        assert [0, 0, 0] == list(book.withheld)
+        assert 0 == book.sold[0]
+        assert end.n_shares is book.n_shares
+
+    def test_withholding(self):
+        book = GrantBook.from_grants(EASY)
+        first = book.withholding('1/1/21', 0.5)
+        book.withhold('1/1/21', 0.5)
+        assert [0, 0, 0] == list(book.withholding('1/1/21', 0.5))
+        assert list(first) == list(book.withheld)
+
+    def test_position(self):
+        m_lst = pylink.DAGModel([anAwkward.Position(GRANTS)],
+                                query_date='1/1/21')
+        m_book = pylink.DAGModel([anAwkward.Position(
+            GrantBook.from_grants(GRANTS))],
+                                 query_date='1/1/21')
+
+        for name in ['shares_total%s_n',
+                     'shares_vested%s_n',
+                     'shares_held%s_n',
+                     'shares_vested_outstanding%s_n',
+                     'exercise_cost_vested_outstanding%s_usd']:
+            for typ in ['', '_iso', '_nso', '_rsu']:
+                assert (getattr(m_lst, name % typ)
+                        == getattr(m_book, name % typ))
+
+
 class TestPosition(object):
+    def test_normalize_dates(self, model):
+        m = model
+        e = m.enum
+        m.override(e.query_date, '1/1/21')
+        vested = m.shares_vested_n
+
+        anAwkward.normalize_dates(m)
+        assert datetime.date(2021, 1, 1) == m.query_date
+        assert vested == m.shares_vested_n
+        assert datetime.date(2021, 12, 31) == m.end_of_year
+
+        m.override(e.query_date, '11/1/20')
+        assert datetime.date(2020, 12, 31) == m.end_of_year
+
     def test_shares_total_n(self, model):
         m = model
         e = m.enum
@@ -461,6 +649,22 @@ class TestPosition(object):
         res = (n << 2) + (1<<8) * 36 # one of them was $40/share
         assert m.exercise_cost_vested_outstanding_usd == res
 
+    def test_by_vehicle(self, model):
+        m = model
+        e = m.enum
+        m.override(e.query_date, '1/1/21')
+
+        buckets = m.grants_by_vehicle
+        assert ['rsu'] == [g.name for g in buckets['rsu']]
+        assert ['nso'] == [g.name for g in buckets['nso']]
+        assert len(GRANTS) - 2 == len(buckets['iso'])
+
+        totals = m.shares_vested_by_vehicle_n
+        assert totals['iso'] == m.shares_vested_iso_n
+        assert totals['nso'] == m.shares_vested_nso_n
+        assert totals['rsu'] == m.shares_vested_rsu_n
+        assert sum(totals.values()) == m.shares_vested_n
+
     def test_shares_total_rsu_n(self, model):
         m = model
         e = m.enum
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+import time
+
+
+class Profiler(object):
+    """Times every calculated node in a model.
+
+    While attached, each calculator is wrapped to record how often it
+    runs, its cumulative time (including the nodes it reads) and its
+    self time (excluding them).  Lookups that never reach the
+    calculator count as cache hits.
+
+        with profiler.Profiler(m) as prof:
+            Investigator(m).go()
+        print(prof.table())
+
+    The model is put back the way it was on detach (or when leaving
+    the with block).
+    """
+
+    def __init__(self, m):
+        self.m = m
+        self.calls = {}
+        self.lookups = {}
+        self.cum = {}
+        self.own = {}
+        self.stacks = {}
+        self._frames = []
+        self._orig = None
+
+    def __enter__(self):
+        self.attach()
+        return self
+
+    def __exit__(self, *exc):
+        self.detach()
+
+    def attach(self):
+        """Starts recording."""
+        m = self.m
+        assert(self._orig is None)
+        self._orig = dict(m._calc)
+        for node, fn in self._orig.items():
+            m._calc[node] = self._wrap(m.node_name(node), fn)
+
+        lookup = m.cached_calculate
+        def __cached_calculate(node, clear_stack=False):
+            name = m.node_name(node)
+            self.lookups[name] = self.lookups.get(name, 0) + 1
+            return lookup(node, clear_stack=clear_stack)
+        m.cached_calculate = __cached_calculate
+
+    def detach(self):
+        """Stops recording (the results are kept)."""
+        m = self.m
+        if self._orig is None:
+            return
+        m._calc.update(self._orig)
+        self._orig = None
+        del m.cached_calculate
+
+    def _wrap(self, name, fn):
+        def __timed(m):
+            frame = [name, 0.0]
+            self._frames.append(frame)
+            start = time.perf_counter()
+            try:
+                return fn(m)
+            finally:
+                elapsed = time.perf_counter() - start
+                self._frames.pop()
+                own = elapsed - frame[1]
+                if self._frames:
+                    self._frames[-1][1] += elapsed
+
+                self.calls[name] = self.calls.get(name, 0) + 1
+                self.cum[name] = self.cum.get(name, 0.0) + elapsed
+                self.own[name] = self.own.get(name, 0.0) + own
+
+                path = ';'.join([ f[0] for f in self._frames ] + [name])
+                self.stacks[path] = self.stacks.get(path, 0.0) + own
+        return __timed
+
+    def reset(self):
+        """Forgets everything recorded so far."""
+        self.calls = {}
+        self.lookups = {}
+        self.cum = {}
+        self.own = {}
+        self.stacks = {}
+
+    def hits(self, name):
+        """Lookups of a calculated node answered without running it."""
+        return self.lookups.get(name, 0) - self.calls.get(name, 0)
+
+    def table(self, sort='self', limit=None):
+        """Text table of the calculated nodes, most expensive first.
+
+        sort:  'self', 'cum', or 'calls'
+        limit: only show this many rows
+        """
+        key = {
+            'self': lambda n: self.own[n],
+            'cum': lambda n: self.cum[n],
+            'calls': lambda n: self.calls[n],
+            }[sort]
+        names = sorted(self.calls.keys(), key=key, reverse=True)
+        if limit is not None: names = names[:limit]
+
+        lines = ['%-48s %7s %7s %10s %10s' % (
+            'Node', 'Calls', 'Hits', 'Self (ms)', 'Cum (ms)')]
+        for n in names:
+            lines.append('%-48s %7d %7d %10.3f %10.3f' % (
+                n,
+                self.calls[n],
+                self.hits(n),
+                self.own[n] * 1000,
+                self.cum[n] * 1000))
+        return '\n'.join(lines) + '\n'
+
+    def folded(self):
+        """Folded stacks (self time in microseconds) for flamegraph.pl.
+
+        Each line is 'outer;...;inner <us>', which flamegraph.pl,
+        speedscope, and friends can read directly.
+        """
+        lines = [ '%s %d' % (path, int(round(t * 1e6)))
+                  for (path, t) in sorted(self.stacks.items()) ]
+        return '\n'.join(lines) + '\n'
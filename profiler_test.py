@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+
+import pytest
+
+import income as myMeager
+import profiler
+from sweep_test import model
+
+
+class TestProfiler(object):
+
+    def test_counts(self, model):
+        m = model
+        with profiler.Profiler(m) as prof:
+            m.cleared_from_sale_usd
+            m.cleared_from_sale_usd
+            m.override(m.enum.sales_orders, myMeager.sales_orders_rsu(m))
+            m.cleared_from_sale_usd
+
+        assert 2 == prof.calls['cleared_from_sale_usd']
+        assert 1 == prof.hits('cleared_from_sale_usd')
+        assert 2 == prof.calls['sales_simulation_data']
+        for name in prof.calls:
+            assert prof.own[name] <= prof.cum[name] + 1e-9
+
+        # The calculators are back to normal afterwards
+        assert 'cached_calculate' not in m.__dict__
+        m.override(m.enum.ipo_price_usd, 20)
+        m.cleared_from_sale_usd
+        assert 2 == prof.calls['cleared_from_sale_usd']
+
+    def test_reports(self, model):
+        m = model
+        with profiler.Profiler(m) as prof:
+            m.outstanding_taxes_usd
+
+        table = prof.table(limit=3).splitlines()
+        assert 4 == len(table)
+        assert table[0].startswith('Node')
+
+        folded = prof.folded().splitlines()
+        assert any([ l.startswith('outstanding_taxes_usd;') for l in folded ])
+        total = sum([ int(l.rsplit(' ', 1)[1]) for l in folded ])
+        # Self times add back up to the outermost node's time
+        assert abs(total - prof.cum['outstanding_taxes_usd'] * 1e6) \
+            <= len(folded)
@@ -1,7 +1,11 @@
 #!/usr/bin/env python
 
-import math
-import pylink
+import collections
+import html
+import io
+import json
+
+import numpy as np
 
 
 def comma(v, dec=True, n=13, white=True):
@@ -16,6 +20,37 @@ def comma(v, dec=True, n=13, white=True):
 
     return retval
 
+
+def commas(v, dec=False, n=13):
+    """comma() for a whole array at once.
+
+    A single format spec per number (no rounding, padding or replacing
+    afterwards).  With dec=False the result matches comma(x, dec=False)
+    exactly; with dec=True it's always two decimals.
+
+    returns: list of strings
+    """
+    v = np.atleast_1d(np.asarray(v, dtype=float))
+    if dec:
+        fmt = '{:>%d,.2f}' % n
+        return [ fmt.format(x) for x in v.tolist() ]
+    fmt = '{:>%d,}' % n
+    return [ fmt.format(x) for x in np.trunc(v).astype(np.int64).tolist() ]
+
+
+def percents(num, den):
+    """'%5.1f' of 100*num/den (rounded as round() would), per element.
+
+    A zero den gives 0.0, as the tax summary has always shown.
+    """
+    num = np.atleast_1d(np.asarray(num, dtype=float))
+    den = np.atleast_1d(np.asarray(den, dtype=float))
+    (num, den) = np.broadcast_arrays(num, den)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = np.where(den != 0, (100.0 * num) / den, 0.0)
+    return [ '%5.1f' % round(x, 1) for x in pct.tolist() ]
+
+
 TAX_FMT = """%%T: Rate vs the taxable income
 %%A: Rate vs the ACTUAL (in your bank) income
 
@@ -51,82 +86,303 @@ Total Taxes:        %(var_tot)s
 Outstanding:        %(var_tot_out)s
 """
 
+# The tax summary, section by section:
+#   (<label>, <TAX_FMT key>, <node>, <what the %T is against>)
+# where the base is None for plain amounts, and 'actual' for the lines
+# only shown against the actual income.
+TAX_SECTIONS = [
+    ('State Taxes', [
+        ('Taxable Income', 'state_taxable_income',
+         'state_taxable_income_usd', None),
+        ('Actual Income', 'total_income', 'total_income_usd', None),
+        ('Reg Taxes', 'var_state_reg',
+         'state_reg_income_taxes_usd', 'state_taxable_income_usd'),
+        ('SDI Taxes', 'var_state_sdi',
+         'state_sdi_taxes_usd', 'state_taxable_income_usd'),
+        ('State Taxes', 'var_state_tot',
+         'state_taxes_usd', 'state_taxable_income_usd'),
+        ('Cash Withheld', 'var_state_with',
+         'state_withheld_usd', 'state_taxable_income_usd'),
+        ('RSU Withheld', 'var_state_rsu_with',
+         'shares_withheld_rsu_state_usd', 'state_taxable_income_usd'),
+        ('Outstanding', 'var_state_out',
+         'state_outstanding_taxes_usd', 'state_taxable_income_usd'),
+        ]),
+    ('Federal Taxes', [
+        ('Fed Taxable Income', 'fed_taxable_income',
+         'fed_taxable_income_usd', None),
+        ('Actual Income', 'total_income', 'total_income_usd', None),
+        ('Reg Taxes', 'var_fed_reg',
+         'fed_reg_income_taxes_usd', 'fed_taxable_income_usd'),
+        ('SS Taxes', 'var_fed_ss',
+         'fed_ss_taxes_usd', 'fed_taxable_income_usd'),
+        ('Medicare Taxes', 'var_fed_med',
+         'fed_medicare_taxes_usd', 'fed_taxable_income_usd'),
+        ('AMT Taxable Income', 'amt_taxable_income',
+         'amt_taxable_income_usd', None),
+        ('AMT Exemption', 'var_amt_exempt',
+         'amt_exemption_usd', 'amt_taxable_income_usd'),
+        ('AMT Taxes', 'var_amt',
+         'amt_taxes_usd', 'amt_taxable_income_usd'),
+        ('Federal Taxes', 'var_fed_tot',
+         'fed_taxes_usd', 'fed_taxable_income_usd'),
+        ('Cash Withheld', 'var_fed_with',
+         'fed_withheld_usd', 'fed_taxable_income_usd'),
+        ('RSU Withheld', 'var_fed_rsu_with',
+         'shares_withheld_rsu_fed_usd', 'fed_taxable_income_usd'),
+        ('Outstanding', 'var_fed_out',
+         'fed_outstanding_taxes_usd', 'fed_taxable_income_usd'),
+        ]),
+    ('Overall', [
+        ('Actual Income', 'total_income', 'total_income_usd', None),
+        ('State Taxes', 'var_state_tot',
+         'state_taxes_usd', 'state_taxable_income_usd'),
+        ('Federal Taxes', 'var_fed_tot',
+         'fed_taxes_usd', 'fed_taxable_income_usd'),
+        ('Total Taxes', 'var_tot', 'tax_burden_usd', 'actual'),
+        ('Outstanding', 'var_tot_out', 'outstanding_taxes_usd', 'actual'),
+        ]),
+    ]
+
+TAX_NODES = []
+for (section, lines) in TAX_SECTIONS:
+    for (label, key, node, base) in lines:
+        if node not in TAX_NODES: TAX_NODES.append(node)
+
+# Everything the tax summary shows.  Each field is a number, or an
+# array with one number per person for a cohort model.
+TaxRecord = collections.namedtuple('TaxRecord', TAX_NODES)
+
+# The cap table, one column per field (one row per grant)
+GrantsRecord = collections.namedtuple('GrantsRecord', [
+    'name',
+    'vehicle',
+    'strike_usd',
+    'vested_n',
+    'withheld_n',
+    'sold_n',
+    'remaining_n',
+    ])
+
+
+def tax_record(values):
+    """TaxRecord from {<node>: <value>} (e.g. from cohort.evaluate)."""
+    return TaxRecord(**dict([ (n, values[n]) for n in TAX_NODES ]))
+
+
+def _columns(rec):
+    """(<number of people, or None for one>, {<node>: <1-D array>})
+
+    Every column is broadcast out to one value per person.
+    """
+    sizes = [ np.size(v) for v in rec if np.ndim(v) ]
+    people = max(sizes) if sizes else None
+    n = people or 1
+    cols = dict([ (k, np.broadcast_to(np.asarray(v, dtype=float), n))
+                  for (k, v) in rec._asdict().items() ])
+    return (people, cols)
+
+
+def _tax_args(cols):
+    """TAX_FMT arguments, as a list for every key (one per person)."""
+    actual = cols['total_income_usd']
+    args = {}
+    for (section, lines) in TAX_SECTIONS:
+        for (label, key, node, base) in lines:
+            if key in args:
+                continue
+            amount = commas(cols[node])
+            if base is None:
+                args[key] = amount
+                continue
+            ri = percents(cols[node], actual)
+            if 'actual' == base:
+                args[key] = [ '%s $   ( %s%%A         )' % (a, i)
+                              for (a, i) in zip(amount, ri) ]
+            else:
+                rt = percents(cols[node], cols[base])
+                args[key] = [ '%s $   ( %s%%A %s%%T )' % (a, i, t)
+                              for (a, i, t) in zip(amount, ri, rt) ]
+    return args
+
+
+def render_text(rec):
+    """The tax summary as text (a list of them for a cohort)."""
+    (people, cols) = _columns(rec)
+    args = _tax_args(cols)
+    keys = list(args.keys())
+    texts = [ TAX_FMT % dict(zip(keys, row))
+              for row in zip(*[ args[k] for k in keys ]) ]
+    if people is None: return texts[0]
+    return texts
+
+
+def render_json(rec):
+    """The tax record as JSON: {<node>: <value or list per person>}."""
+    (people, cols) = _columns(rec)
+    if people is None:
+        vals = dict([ (k, v[0].item()) for (k, v) in cols.items() ])
+    else:
+        vals = dict([ (k, v.tolist()) for (k, v) in cols.items() ])
+    return json.dumps(vals)
+
+
+def render_html(rec, names=None):
+    """The tax summary as HTML tables (one per person for a cohort).
+
+    names: captions for the people (default: their index)
+    """
+    (people, cols) = _columns(rec)
+    n = people or 1
+    if names is None:
+        names = [ str(i) for i in range(n) ]
+
+    # Format every cell for everybody up front
+    amounts = dict([ (node, commas(v, n=0)) for (node, v) in cols.items() ])
+    actual = cols['total_income_usd']
+    blank = [''] * n
+    pct = {}
+    for (section, lines) in TAX_SECTIONS:
+        for (label, key, node, base) in lines:
+            if base is None or node in pct:
+                continue
+            ri = [ p.strip() for p in percents(cols[node], actual) ]
+            rt = blank
+            if 'actual' != base:
+                rt = [ p.strip() for p in percents(cols[node], cols[base]) ]
+            pct[node] = (ri, rt)
+
+    buf = io.StringIO()
+    for i in range(n):
+        buf.write('<table class="tax-summary">\n')
+        if people is not None:
+            buf.write('<caption>%s</caption>\n' % html.escape(names[i]))
+        buf.write('<tr><th></th><th>USD</th><th>%A</th><th>%T</th></tr>\n')
+        for (section, lines) in TAX_SECTIONS:
+            buf.write('<tr><th colspan="4">%s</th></tr>\n' % section)
+            for (label, key, node, base) in lines:
+                (ri, rt) = pct.get(node, (blank, blank))
+                buf.write('<tr><td>%s</td><td>%s</td><td>%s</td>'
+                          '<td>%s</td></tr>\n'
+                          % (label, amounts[node][i], ri[i], rt[i]))
+        buf.write('</table>\n')
+    return buf.getvalue()
+
+
+RENDERERS = {
+    'text': render_text,
+    'json': render_json,
+    'html': render_html,
+    }
+
+
+def write_reports(out, rec, fmt='text'):
+    """Writes the tax summary for everybody in a record to out.
+
+    out: file name (opened with a large buffer) or file object
+    fmt: 'text', 'json' or 'html'
+
+    Text summaries are separated by a form feed, JSON is one object
+    per line (one per person), and HTML is one table per person.
+    """
+    if isinstance(out, str):
+        with open(out, 'w', buffering=1 << 20) as fd:
+            return write_reports(fd, rec, fmt)
+
+    if 'text' == fmt:
+        texts = render_text(rec)
+        if isinstance(texts, str): texts = [texts]
+        out.write('\f\n'.join(texts))
+    elif 'json' == fmt:
+        (people, cols) = _columns(rec)
+        keys = list(cols.keys())
+        for row in zip(*[ cols[k].tolist() for k in keys ]):
+            out.write(json.dumps(dict(zip(keys, row))))
+            out.write('\n')
+    else:
+        out.write(render_html(rec))
+
 
 class Report(object):
 
-    def __init__(self, m):
+    def __init__(self, m, cache=None):
+        """m:     the DAGModel
+        cache: evalcache.Cache to take the numbers from (if any)
+        """
         self.m = m
+        self.cache = cache
 
-    def print_tax_summary(self):
+    def collect(self):
+        """Evaluates everything the tax summary shows (no formatting)."""
         m = self.m
+        if self.cache is not None:
+            return tax_record(self.cache.collect(m, TAX_NODES))
+        return TaxRecord(*[ getattr(m, node) for node in TAX_NODES ])
 
-        args = {}
-        
-        def __a(name, val, real_only=False):
-            ri = round(((100.0 * float(val)) / float(m.total_income_usd)), 1)
-            if real_only:
-                s = '%s $   ( %5.1f%%A         )' % (comma(val, dec=False), ri)
-            else:
-                if taxable_income:
-                    rt = round(((100.0 * float(val)) / float(taxable_income)), 1)
-                else:
-                    rt = 0.0
-                s = '%s $   ( %5.1f%%A %5.1f%%T )' % (comma(val, dec=False), ri, rt)
-            args['var_'+name] = s
-
-        args['total_income'] = comma(m.total_income_usd, dec=False)
-
-        taxable_income = m.state_taxable_income_usd
-        args['state_taxable_income'] = comma(m.state_taxable_income_usd, dec=False)
-        __a('state_reg', m.state_reg_income_taxes_usd)
-        __a('state_sdi', m.state_sdi_taxes_usd)
-        __a('state_tot', m.state_taxes_usd)
-        __a('state_with', m.state_withheld_usd)
-        __a('state_rsu_with', m.shares_withheld_rsu_state_usd)
-        __a('state_out', m.state_outstanding_taxes_usd)
-
-        args['fed_taxable_income'] = comma(m.fed_taxable_income_usd, dec=False)
-        args['amt_taxable_income'] = comma(m.amt_taxable_income_usd, dec=False)
-        taxable_income = m.amt_taxable_income_usd
-        __a('amt', m.amt_taxes_usd)
-        __a('amt_exempt', m.amt_exemption_usd)
-        taxable_income = m.fed_taxable_income_usd
-        __a('fed_reg', m.fed_reg_income_taxes_usd)
-        __a('fed_ss', m.fed_ss_taxes_usd)
-        __a('fed_med', m.fed_medicare_taxes_usd)
-        __a('fed_tot', m.fed_taxes_usd)
-        __a('fed_with', m.fed_withheld_usd)
-        __a('fed_rsu_with', m.shares_withheld_rsu_fed_usd)
-        __a('fed_out', m.fed_outstanding_taxes_usd)
-
-        __a('tot', m.tax_burden_usd, real_only=True)
-        __a('tot_out', m.outstanding_taxes_usd, real_only=True)
-
-        print(TAX_FMT % args)
+    def collect_grants(self):
+        """The cap table before and after the sales, as columns."""
+        # position needs comma() from here, so not at the top
+        from position import GrantBook
 
-    def print_grants(self):
         m = self.m
-        print("="*60)
-        print("Cap Table")
-        print("="*60)
-
-        start_lst = m.grants_lst
-        end_lst = m.rem_grants_lst
-
-        print('        ID       Type  Strike        Vested        Withheld            Sold       Remaining')
-        row_fmt = '%(name)15s  %(vehicle)s %(strike)6s %(vested)15s %(withheld)15s %(sold)15s %(rem)15s'
-        for i in range(len(start_lst)):
-            start = start_lst[i]
-            end = end_lst[i]
-            assert(start.name == end.name)
-            kwargs = {
-                'name':    start.name,
-                'vehicle': start.vehicle,
-                'strike':  '%5.1f' % start.strike_usd,
-                'vested':  comma(start.vested(m.query_date), dec=False),
-                'sold':    comma(end.sold - start.sold, dec=False),
-                'withheld': comma(end.withheld, dec=False),
-                'rem':     comma(end.vested_unliquidated(m.query_date), dec=False),
-                }
-            print(row_fmt % kwargs)
-        print()
+        start = m.grants_lst
+        end = m.rem_grants_lst
+        on = m.query_date
+
+        if isinstance(start, GrantBook):
+            return GrantsRecord(
+                name=list(start.name),
+                vehicle=[ start.vehicle_of(n) for n in start.name ],
+                strike_usd=start.strike_usd,
+                vested_n=start.vested(on),
+                withheld_n=end.withheld,
+                sold_n=end.sold - start.sold,
+                remaining_n=end.vested_unliquidated(on))
+
+        for (s, e) in zip(start, end):
+            assert(s.name == e.name)
+        return GrantsRecord(
+            name=[ g.name for g in start ],
+            vehicle=[ g.vehicle for g in start ],
+            strike_usd=np.array([ g.strike_usd for g in start ]),
+            vested_n=np.array([ g.vested(on) for g in start ]),
+            withheld_n=np.array([ g.withheld for g in end ]),
+            sold_n=np.array([ e.sold - s.sold for (s, e) in zip(start, end) ]),
+            remaining_n=np.array([ g.vested_unliquidated(on) for g in end ]))
+
+    def render(self, fmt='text', rec=None):
+        """The tax summary in one of RENDERERS' formats."""
+        if rec is None: rec = self.collect()
+        return RENDERERS[fmt](rec)
+
+    def write(self, out, fmt='text', rec=None):
+        """Writes the tax summary to a file name or file object."""
+        if rec is None: rec = self.collect()
+        write_reports(out, rec, fmt)
+
+    def print_tax_summary(self):
+        print(self.render('text'))
+
+    def render_grants(self, rec=None):
+        """The cap table as text."""
+        if rec is None: rec = self.collect_grants()
+        lines = [
+            "="*60,
+            "Cap Table",
+            "="*60,
+            '        ID       Type  Strike        Vested        Withheld            Sold       Remaining',
+            ]
+        row_fmt = '%15s  %s %6s %15s %15s %15s %15s'
+        cols = zip(rec.name,
+                   rec.vehicle,
+                   [ '%5.1f' % s for s in np.asarray(rec.strike_usd).tolist() ],
+                   commas(rec.vested_n),
+                   commas(rec.withheld_n),
+                   commas(rec.sold_n),
+                   commas(rec.remaining_n))
+        for row in cols:
+            lines.append(row_fmt % row)
+        return '\n'.join(lines) + '\n'
+
+    def print_grants(self):
+        print(self.render_grants())
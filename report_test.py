@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+import json
+
+import numpy as np
+import pytest
+
+import cohort
+import report
+from cohort_test import CONSTANTS
+from cohort_test import employees
+from cohort_test import alone
+from position import GrantBook
+from report import comma
+from sweep_test import GRANTS
+from sweep_test import model
+
+
+class TestFormat(object):
+
+    def test_commas(self):
+        v = [0, 1, -1, 999.9, 1000, -12345.67, 1234567.891, 1e12]
+        assert [ comma(x, dec=False) for x in v ] == report.commas(v)
+        assert ['    1,234.50'] == report.commas(1234.5, dec=True, n=12)
+
+    def test_percents(self):
+        assert [' 50.0', '  0.0', ' 33.3'] == report.percents([1, 5, 1],
+                                                              [2, 0, 3])
+
+
+class TestReport(object):
+
+    def test_text(self, model):
+        rep = report.Report(model)
+        text = rep.render('text')
+        assert text.startswith('%T: Rate vs the taxable income')
+
+        out = comma(model.outstanding_taxes_usd, dec=False)
+        assert ('Outstanding:        %s $' % out) in text
+        inc = comma(model.total_income_usd, dec=False)
+        assert 3 == text.count('Actual Income:      %s $\n' % inc)
+
+    def test_json(self, model):
+        rep = report.Report(model)
+        vals = json.loads(rep.render('json'))
+        assert set(report.TAX_NODES) == set(vals)
+        assert vals['amt_taxes_usd'] == model.amt_taxes_usd
+
+    def test_html(self, model):
+        page = report.Report(model).render('html')
+        assert 1 == page.count('<table')
+        assert '<th colspan="4">Overall</th>' in page
+
+    def test_cohort(self, employees):
+        res = cohort.evaluate(employees, report.TAX_NODES, **CONSTANTS)
+        rec = report.tax_record(res)
+        texts = report.render_text(rec)
+        assert len(employees) == len(texts)
+        for (emp, text) in zip(employees, texts):
+            m = alone(emp, lambda m: [])
+            assert report.render_text(report.Report(m).collect()) == text
+
+        page = report.render_html(rec, names=['a', 'b', 'c'])
+        assert 3 == page.count('<table')
+        assert '<caption>b</caption>' in page
+
+    def test_write(self, employees, tmp_path):
+        res = cohort.evaluate(employees, report.TAX_NODES, **CONSTANTS)
+        rec = report.tax_record(res)
+
+        path = str(tmp_path / 'taxes.txt')
+        report.write_reports(path, rec, 'text')
+        with open(path) as fd:
+            assert 3 == len(fd.read().split('\f\n'))
+
+        path = str(tmp_path / 'taxes.json')
+        report.write_reports(path, rec, 'json')
+        with open(path) as fd:
+            lines = [ json.loads(l) for l in fd ]
+        assert 3 == len(lines)
+        assert lines[2]['outstanding_taxes_usd'] == \
+            res['outstanding_taxes_usd'][2]
+
+    def test_grants(self, model):
+        rec = report.Report(model).collect_grants()
+        assert ['rsu', 'nso', 'iso'] == rec.name
+        assert ['rsu', 'nso', 'iso'] == rec.vehicle
+        text = report.Report(model).render_grants(rec)
+        assert 4 + 3 == len(text.strip().split('\n'))
+
+    def test_grants_book(self, model):
+        rec = report.Report(model).collect_grants()
+        model.override(model.enum.grants_lst, GrantBook.from_grants(GRANTS))
+        book = report.Report(model).collect_grants()
+        assert rec.name == book.name
+        assert rec.vehicle == book.vehicle
+        for field in ['strike_usd', 'vested_n', 'withheld_n', 'sold_n',
+                      'remaining_n']:
+            assert np.allclose(getattr(rec, field), getattr(book, field))
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+import itertools
+
+import numpy as np
+
+import sweep
+from position import parse_date
+
+
+class Strategy(object):
+    """A labeled order generator for scenario grids.
+
+        Strategy(income.sales_orders_all, nso_first=True, restricted=False)
+
+    Calling it as an order generator (see sweep.price_sweep) places
+    fn(m, price=price, **kwargs).
+    """
+
+    def __init__(self, fn, name=None, **kwargs):
+        """fn:     order generator, e.g. income.sales_orders_rsu
+        name:   label on the strategy axis (default: built from fn's
+                name and the flags)
+        kwargs: passed along to fn
+        """
+        self.fn = fn
+        self.kwargs = kwargs
+        if name is None:
+            flags = [ '%s=%s' % (k, kwargs[k]) for k in sorted(kwargs) ]
+            name = '%s(%s)' % (fn.__name__, ', '.join(flags))
+        self.name = name
+
+    def __call__(self, m, price):
+        return self.fn(m, price=price, **self.kwargs)
+
+    def __repr__(self):
+        return self.name
+
+
+class ResultCube(object):
+    """Node values over every combination of a few labeled axes.
+
+        cube['cleared_from_sale_usd'][i, j, k]
+        cube.sel(query_date='3/15/21')['outstanding_taxes_usd']
+        cube.best('cleared_from_sale_usd')
+
+    Selecting a single label drops that axis; whatever axes are left
+    keep their order.
+    """
+
+    def __init__(self, axes, data):
+        """axes: [(<axis name>, [<label>, ...]), ...]
+        data: {<node name>: <np.array shaped len(labels) per axis>, ...}
+        """
+        self.axes = [ (name, list(labels)) for (name, labels) in axes ]
+        self.data = data
+        for name, val in data.items():
+            assert(np.shape(val) == self.shape)
+
+    @property
+    def dims(self):
+        return [ name for (name, labels) in self.axes ]
+
+    @property
+    def shape(self):
+        return tuple([ len(labels) for (name, labels) in self.axes ])
+
+    @property
+    def nodes(self):
+        return list(self.data.keys())
+
+    def __getitem__(self, node):
+        return self.data[node]
+
+    def __contains__(self, node):
+        return node in self.data
+
+    def labels(self, axis):
+        return self.axes[self.dims.index(axis)][1]
+
+    def index(self, axis, label):
+        """Position of a label along an axis."""
+        labels = self.labels(axis)
+        for (i, lbl) in enumerate(labels):
+            if lbl == label or str(lbl) == str(label):
+                return i
+        raise KeyError('%s not on the %s axis' % (label, axis))
+
+    def isel(self, **positions):
+        """Sub-cube at the given positions (by index) along some axes."""
+        idx = []
+        axes = []
+        for (name, labels) in self.axes:
+            if name in positions:
+                idx.append(positions.pop(name))
+            else:
+                idx.append(slice(None))
+                axes.append((name, labels))
+        if positions:
+            raise KeyError('No such axes: %s' % ', '.join(positions))
+        idx = tuple(idx)
+        return ResultCube(axes, dict([ (node, val[idx])
+                                       for (node, val) in self.data.items() ]))
+
+    def sel(self, **labels):
+        """Sub-cube at the given labels along some axes."""
+        return self.isel(**dict([ (axis, self.index(axis, lbl))
+                                  for (axis, lbl) in labels.items() ]))
+
+    def best(self, node, maximize=True):
+        """The scenario with the highest (or lowest) value of a node.
+
+        returns: {<axis name>: <label>, ..., node: <value>}
+        """
+        val = self.data[node]
+        flat = np.argmax(val) if maximize else np.argmin(val)
+        pos = np.unravel_index(flat, self.shape)
+        retval = dict([ (name, labels[i])
+                        for ((name, labels), i) in zip(self.axes, pos) ])
+        retval[node] = float(val[pos])
+        return retval
+
+    def records(self):
+        """One dict per scenario: the labels and every node's value."""
+        for pos in itertools.product(*[ range(n) for n in self.shape ]):
+            rec = dict([ (name, labels[i])
+                         for ((name, labels), i) in zip(self.axes, pos) ])
+            for node, val in self.data.items():
+                rec[node] = float(val[pos])
+            yield rec
+
+
+def grid(m, prices, dates, strategies, nodes, **overrides):
+    """Evaluates nodes over every (price, date, strategy) combination.
+
+    Rather than overriding the three of them point by point, we walk
+    the dates and strategies and push all of the prices through the
+    model at once (see sweep.price_sweep).  Whatever only depends on
+    the date (the vesting, the grant summations, ...) stays cached
+    across the strategies and prices, and each strategy's orders are
+    placed once per date.
+
+    m:          the DAGModel (left the way we found it)
+    prices:     share prices (USD)
+    dates:      query dates
+    strategies: Strategy objects (or plain order generators)
+    nodes:      names of the nodes to collect
+    overrides:  any other node values to hold (see sweep.price_sweep)
+
+    returns: ResultCube with the axes ipo_price_usd, query_date and
+             strategy
+    """
+    prices = np.asarray(prices, dtype=float).ravel()
+    dates = list(dates)
+    strategies = list(strategies)
+    shape = (len(prices), len(dates), len(strategies))
+    data = dict([ (name, np.zeros(shape)) for name in nodes ])
+
+    saved = sweep.snapshot_nodes(m, ['query_date'])
+    try:
+        for (j, d) in enumerate(dates):
+            m.override(m.enum.query_date, parse_date(d))
+            for (k, strat) in enumerate(strategies):
+                res = sweep.price_sweep(m, prices, nodes, orders=strat,
+                                        **overrides)
+                for name in nodes:
+                    data[name][:, j, k] = res[name]
+    finally:
+        sweep.restore_nodes(m, saved)
+
+    names = [ getattr(s, 'name', getattr(s, '__name__', repr(s)))
+              for s in strategies ]
+    return ResultCube([('ipo_price_usd', prices.tolist()),
+                       ('query_date', dates),
+                       ('strategy', names)],
+                      data)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+import numpy as np
+import pytest
+
+import income as myMeager
+import scenarios
+from sweep_test import model
+
+
+PRICES = [8.0, 12.0, 20.0]
+DATES = ['9/29/20', '3/15/21']
+STRATEGIES = [
+    scenarios.Strategy(myMeager.sales_orders_rsu),
+    scenarios.Strategy(myMeager.sales_orders_all,
+                       nso_first=True, restricted=False),
+    scenarios.Strategy(lambda m, price=None: [], name='hold'),
+    ]
+NODES = ['outstanding_taxes_usd', 'cleared_from_sale_usd']
+
+
+class TestScenarios(object):
+
+    def test_strategy(self):
+        s = scenarios.Strategy(myMeager.sales_orders_all,
+                               restricted=False, nso_first=True)
+        assert(s.name == 'sales_orders_all(nso_first=True, restricted=False)')
+        assert(scenarios.Strategy(myMeager.sales_orders_rsu,
+                                  name='rsu').name == 'rsu')
+
+    def test_grid(self, model):
+        m = model
+        taxes = m.outstanding_taxes_usd
+        cube = scenarios.grid(m, PRICES, DATES, STRATEGIES, NODES)
+        assert(cube.shape == (3, 2, 3))
+        assert(cube.dims == ['ipo_price_usd', 'query_date', 'strategy'])
+
+        # Left the way we found it
+        assert(m.outstanding_taxes_usd == taxes)
+
+        # Same as overriding one point at a time
+        for (i, price) in enumerate(PRICES):
+            for (j, d) in enumerate(DATES):
+                for (k, strat) in enumerate(STRATEGIES):
+                    m.override(m.enum.query_date, d)
+                    m.override(m.enum.ipo_price_usd, price)
+                    m.override(m.enum.sales_orders, strat(m, price))
+                    for name in NODES:
+                        assert(cube[name][i, j, k]
+                               == pytest.approx(getattr(m, name)))
+
+    def test_cube(self, model):
+        cube = scenarios.grid(model, PRICES, DATES, STRATEGIES, NODES)
+
+        sub = cube.sel(query_date='3/15/21', strategy='hold')
+        assert(sub.dims == ['ipo_price_usd'])
+        assert((sub['cleared_from_sale_usd']
+                == cube['cleared_from_sale_usd'][:, 1, 2]).all())
+        assert(cube.sel(ipo_price_usd=12.0).shape == (2, 3))
+        assert(cube.isel(strategy=0).labels('query_date') == DATES)
+        with pytest.raises(KeyError):
+            cube.sel(strategy='nope')
+        with pytest.raises(KeyError):
+            cube.isel(nope=0)
+
+        best = cube.best('cleared_from_sale_usd')
+        assert(best['ipo_price_usd'] == 20.0)
+        assert(best['cleared_from_sale_usd']
+               == cube['cleared_from_sale_usd'].max())
+        low = cube.best('outstanding_taxes_usd', maximize=False)
+        assert(low['outstanding_taxes_usd']
+               == cube['outstanding_taxes_usd'].min())
+
+        recs = list(cube.records())
+        assert(len(recs) == 18)
+        assert(recs[-1]['strategy'] == 'hold')
+        assert(recs[-1]['cleared_from_sale_usd']
+               == cube['cleared_from_sale_usd'][2, 1, 2])
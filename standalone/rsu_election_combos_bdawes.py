@@ -1,38 +1,25 @@
 #!/usr/bin/env python
 
-"""Generates a graph called graph.py, where bar = % of all RSUs sold and 
-X-axis labels = indices within vested_quants which were chosen as 'sell_to_cover'"""
+"""Prints which of vested_quants to elect as 'sell_to_cover' (and which
+as sell-all) to get closest to selling target_frac of all the RSUs.
+
+This used to graph every combination; elections.elect now picks the
+best one directly, for any number of grants.
+"""
 
 __author__ = "Ben Dawes"
 
-import itertools
-vested_quants = [...]
-withholding = ...
-total = sum(vested_quants)
-sale_quants = []
-which_sold_to_cover = []
-for i in range(len(vested_quants)+1):
-  for indices_to_sell_to_cover in itertools.combinations(list(range(len(vested_quants))), i):
-    total_sold = 0
-    print(indices_to_sell_to_cover)
-    for j in range(len(vested_quants)):
-       if j in indices_to_sell_to_cover:
-          total_sold += withholding * vested_quants[j]
-       else:
-          total_sold += vested_quants[j]
-    sale_quants.append(total_sold/total)
-    which_sold_to_cover.append(indices_to_sell_to_cover)
-print(sale_quants)
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+import elections
 
-import matplotlib.pyplot as plt; plt.rcdefaults()
-import numpy as np
-import matplotlib.pyplot as plt
+# Fill these in (the numbers here are notional)
+vested_quants = [10000, 20000, 2000, 50000]
+withholding = 0.22
+target_frac = 0.5
 
-which_sold_to_cover = [x for _,x in sorted(zip(sale_quants,which_sold_to_cover))]
-sale_quants = sorted(sale_quants)
-y_pos = np.arange(len(sale_quants))
-plt.bar(y_pos, sale_quants, align='center', alpha=0.5)
-plt.xticks(y_pos, ["".join(list([str(w) for w in which])) for which in which_sold_to_cover])
-plt.ylabel('% RSUs sold')
-plt.title('Percentage sold on sell-to-cover combos')
-plt.savefig('graph.png')
+res = elections.elect(vested_quants, withholding, target_frac)
+print(elections.describe(res))
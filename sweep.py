@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+import numpy as np
+
+
+def snapshot_nodes(m, names):
+    """Remember the state of some nodes so they can be put back later.
+
+    Static nodes (and overridden calculators) remember their value,
+    calculators that were left alone get reverted.
+
+    returns: {<name>: (<was it set?>, <value>), ...}
+    """
+    retval = {}
+    for name in names:
+        node = m.node_num(name)
+        if m.is_static_node(node) or m.is_overridden(node):
+            retval[name] = (True, m.override_value(node))
+        else:
+            retval[name] = (False, None)
+    return retval
+
+
+def restore_nodes(m, saved):
+    """Undo whatever happened to the nodes since snapshot_nodes."""
+    for name, (was_set, val) in saved.items():
+        node = m.node_num(name)
+        if was_set:
+            m.override(node, val)
+        else:
+            m.revert(node)
+
+
+def price_sweep(m, prices, nodes, orders=None, **overrides):
+    """Evaluate the model across an array of share prices in one pass.
+
+    Rather than overriding ipo_price_usd one point at a time (and
+    re-running the sales simulation for every point), the whole array
+    is pushed through the DAG at once.  The income and tax nodes are
+    written with numpy-friendly arithmetic, so the array broadcasts all
+    the way down to the outputs.
+
+    m:         the DAGModel
+    prices:    iterable of share prices (USD)
+    nodes:     names of the nodes to collect
+    orders:    callable(m, price) returning the sales orders to place
+               for the sweep (e.g. income.sales_orders_rsu), or None to
+               keep whatever orders are currently placed
+    overrides: any other node values to hold during the sweep (either
+               scalars or arrays shaped like prices)
+
+    The order generator is called once with the whole price array, so
+    the quantities it places must not depend upon the price -- only
+    the sale price may vary across the sweep.  Every overridden node
+    is put back the way it was found when we're done.
+
+    returns: {<node name>: <np.array shaped like prices>, ...}
+    """
+    prices = np.asarray(prices, dtype=float)
+    e = m.enum
+
+    saved = snapshot_nodes(m,
+                           ['ipo_price_usd', 'sales_orders']
+                           + list(overrides.keys()))
+    try:
+        for name, val in overrides.items():
+            m.override(m.node_num(name), val)
+        m.override(e.ipo_price_usd, prices)
+        if orders is not None:
+            m.override(e.sales_orders, orders(m, prices))
+
+        retval = {}
+        for name in nodes:
+            val = np.asarray(getattr(m, name), dtype=float)
+            retval[name] = np.broadcast_to(val, prices.shape).copy()
+    finally:
+        restore_nodes(m, saved)
+
+    return retval
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+import numpy as np
+import pylink
+import pytest
+
+import taxes as deathAnd
+import income as myMeager
+import position as anAwkward
+import sweep
+from position import Grant
+
+
+GRANTS = [
+    Grant(name='rsu',
+          vehicle='rsu',
+          strike_usd=0,
+          start='1/1/19',
+          n_periods=48,
+          n_shares=96000,
+          period_months=1),
+
+    Grant(name='nso',
+          vehicle='nso',
+          strike_usd=2,
+          start='1/1/10',
+          n_periods=1,
+          n_shares=10000,
+          exercised=500,
+          sold=250,
+          period_months=1),
+
+    Grant(name='iso',
+          vehicle='iso',
+          strike_usd=4,
+          start='1/1/15',
+          n_periods=48,
+          n_shares=250000,
+          exercised=0,
+          sold=0,
+          period_months=3),
+    ]
+
+
+@pytest.fixture
+def model():
+    fed_married_joint = {
+        0      : 0.1,
+        19750  : 0.12,
+        80250  : 0.22,
+        171050 : 0.24,
+        326600 : 0.32,
+        414700 : 0.35,
+        622050 : 0.37
+        }
+
+    ca_married = {
+        0 : 0.01,
+        17618 : 0.02,
+        41766 : 0.04,
+        65920 : 0.06,
+        91506 : 0.08,
+        115648 : 0.093,
+        590746 : 0.103,
+        708890 : 0.113,
+        1181484 : 0.123,
+        1999999 : 0.133
+        }
+
+    return pylink.DAGModel([deathAnd.Taxes(),
+                            myMeager.Income(),
+                            anAwkward.Position(GRANTS)],
+                           **{'fed_tax_table': fed_married_joint,
+                              'state_tax_table': ca_married,
+                              'fed_std_deduction_usd': 24800,
+                              'amt_exemption_rolloff_threshhold_usd': 1036800,
+                              'amt_exemption_base_usd': 113400,
+                              'state_std_deduction_usd': 4537,
+                              'ipo_price_usd': 12,
+                              'query_date': '9/29/20',
+                              'iso_exercise_income_usd': 0,
+                              'palantir_401k_usd': 0,
+                              'palantir_fsa_usd': 0,
+                              'palantir_drca_usd': 0,
+                              'reg_income_usd': 150000,
+                              'ext_amt_income_usd': 0,
+                              'fed_withheld_usd': 20000,
+                              'state_withheld_usd': 15000,
+                              })
+
+
+NODES = [
+    'total_income_usd',
+    'outstanding_taxes_usd',
+    'amt_taxable_income_usd',
+    'amt_exemption_usd',
+    'cleared_from_sale_usd',
+    ]
+
+
+def orders_all(m, price):
+    return myMeager.sales_orders_all(m,
+                                     nso_first=True,
+                                     cheap_first=False,
+                                     price=price)
+
+
+class TestSweep(object):
+
+    def test_matches_point_by_point(self, model):
+        m = model
+        e = m.enum
+        prices = np.linspace(1, 60, 25)
+
+        res = sweep.price_sweep(m, prices, NODES, orders=orders_all)
+
+        for i, price in enumerate(prices):
+            m.override(e.ipo_price_usd, price)
+            m.override(e.sales_orders, orders_all(m, price))
+            for name in NODES:
+                assert abs(getattr(m, name) - res[name][i]) < 1e-6
+
+    def test_restores_state(self, model):
+        m = model
+        e = m.enum
+        before = m.outstanding_taxes_usd
+
+        sweep.price_sweep(m, [5, 10], NODES,
+                          orders=orders_all,
+                          reg_income_usd=np.array([0, 1e6]))
+
+        assert 12 == m.ipo_price_usd
+        assert 150000 == m.reg_income_usd
+        assert [] == m.sales_orders
+        assert before == m.outstanding_taxes_usd
+
+    def test_constant_nodes_broadcast(self, model):
+        m = model
+        res = sweep.price_sweep(m, [5, 10, 15], ['reg_income_usd'])
+        assert (3,) == res['reg_income_usd'].shape
+        assert (150000 == res['reg_income_usd']).all()
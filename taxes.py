@@ -1,7 +1,81 @@
 #!/usr/bin/env python
 
+import bisect
+import functools
 import math
-import pylink
+import numpy as np
+
+
+def ceil(v):
+    """int(math.ceil(v)), but also works elementwise on arrays"""
+    if np.ndim(v) == 0:
+        return int(math.ceil(v))
+    return np.ceil(v)
+
+
+class TaxBrackets(object):
+    """A progressive tax table, compiled for quick evaluation.
+
+    The table is sorted once, and the tax owed at each threshold is
+    accumulated up front so that evaluating any income is just a
+    lookup of the bracket plus one multiply.
+    """
+
+    def __init__(self, tab):
+        """tab: {<threshold>: <marginal rate>, ...}, as in the *_tax_table nodes
+        """
+        crit = sorted(list(tab.keys()))
+
+        self.thresholds = np.array(crit, dtype=float)
+        self.rates = np.array([tab[c] for c in crit], dtype=float)
+
+        # Tax owed on everything below each threshold
+        widths = np.diff(self.thresholds)
+        self.base = np.concatenate(([0.0],
+                                    np.cumsum(widths * self.rates[:-1])))
+
+        # Plain python copies for the scalar path, which is faster
+        # than poking at numpy one element at a time.
+        self._crit = self.thresholds.tolist()
+        self._rates = self.rates.tolist()
+        self._base = self.base.tolist()
+
+    def tax(self, v):
+        """Taxes owed on v (scalar or numpy array)."""
+        if np.ndim(v) == 0:
+            idx = bisect.bisect_right(self._crit, v) - 1
+            if idx < 0: return 0.0
+            retval = self._base[idx] + (v - self._crit[idx]) * self._rates[idx]
+            # Round to the penny exactly the way np.round does below
+            return round(float(retval) * 100.0) / 100.0
+
+        v = np.asarray(v, dtype=float)
+        idx = np.searchsorted(self.thresholds, v, side='right') - 1
+        below = idx < 0
+        idx = np.maximum(idx, 0)
+        retval = self.base[idx] + (v - self.thresholds[idx]) * self.rates[idx]
+        retval[below] = 0.0
+        return np.round(retval, 2)
+
+    def income_for(self, tax):
+        """The largest income on which no more than tax is owed.
+
+        This is just the inverse of tax() for brackets with non-zero
+        rates, and inf when the top bracket stops taxing (ss/sdi).
+        Works for scalars or numpy arrays.
+        """
+        if np.ndim(tax) == 0:
+            idx = max(bisect.bisect_right(self._base, tax) - 1, 0)
+            rate = self._rates[idx]
+            if not rate: return math.inf
+            return self._crit[idx] + (tax - self._base[idx]) / rate
+
+        tax = np.asarray(tax, dtype=float)
+        idx = np.maximum(np.searchsorted(self.base, tax, side='right') - 1, 0)
+        rate = self.rates[idx]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = np.where(0 < rate, (tax - self.base[idx]) / rate, np.inf)
+        return self.thresholds[idx] + delta
 
 
 class Taxes(object):
@@ -59,6 +133,7 @@ class Taxes(object):
             'amt_tax_rate_vs_taxable': self.amt_tax_rate_vs_taxable,
             'amt_tax_rate_vs_income': self.amt_tax_rate_vs_income,
             'amt_exemption_usd': self.amt_exemption_usd,
+            'amt_free_iso_exercise_income_usd': self.amt_free_iso_exercise_income,
             'fed_outstanding_taxes_usd': self.fed_outstanding_taxes,
 
             # State Taxes
@@ -91,6 +166,13 @@ class Taxes(object):
 
             }
 
+        # Compiled versions of each of the tables, so we only sort and
+        # accumulate them when the table itself changes.
+        for name in ['fed', 'state', 'amt', 'sdi', 'medicare', 'ss']:
+            f = functools.partial(self.compile_tax_table,
+                                  '%s_tax_table' % name)
+            self.tribute['%s_tax_brackets' % name] = f
+
         # Update for any passed-in values
         self.tribute.update(overrides)
 
@@ -136,34 +218,24 @@ class Taxes(object):
                  + 0.0 )
 
     def apply_tax_table(self, v, tab):
-        crit = sorted(list(tab.keys()))
-
-        retval = 0
+        """Progressive taxes owed on v under the bracket table tab.
 
-        for idx in range(len(tab)):
+        v may be a scalar or a numpy array (one tax per element), and
+        tab may be either a raw table or one compiled into TaxBrackets.
+        """
+        if not isinstance(tab, TaxBrackets):
+            tab = TaxBrackets(tab)
+        return tab.tax(v)
 
-            # Find the tax rate and the taxable amount at that rate
-            cur = crit[idx]
-            rate = tab[cur]
-
-            if (len(crit)-1) == idx:
-                # top tax bracket, so there is no idx+1
-                taxable = v - cur
-            else:
-                # either the whole bracket, or just the delta
-                taxable = min(v, crit[idx+1]) - cur
-
-            # Looks like we're done
-            if 0 >= taxable: break
-
-            # Compute the tax contribution
-            retval += (float(taxable) * float(rate))
-
-        return round(retval, 2)
+    def compile_tax_table(self, name, m):
+        tab = getattr(m, name)
+        if isinstance(tab, TaxBrackets):
+            return tab
+        return TaxBrackets(tab)
 
     def shares_withheld_rsu_state_n(self, m):
         rate = m.shares_withheld_rsu_state_rate
-        return int(math.ceil(m.shares_vested_rsu_eoy_n * rate))
+        return ceil(m.shares_vested_rsu_eoy_n * rate)
 
     def shares_withheld_rsu_rate(self, m):
         return m.shares_withheld_rsu_state_rate+m.shares_withheld_rsu_fed_rate
@@ -189,7 +261,7 @@ class Taxes(object):
 
     def shares_withheld_rsu_fed_n(self, m):
         rate = m.shares_withheld_rsu_fed_rate
-        return int(math.ceil(m.shares_vested_rsu_eoy_n * rate))
+        return ceil(m.shares_vested_rsu_eoy_n * rate)
 
     def shares_withheld_rsu_usd(self, m):
         return m.shares_withheld_rsu_n * m.ipo_price_usd
@@ -208,13 +280,11 @@ class Taxes(object):
 
     def state_reg_income_taxes(self, m):
         v = m.state_taxable_income_usd
-        tab = m.state_tax_table
-        return self.apply_tax_table(v, tab)
+        return m.state_tax_brackets.tax(v)
 
     def state_sdi_taxes(self, m):
         v = m.state_taxable_income_usd
-        tab = m.sdi_tax_table
-        return self.apply_tax_table(v, tab)
+        return m.sdi_tax_brackets.tax(v)
 
     def state_taxable_income(self, m):
         return ( 0.0
@@ -228,7 +298,8 @@ class Taxes(object):
 
     def state_tax_deduction(self, m):
         # Either we take the standard deduction, or we itemize
-        return max(m.state_itemized_deductions_usd, m.state_std_deduction_usd)
+        return np.maximum(m.state_itemized_deductions_usd,
+                          m.state_std_deduction_usd)
 
     def state_itemized_deductions(self, m):
         # We aren't itemizing
@@ -236,28 +307,24 @@ class Taxes(object):
 
     def fed_taxes(self, m):
         return ( 0.0
-                 + max(m.fed_reg_income_taxes_usd, m.amt_taxes_usd)
+                 + np.maximum(m.fed_reg_income_taxes_usd, m.amt_taxes_usd)
                  + m.fed_random_taxes_usd
                  + 0.0 )
 
     def fed_reg_income_taxes(self, m):
         v = m.fed_taxable_income_usd
-        tab = m.fed_tax_table
-        return self.apply_tax_table(v, tab)
+        return m.fed_tax_brackets.tax(v)
 
     def amt_taxes(self, m):
         # FIXME: Not sure if this is right for amti >= 1e6
         v = m.amt_taxable_income_usd
-        tab = m.amt_tax_table
-        return self.apply_tax_table(v, tab)
+        return m.amt_tax_brackets.tax(v)
 
     def fed_medicare_taxes(self, m):
-        return self.apply_tax_table(m.fed_taxable_income_usd,
-                                    m.medicare_tax_table)
+        return m.medicare_tax_brackets.tax(m.fed_taxable_income_usd)
 
     def fed_ss_taxes(self, m):
-        return self.apply_tax_table(m.fed_taxable_income_usd,
-                                    m.ss_tax_table)
+        return m.ss_tax_brackets.tax(m.fed_taxable_income_usd)
 
     def fed_random_taxes(self, m):
         return ( 0.0
@@ -272,14 +339,46 @@ class Taxes(object):
                  * 1.0 )
 
     def amt_exemption_usd(self, m):
-        
+
         i_crit = m.amt_exemption_rolloff_threshhold_usd
         income = m.amt_base_income_usd  # "amti"
         base = m.amt_exemption_base_usd
 
-        if income <= i_crit: return base
-        if income > (4 * base) + i_crit: return 0
-        return base - ((income - i_crit) * 0.25)
+        # The exemption rolls off at a quarter on the dollar above
+        # i_crit until there's nothing left of it.
+        return base - np.clip((income - i_crit) * 0.25, 0, base)
+
+    def amt_free_iso_exercise_income(self, m):
+        """ISO exercise income at which AMT catches up with regular taxes.
+
+        Both sides are piecewise linear, so rather than searching for
+        the crossover we walk back through the breakpoints: first the
+        AMT brackets give us the AMTI at which AMT equals the regular
+        income taxes, then the exemption phase-out (see
+        amt_exemption_usd) gives us the amt base income that produces
+        that AMTI.  Whatever is left after the rest of the amt base
+        income is the room for ISO exercises.
+        """
+        i_crit = m.amt_exemption_rolloff_threshhold_usd
+        base = m.amt_exemption_base_usd
+
+        # Target AMTI
+        amti = m.amt_tax_brackets.income_for(m.fed_reg_income_taxes_usd)
+
+        # Undo the exemption:
+        #   below i_crit:         amti = income - base
+        #   during the phase-out: amti = 1.25 * income - 0.25 * i_crit - base
+        #   once it's all gone:   amti = income
+        income = np.where(amti <= i_crit - base,
+                          amti + base,
+                          np.where(amti <= i_crit + 4 * base,
+                                   (amti + base + 0.25 * i_crit) / 1.25,
+                                   amti))
+
+        # Everything else that counts towards amti
+        other = m.amt_base_income_usd - m.iso_exercise_income_usd
+
+        return np.maximum(0.0, income - other)
 
     def amt_base_income(self, m):
         return ( 0.0
@@ -293,12 +392,12 @@ class Taxes(object):
                  + 0.0 )
 
     def amt_taxable_income(self, m):
-        return max(0.0,
-                   ( 0.0
-                     + m.amt_base_income_usd
-                     - m.amt_exemption_usd
-                     + 0.0 )
-                   )
+        return np.maximum(0.0,
+                          ( 0.0
+                            + m.amt_base_income_usd
+                            - m.amt_exemption_usd
+                            + 0.0 )
+                          )
 
     def fed_taxable_income(self, m):
         return ( 0.0
@@ -312,7 +411,8 @@ class Taxes(object):
 
     def fed_tax_deduction(self, m):
         # Either we take the standard deduction, or we itemize
-        return max(m.fed_itemized_deductions_usd, m.fed_std_deduction_usd)
+        return np.maximum(m.fed_itemized_deductions_usd,
+                          m.fed_std_deduction_usd)
 
     def fed_itemized_deductions(self, m):
         # We aren't itemizing, state tax deduction cap is $10k
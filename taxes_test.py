@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 
+import numpy as np
 import pylink
 import pytest
 
@@ -86,6 +87,85 @@ class TestTaxes(object):
         taxes = m.taxes_obj.apply_tax_table(5000, table)
         assert abs(taxes - 2190) < 1e-4;
 
+    def test_tax_brackets(self, model):
+
+        table = {
+            0:    0.1,
+            100:  0.2,
+            1000: 0.5,
+            }
+
+        m = model
+        brackets = deathAnd.TaxBrackets(table)
+
+        incomes = [-10, 0, 50, 100, 110, 200, 1000, 5000]
+        expected = [0, 0, 5, 10, 12, 30, 190, 2190]
+
+        for (v, proper) in zip(incomes, expected):
+            assert abs(brackets.tax(v) - proper) < 1e-4
+            assert brackets.tax(v) == m.taxes_obj.apply_tax_table(v, table)
+
+        taxes = brackets.tax(np.array(incomes))
+        assert (np.abs(taxes - np.array(expected)) < 1e-4).all()
+
+        # Brackets needn't start at zero
+        brackets = deathAnd.TaxBrackets({100: 0.1, 200: 0.0})
+        assert 0 == brackets.tax(50)
+        assert abs(brackets.tax(150) - 5) < 1e-4
+        assert abs(brackets.tax(500) - 10) < 1e-4
+
+    def test_tax_brackets_income_for(self, model):
+        brackets = deathAnd.TaxBrackets({0: 0.1, 100: 0.2, 1000: 0.5})
+
+        for v in [0, 50, 100, 110, 200, 1000, 5000]:
+            tax = brackets.tax(v)
+            assert abs(brackets.income_for(tax) - v) < 1e-4
+
+        incomes = np.array([50, 100, 110, 200, 1000, 5000])
+        back = brackets.income_for(brackets.tax(incomes))
+        assert (np.abs(back - incomes) < 1e-4).all()
+
+        # Once the top bracket stops taxing, no income is enough
+        brackets = deathAnd.TaxBrackets({0: 0.062, 137700: 0.0})
+        assert brackets.income_for(1e6) == float('inf')
+
+    def test_amt_free_iso_exercise_income_usd(self, model):
+        m = model
+        e = m.enum
+
+        # Walk the regular taxes across all three pieces of the
+        # exemption phase-out and make sure AMT lands right on them.
+        for reg_income in [2e5, 1e6, 1.5e6, 5e6]:
+            m.override(e.reg_income_usd, reg_income)
+            m.override(e.iso_exercise_income_usd, 0)
+            iso = m.amt_free_iso_exercise_income_usd
+            assert 0 < iso
+
+            m.override(e.iso_exercise_income_usd, iso)
+            assert abs(m.amt_taxes_usd - m.fed_reg_income_taxes_usd) < 0.02
+
+            # ...and it doesn't care what we've already exercised
+            assert abs(m.amt_free_iso_exercise_income_usd - iso) < 1e-4
+
+    def test_tax_brackets_recompile(self, model):
+        m = model
+        e = m.enum
+
+        table = {
+            0:    0.1,
+            100:  0.2,
+            }
+
+        m.override(e.fed_taxable_income_usd, 200)
+        m.override(e.fed_tax_table, table)
+        assert abs(m.fed_reg_income_taxes_usd - 30) < 1e-4
+
+        table = {
+            0:    0.5,
+            }
+        m.override(e.fed_tax_table, table)
+        assert abs(m.fed_reg_income_taxes_usd - 100) < 1e-4
+
     def test_exempt_contributions(self, model):
         m = model
         e = m.enum
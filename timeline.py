@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+
+import datetime
+import math
+
+import numpy as np
+
+import sweep
+from position import GrantBook
+from position import mon_add
+from position import parse_date
+
+
+# Collected from the model for every year (all years in one pass)
+NODES = [
+    'fed_reg_income_taxes_usd',
+    'amt_taxes_usd',
+    'amt_exemption_usd',
+    'fed_taxes_usd',
+    'state_taxes_usd',
+    'outstanding_taxes_usd',
+    'amt_free_iso_exercise_income_usd',
+    'cleared_from_sale_usd',
+    ]
+
+# What report() shows, in order
+ROWS = [
+    'price_usd',
+    'rsu_vested_n',
+    'rsu_income_usd',
+    'nso_income_usd',
+    'iso_sales_income_usd',
+    'iso_exercised_n',
+    'iso_exercise_income_usd',
+    'iso_held_n',
+    'fed_reg_income_taxes_usd',
+    'amt_taxes_usd',
+    'amt_credit_generated_usd',
+    'amt_credit_used_usd',
+    'amt_credit_usd',
+    'fed_taxes_usd',
+    'state_taxes_usd',
+    'outstanding_taxes_usd',
+    'net_cash_usd',
+    ]
+
+
+def _rsu_vested_eoy(grants, eoys):
+    """Total RSUs vested by each of the year ends (np.array)."""
+    if isinstance(grants, GrantBook):
+        assert(grants.owner is None)
+        return np.array([ grants.sum_by_vehicle(grants.vested(d))['rsu']
+                          for d in eoys ], dtype=float)
+    retval = np.zeros(len(eoys))
+    for g in grants:
+        if 'rsu' == g.vehicle:
+            retval += g.vested_many(eoys)
+    return retval
+
+
+def _iso_held(grants):
+    if isinstance(grants, GrantBook):
+        return grants.sum_by_vehicle(grants.held())['iso']
+    return sum([ g.held() for g in grants if 'iso' == g.vehicle ])
+
+
+def _exercise(grants, exercises, on, price):
+    """Exercise (and hold) ISOs on copies of the grants.
+
+    returns: (<grants>, <shares exercised>, <exercise income>, <cost>)
+    """
+    n = 0
+    income = 0.0
+    cost = 0.0
+    if isinstance(grants, GrantBook):
+        grants = grants.copy()
+        for name, qty in exercises.items():
+            i = grants.index[name]
+            assert('iso' == grants.vehicle_of(name))
+            assert(0 <= qty <= grants.vested_outstanding(on)[i])
+            grants.exercised[i] += qty
+            n += qty
+            income += qty * (price - grants.strike_usd[i])
+            cost += qty * grants.strike_usd[i]
+        return (grants, n, income, cost)
+
+    grants = list(grants)
+    index = dict([ (g.name, k) for (k, g) in enumerate(grants) ])
+    for name, qty in exercises.items():
+        k = index[name]
+        g = grants[k].overlay()
+        assert('iso' == g.vehicle)
+        assert(0 <= qty <= g.vested_outstanding(on))
+        g.exercised += qty
+        grants[k] = g
+        n += qty
+        income += qty * (price - g.strike_usd)
+        cost += qty * g.strike_usd
+    return (grants, n, income, cost)
+
+
+def amt_free_isos(m, i):
+    """Exercise strategy: as many ISOs as the year's AMT room allows.
+
+    Works through the vested, unexercised ISOs in order, spending
+    amt_free_iso_exercise_income_usd on the spread.
+    """
+    room = m.amt_free_iso_exercise_income_usd
+    price = m.ipo_price_usd
+    retval = {}
+    for g in m.rem_grants_lst:
+        spread = price - g.strike_usd
+        if 'iso' != g.vehicle or spread <= 0:
+            continue
+        n = int(min(g.vested_outstanding(m.query_date),
+                    math.floor(room / spread)))
+        if 0 < n:
+            retval[g.name] = n
+            room -= n * spread
+    return retval
+
+
+def simulate(m, years=5, orders=None, exercises=None, prices=None,
+             amt_credit_usd=0.0, **overrides):
+    """Plays out several tax years, carrying the grants from one to the next.
+
+    Year i's sales happen on the anniversary of the model's query date,
+    i years out.  Each year:
+
+     * the grants left over from the year before (rem_grants_lst, plus
+       any ISOs exercised) are what's on hand
+
+     * orders(m, i) places that year's sales orders, then
+       exercises(m, i) says which ISOs to exercise and hold
+       ({<grant name>: <shares>}, see amt_free_isos)
+
+     * RSU income is just what vests that year, with the first year
+       taking everything vested so far (as the model does for the IPO)
+
+    The grants have to be walked a year at a time, but the taxes for
+    every year are then worked out in a single pass, by pushing arrays
+    (one value per year) through the model as sweep.price_sweep does.
+    The vesting comes from the grants' schedules up front.
+
+    AMT paid in excess of the regular tax turns into a credit that's
+    carried forward and taken in later years, as far as the regular
+    tax exceeds AMT.  All AMT is treated as coming from ISO exercises
+    (a deferral item), which is what it's usually from here.
+
+    m:              the DAGModel (left the way we found it)
+    years:          number of tax years
+    orders:         callable(m, i) returning year i's sales orders
+                    (default: no sales)
+    exercises:      callable(m, i) returning year i's ISO exercises
+                    (default: none)
+    prices:         share price for each year (default: ipo_price_usd)
+    amt_credit_usd: AMT credit carried in from before the first year
+    overrides:      any other node values, either one for every year
+                    or a sequence with one per year (e.g.
+                    reg_income_usd=[150000, 160000, ...])
+
+    returns: {'year': <np.array>, 'date': [<datetime.date>, ...],
+              <series>: <np.array, one value per year>, ...,
+              'grants': <the grants left after the last year>}
+             where fed_taxes_usd and outstanding_taxes_usd are net of
+             the AMT credit taken, and net_cash_usd also pays for the
+             ISOs exercised
+    """
+    assert(1 <= years)
+    e = m.enum
+
+    start = parse_date(m.query_date)
+    dates = [ mon_add(start, 12 * i) for i in range(years) ]
+    eoys = [ datetime.date(d.year, 12, 31) for d in dates ]
+
+    if prices is None: prices = m.ipo_price_usd
+    prices = np.array(np.broadcast_to(np.asarray(prices, dtype=float),
+                                      years))
+
+    per_year = {}
+    for name, val in overrides.items():
+        if np.ndim(val):
+            assert(len(val) == years)
+            val = np.asarray(val)
+        per_year[name] = val
+    def __at(val, i):
+        if np.ndim(val): return val[i]
+        return val
+
+    # What vests in each year
+    grants = m.grants_lst
+    cum = _rsu_vested_eoy(grants, eoys)
+    rsu_vested = np.diff(cum, prepend=0.0)
+
+    series = dict([ (name, np.zeros(years)) for name in [
+        'rsu_income_usd', 'nso_income_usd', 'iso_sales_income_usd',
+        'iso_exercised_n', 'iso_exercise_income_usd',
+        'iso_exercise_cost_usd', 'iso_held_n'] ])
+    extra_iso_income = per_year.pop('iso_exercise_income_usd', 0.0)
+
+    saved = sweep.snapshot_nodes(m, ['query_date', 'ipo_price_usd',
+                                     'grants_lst', 'grants_dict',
+                                     'sales_orders',
+                                     'iso_exercise_income_usd',
+                                     'shares_vested_rsu_eoy_n']
+                                 + list(per_year.keys()))
+    try:
+        # Walk the grants forward a year at a time
+        for i in range(years):
+            m.override(e.query_date, dates[i])
+            m.override(e.ipo_price_usd, prices[i])
+            m.override(e.grants_lst, grants)
+            if not isinstance(grants, GrantBook):
+                m.override(e.grants_dict,
+                           dict([ (g.name, g) for g in grants ]))
+            m.override(e.shares_vested_rsu_eoy_n, rsu_vested[i])
+            m.override(e.iso_exercise_income_usd,
+                       __at(extra_iso_income, i))
+            for name, val in per_year.items():
+                m.override(m.node_num(name), __at(val, i))
+            m.override(e.sales_orders, [])
+
+            if orders is not None:
+                m.override(e.sales_orders, orders(m, i))
+            for name in ['rsu_income_usd', 'nso_income_usd',
+                         'iso_sales_income_usd']:
+                series[name][i] = getattr(m, name)
+            grants = m.rem_grants_lst
+
+            if exercises is not None:
+                (grants, n, income, cost) = _exercise(
+                    grants, exercises(m, i), dates[i], prices[i])
+                series['iso_exercised_n'][i] = n
+                series['iso_exercise_income_usd'][i] = income
+                series['iso_exercise_cost_usd'][i] = cost
+            series['iso_held_n'][i] = _iso_held(grants)
+    finally:
+        sweep.restore_nodes(m, saved)
+
+    # Every year's taxes at once
+    over = dict(per_year)
+    over['shares_vested_rsu_eoy_n'] = rsu_vested
+    over['iso_exercise_income_usd'] = (series['iso_exercise_income_usd']
+                                       + extra_iso_income)
+    for name in ['rsu_income_usd', 'nso_income_usd', 'iso_sales_income_usd']:
+        over[name] = series[name]
+    res = sweep.price_sweep(m, prices, NODES, **over)
+
+    # AMT credit carryforward
+    reg = res['fed_reg_income_taxes_usd']
+    amt = res['amt_taxes_usd']
+    generated = np.maximum(0.0, amt - reg)
+    used = np.zeros(years)
+    credit = np.zeros(years)
+    for i in range(years):
+        used[i] = min(amt_credit_usd, max(0.0, reg[i] - amt[i]))
+        amt_credit_usd += generated[i] - used[i]
+        credit[i] = amt_credit_usd
+
+    retval = dict(series)
+    retval.update(res)
+    retval.update({
+        'year': np.array([ d.year for d in dates ]),
+        'date': dates,
+        'price_usd': prices,
+        'rsu_vested_n': rsu_vested,
+        'amt_credit_generated_usd': generated,
+        'amt_credit_used_usd': used,
+        'amt_credit_usd': credit,
+        'fed_taxes_usd': res['fed_taxes_usd'] - used,
+        'outstanding_taxes_usd': res['outstanding_taxes_usd'] - used,
+        'net_cash_usd': (res['cleared_from_sale_usd'] + used
+                         - series['iso_exercise_cost_usd']),
+        'grants': grants,
+        })
+    return retval
+
+
+def report(res, rows=ROWS):
+    """Text table of a simulate() result, one column per year."""
+    years = res['year']
+    lines = [ '%-28s' % 'Year' + ''.join([ '%14d' % y for y in years ]) ]
+    for name in rows:
+        lines.append('%-28s' % name
+                     + ''.join([ '%14s' % '{:,.0f}'.format(v)
+                                 if 100 <= abs(v) else '%14.2f' % v
+                                 for v in res[name] ]))
+    return '\n'.join(lines) + '\n'
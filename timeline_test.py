@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+import numpy as np
+import pytest
+
+import income as myMeager
+import timeline
+from position import GrantBook
+from sweep_test import GRANTS
+from sweep_test import model
+
+
+def sell_rsus(m, i):
+    return myMeager.sales_orders_rsu(m)
+
+
+def exercise_year_one(m, i):
+    # Everything vested in the first year, nothing after
+    if i: return {}
+    iso = m.grants_dict['iso']
+    return {'iso': int(iso.vested_outstanding(m.query_date))}
+
+
+class TestTimeline(object):
+
+    def test_first_year(self, model):
+        m = model
+        res = timeline.simulate(m, years=3, orders=sell_rsus)
+
+        m.override(m.enum.sales_orders, sell_rsus(m, 0))
+        assert(res['outstanding_taxes_usd'][0]
+               == pytest.approx(m.outstanding_taxes_usd))
+        assert(res['cleared_from_sale_usd'][0]
+               == pytest.approx(m.cleared_from_sale_usd))
+        assert(res['amt_taxes_usd'][0] == pytest.approx(m.amt_taxes_usd))
+        assert(res['rsu_vested_n'][0] == m.shares_vested_rsu_eoy_n)
+        assert(list(res['year']) == [2020, 2021, 2022])
+
+    def test_leaves_model(self, model):
+        m = model
+        grants = m.grants_lst
+        taxes = m.outstanding_taxes_usd
+        timeline.simulate(m, years=3, orders=sell_rsus,
+                          exercises=timeline.amt_free_isos,
+                          reg_income_usd=[150000, 160000, 170000])
+        assert(m.grants_lst is grants)
+        assert(m.outstanding_taxes_usd == taxes)
+        assert(m.sales_orders == [])
+
+    def test_carry(self, model):
+        m = model
+        res = timeline.simulate(m, years=5, orders=sell_rsus)
+
+        # RSUs vest once, and everything vested gets sold or withheld
+        rsu = [ g for g in res['grants'] if 'rsu' == g.vehicle ][0]
+        last = res['date'][-1]
+        assert(res['rsu_vested_n'].sum() == rsu.vested('12/31/24'))
+        assert(rsu.liquidated == rsu.vested(last))
+        rate = m.shares_withheld_rsu_rate
+        assert(rsu.withheld == round(rsu.vested(last) * rate))
+        assert((0 < res['rsu_income_usd'][:4]).all())
+
+    def test_amt_credit(self, model):
+        m = model
+        res = timeline.simulate(m, years=4, exercises=exercise_year_one)
+
+        gen = res['amt_credit_generated_usd']
+        used = res['amt_credit_used_usd']
+        assert(0 < gen[0])
+        assert(0 < used[1:].sum() <= gen[0])
+        assert(res['amt_credit_usd']
+               == pytest.approx(np.cumsum(gen - used)))
+        assert(res['iso_held_n'][-1] == res['iso_exercised_n'][0])
+
+        # Taxes are net of the credit taken
+        plain = timeline.simulate(m, years=4)
+        assert(res['fed_taxes_usd'][1:]
+               == pytest.approx(plain['fed_taxes_usd'][1:] - used[1:]))
+
+    def test_amt_free_isos(self, model):
+        m = model
+        res = timeline.simulate(m, years=3, orders=sell_rsus,
+                                exercises=timeline.amt_free_isos)
+        assert((0 < res['iso_exercised_n']).all())
+        assert((res['amt_taxes_usd']
+                <= res['fed_reg_income_taxes_usd'] + 1).all())
+        assert((res['amt_credit_generated_usd'] <= 1).all())
+        assert('amt_credit_usd' in timeline.report(res))
+
+    def test_book(self, model):
+        m = model
+        lst = timeline.simulate(m, years=3, orders=sell_rsus,
+                                exercises=timeline.amt_free_isos)
+        m.override(m.enum.grants_lst, GrantBook.from_grants(GRANTS))
+        book = timeline.simulate(m, years=3, orders=sell_rsus,
+                                 exercises=timeline.amt_free_isos)
+        for name in timeline.ROWS:
+            assert(book[name] == pytest.approx(lst[name]))